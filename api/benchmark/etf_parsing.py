@@ -0,0 +1,56 @@
+"""
+Parsing time of ETF detail pages: the full page with html.parser as before, the full page
+with lxml and the pruned soup of `parse_details_page`. All of them must scrape the same
+details.
+
+justETF pages are several hundred kilobytes of navigation, scripts, charts and listings, the
+fixture is padded with copies of its listings table to a similar size.
+
+Usage:
+    python -m api.benchmark.etf_parsing --pages 50 --padding 400
+"""
+import argparse
+import os
+import time
+from bs4 import BeautifulSoup
+from api.main.asset_scraper.scrapers import ETFScraper, parse_details_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "test", "fixtures")
+
+
+def load_page(padding: int) -> str:
+    with open(os.path.join(FIXTURES, "etf_profile.html")) as file:
+        html = file.read()
+    start = html.index('<section class="listings">')
+    end = html.index("</section>", start) + len("</section>")
+    return html[:end] + html[start:end] * padding + html[end:]
+
+
+def scrape(soup: BeautifulSoup):
+    return ETFScraper("IE00BK5BQT80", "VWCE", config=None, arguments={}, soup=soup).scrape()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--padding", type=int, default=400)
+    args = parser.parse_args()
+
+    html = load_page(args.padding)
+    parsers = {
+        "html.parser": lambda: BeautifulSoup(html, "html.parser"),
+        "lxml": lambda: BeautifulSoup(html, "lxml"),
+        "pruned lxml": lambda: parse_details_page(html),
+    }
+    expected = scrape(parsers["html.parser"]())
+    print(f"page: {len(html) / 1024:.0f} KiB, {args.pages} pages")
+    print(f"{'parser':<14}{'ms/page':>10}{'speedup':>10}")
+    baseline = None
+    for name, parse in parsers.items():
+        assert scrape(parse()) == expected, name
+        start = time.perf_counter()
+        for _ in range(args.pages):
+            scrape(parse())
+        elapsed = (time.perf_counter() - start) / args.pages
+        baseline = baseline or elapsed
+        print(f"{name:<14}{elapsed * 1e3:>10.2f}{baseline / elapsed:>9.1f}x")
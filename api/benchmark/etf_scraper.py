@@ -0,0 +1,88 @@
+"""
+Time of scraping ETF detail pages with a browser started for every scrape and with a
+pooled browser, against fixture pages served by a local HTTP server.
+
+Requires Chrome and a matching chromedriver.
+
+Usage:
+    python -m api.benchmark.etf_scraper --config test --scrapes 20
+"""
+import argparse
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from api.main import create_app
+from api.main.asset_scraper import ScraperConfig
+from api.main.asset_scraper.browser import BrowserPool, create_chrome_driver
+from api.main.asset_scraper.scrapers import ETFScraper
+from api.main.config import CONFIG, AssetTypes
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "test", "fixtures")
+ISIN = "IE00BK5BQT80"
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the ETF profile fixture for its ISIN and redirects other ISINs to the search.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/en/etf-profile.html":
+            if parse_qs(url.query).get("isin") == [ISIN]:
+                self.path = "/etf_profile.html"
+            else:
+                self.send_response(302)
+                self.send_header("Location", "/en/find-etf.html")
+                self.end_headers()
+                return
+        elif url.path == "/en/find-etf.html":
+            self.path = "/find_etf.html"
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(config: ScraperConfig, scrapes: int) -> float:
+    start = time.perf_counter()
+    for _ in range(scrapes):
+        ETFScraper.check_if_exists(config, isin=ISIN, query="VWCE").scrape()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="test", choices=list(CONFIG))
+    parser.add_argument("--scrapes", type=int, default=20)
+    args = parser.parse_args()
+
+    CONFIG[args.config].DB_ONLY = True
+    app = create_app(args.config)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(FixtureHandler, directory=os.path.abspath(FIXTURES))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with app.app_context():
+        print(f"{'browser':<12}{'scrapes':>8}{'seconds':>10}{'ms/scrape':>12}")
+        for name, max_pages in (("per scrape", 1), ("pooled", 0)):
+            pool = BrowserPool(size=1, factory=create_chrome_driver, max_pages=max_pages)
+            config = ScraperConfig(AssetTypes.ETF, POOL=pool)
+            config.URLS = {
+                "details_url": f"{base_url}/en/etf-profile.html?query={{query}}&isin={{isin}}"
+            }
+            try:
+                elapsed = run(config, args.scrapes)
+            finally:
+                pool.close()
+            print(
+                f"{name:<12}{args.scrapes:>8}{elapsed:>10.2f}"
+                f"{elapsed / args.scrapes * 1e3:>12.0f}"
+            )
+            print(f"{'':<12}{pool.snapshot()}")
+    server.shutdown()
@@ -0,0 +1,88 @@
+"""
+Throughput of the bulk investment import endpoint with PostgreSQL COPY and with
+multi-row INSERTs.
+
+The benchmark user and its lots are removed afterwards.
+
+Usage:
+    python -m api.benchmark.investment_import --config test --rows 100000
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from sqlalchemy import delete, select
+from api.main import create_app, db, ENDPOINTS_CONFIG
+from api.main.config import CONFIG
+from api.main.database import Users, Investments, InvestedETFs, InvestedStocks, ETF, Stock
+from api.main.positions import rebuild_positions
+
+USERNAME = "benchmark_import"
+
+
+def create_csv(rows: int, etfs, stocks) -> bytes:
+    rng = random.Random(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["type", "ticker", "volume", "open_price", "open_datetime", "close_price"])
+    for _ in range(rows):
+        asset_type, tickers = rng.choice((("etf", etfs), ("stock", stocks)))
+        open_price = round(rng.uniform(10, 500), 2)
+        close_price = round(open_price * rng.uniform(0.8, 1.2), 2) if rng.random() < 0.2 else ""
+        writer.writerow(
+            [
+                asset_type,
+                rng.choice(tickers),
+                rng.randint(1, 100),
+                open_price,
+                f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00",
+                close_price,
+            ]
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+def delete_lots(user_id: int) -> None:
+    ids = select(Investments.investment_id).where(Investments.user_id == user_id)
+    for table in (InvestedETFs.__table__, InvestedStocks.__table__):
+        db.session.execute(delete(table).where(table.c.investment_id.in_(ids)))
+    db.session.execute(delete(Investments.__table__).where(Investments.user_id == user_id))
+    rebuild_positions(user_id)
+    db.session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="test", choices=list(CONFIG))
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    CONFIG[args.config].DB_ONLY = True
+    app = create_app(args.config)
+    client = app.test_client()
+    url = f"{ENDPOINTS_CONFIG.IMPORT_ENDPOINT}/{USERNAME}"
+
+    with app.app_context():
+        user = Users(username=USERNAME, email=f"{USERNAME}@example.com", password="benchmark")
+        db.session.add(user)
+        db.session.commit()
+        data = create_csv(
+            args.rows,
+            list(db.session.scalars(select(ETF.etf_ticker))),
+            list(db.session.scalars(select(Stock.stock_ticker))),
+        )
+        try:
+            print(f"{'method':<10}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+            for method in ("copy", "insert"):
+                app.config["IMPORT_METHOD"] = method
+                start = time.perf_counter()
+                response = client.post(url, data=data, content_type="text/csv")
+                elapsed = time.perf_counter() - start
+                assert response.json["imported"] == args.rows, response.json
+                print(f"{method:<10}{args.rows:>10}{elapsed:>10.2f}{args.rows / elapsed:>12.0f}")
+                delete_lots(user.user_id)
+        finally:
+            delete_lots(user.user_id)
+            db.session.delete(user)
+            db.session.commit()
@@ -0,0 +1,60 @@
+"""
+Throughput of the text2sql model under concurrent load with and without micro-batching.
+
+Usage:
+    python -m api.benchmark.llm_batching --requests 64 --concurrency 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+from api.main.model.llm import LLM, LLMType, BatchScheduler, GenerationConfig
+from api.main.resources.sql_resource import SQLController
+
+TABLE = """CREATE TABLE department (creation VARCHAR, department_id VARCHAR);
+CREATE TABLE management (department_id VARCHAR, head_id VARCHAR);
+CREATE TABLE head (head_id VARCHAR, born_state VARCHAR)"""
+
+QUESTIONS = [
+    "What are the distinct creation years of the departments?",
+    "How many heads of the departments are older than 56?",
+    "List the states where the heads of departments were born.",
+    "Which department was created first?",
+]
+
+
+def run(model: Union[LLM, BatchScheduler], requests: int, concurrency: int) -> float:
+    """
+    Send `requests` prompts from `concurrency` threads.
+
+    Returns:
+        float: Requests per second.
+    """
+    config = GenerationConfig(max_new_tokens=64)
+    prompts = [
+        SQLController.create_prompt(TABLE, QUESTIONS[i % len(QUESTIONS)]) for i in range(requests)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda prompt: model.generate_response(prompt, config), prompts))
+    return requests / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    llm = LLM(LLMType.SQL)
+    scheduler = BatchScheduler(llm, args.max_batch_size, args.window_ms)
+    # warm up both paths so that lazy initialisation does not skew the results
+    run(llm, 2, 1)
+    run(scheduler, 2, 1)
+
+    print(f"{'mode':<12}{'req/s':>10}")
+    print(f"{'unbatched':<12}{run(llm, args.requests, args.concurrency):>10.2f}")
+    print(f"{'batched':<12}{run(scheduler, args.requests, args.concurrency):>10.2f}")
+    print(f"Scheduler metrics: {scheduler.metrics.snapshot()}")
@@ -0,0 +1,87 @@
+"""
+Cold start time and memory of a worker loading the text2sql model from the LoRA adapter and
+from the merged model exported by flan_t5/export_model.py. Every start runs in a new process.
+
+RssFile is memory mapped from files and shared by all the workers loading the same model,
+RssAnon is private to every worker.
+
+Usage:
+    python -m api.benchmark.llm_cold_start --starts 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+from api.main.config import LLMType, mapping
+
+
+def memory() -> Dict[str, int]:
+    """
+    Returns:
+        Dict[str, int]: VmRSS, RssAnon and RssFile of this process in kB.
+    """
+    with open("/proc/self/status") as file:
+        lines = [line.split() for line in file]
+    return {
+        line[0][:-1]: int(line[1])
+        for line in lines
+        if line[0][:-1] in ("VmRSS", "RssAnon", "RssFile")
+    }
+
+
+def worker(path: str) -> None:
+    from api.main.model.llm import AdapterRegistry, GenerationConfig
+
+    mapping[LLMType.SQL] = path
+    start = time.perf_counter()
+    registry = AdapterRegistry([LLMType.SQL])
+    loaded = time.perf_counter() - start
+    # the first generation touches all the weights
+    registry.get(LLMType.SQL).generate_response(
+        "CREATE TABLE head (age INTEGER)\nHow many heads are older than 56?",
+        GenerationConfig(max_new_tokens=16),
+    )
+    print(json.dumps({"seconds": loaded, "first": time.perf_counter() - start, **memory()}))
+
+
+def start_worker(path: str) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "api.benchmark.llm_cold_start", "--worker", path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adapter", default=mapping[LLMType.SQL])
+    parser.add_argument("--starts", type=int, default=3)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker)
+        sys.exit()
+
+    from flan_t5.export_model import export
+
+    with tempfile.TemporaryDirectory() as directory:
+        merged_path = os.path.join(directory, "merged")
+        export(args.adapter, merged_path)
+        print(
+            f"{'model':<10}{'load s':>10}{'first s':>10}"
+            f"{'VmRSS MB':>11}{'RssAnon MB':>12}{'RssFile MB':>12}"
+        )
+        for name, path in (("adapter", args.adapter), ("merged", merged_path)):
+            runs = [start_worker(path) for _ in range(args.starts)]
+            best = min(runs, key=lambda run: run["seconds"])
+            print(
+                f"{name:<10}{best['seconds']:>10.2f}{best['first']:>10.2f}"
+                f"{best['VmRSS'] / 1024:>11.0f}{best['RssAnon'] / 1024:>12.0f}"
+                f"{best['RssFile'] / 1024:>12.0f}"
+            )
@@ -0,0 +1,75 @@
+"""
+Latency of the text2sql model for prompts of different lengths padded to `model_max_length`
+(previous behaviour), to the longest prompt and to buckets of 64 tokens.
+
+Usage:
+    python -m api.benchmark.llm_padding --repeats 5
+"""
+import argparse
+import time
+import torch
+from typing import Callable
+from api.main.model.llm import LLM, LLMType, GenerationConfig, BatchEncoding
+
+PROMPT_LENGTHS = [32, 64, 128, 256, 512]
+
+
+def prompt_of_length(llm: LLM, tokens: int) -> str:
+    """
+    Returns:
+        str: Text that tokenizes to roughly `tokens` tokens.
+    """
+    words = "CREATE TABLE head (head_id VARCHAR, born_state VARCHAR, age INTEGER);".split()
+    text = ""
+    while len(llm.tokenizer(text, verbose=False)["input_ids"]) < tokens:
+        text += " " + words[len(text.split()) % len(words)]
+    return text
+
+
+def max_length_input(llm: LLM, text: str) -> BatchEncoding:
+    return llm.tokenizer(
+        text,
+        return_tensors="pt",
+        padding="max_length",
+        truncation=True,
+        max_length=llm.tokenizer.model_max_length,
+    )
+
+
+def latency(llm: LLM, process: Callable[[str], BatchEncoding], text: str, repeats: int) -> float:
+    """
+    Returns:
+        float: Mean latency of tokenization and generation in milliseconds.
+    """
+    config = GenerationConfig(max_new_tokens=32)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        input = process(text)
+        with llm.registry.activate(llm.task_type), torch.no_grad():
+            llm.model.generate(
+                input_ids=input["input_ids"].to(llm.model.device),
+                attention_mask=input["attention_mask"].to(llm.model.device),
+                generation_config=config,
+            )
+    return 1e3 * (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--bucket", type=int, default=64)
+    args = parser.parse_args()
+
+    llm = LLM(LLMType.SQL)
+    bucketed = LLM(LLMType.SQL, llm.registry, pad_to_multiple_of=args.bucket)
+
+    print(f"{'tokens':>8}{'max_length ms':>16}{'longest ms':>14}{'bucketed ms':>14}")
+    for length in PROMPT_LENGTHS:
+        text = prompt_of_length(llm, length)
+        latency(llm, llm.process_input, text, 1)  # warm up
+        print(
+            f"{length:>8}"
+            f"{latency(llm, lambda t: max_length_input(llm, t), text, args.repeats):>16.1f}"
+            f"{latency(llm, llm.process_input, text, args.repeats):>14.1f}"
+            f"{latency(bucketed, bucketed.process_input, text, args.repeats):>14.1f}"
+        )
@@ -0,0 +1,86 @@
+"""
+Latency of 100 text2sql questions about one schema: every question tokenized and generated
+on its own (previous path), with the schema tokenized once and generated on its own, and
+with the schema tokenized once and the questions generated in batches.
+
+Usage:
+    python -m api.benchmark.llm_schema_prefix --questions 100 --batch-size 16
+"""
+import argparse
+import time
+from typing import Callable, List
+from api.main.model.llm import LLM, LLMType, GenerationConfig
+from api.main.resources.sql_resource import SQLController
+
+SCHEMA = """CREATE TABLE users (user_id INTEGER, username VARCHAR, email VARCHAR, name VARCHAR);
+CREATE TABLE etf (isin VARCHAR, etf_ticker VARCHAR, name VARCHAR, fund_provider VARCHAR,
+ter INTEGER, fund_size INTEGER, distribution_policy VARCHAR, replication_method_id INTEGER);
+CREATE TABLE stock (isin VARCHAR, ticker VARCHAR, name VARCHAR, sector VARCHAR);
+CREATE TABLE invested_etfs (user_id INTEGER, etf_ticker VARCHAR, quantity INTEGER,
+buy_price INTEGER, buy_date VARCHAR);
+CREATE TABLE invested_stocks (user_id INTEGER, ticker VARCHAR, quantity INTEGER,
+buy_price INTEGER, buy_date VARCHAR)"""
+
+TEMPLATES = [
+    "How many ETFs does {} offer?",
+    "What is the total quantity of ETFs bought by user {}?",
+    "List the tickers of stocks in the {} sector.",
+    "What is the email of the user with username {}?",
+    "Which ETFs of {} have a total expense ratio below 0.2?",
+]
+VALUES = ["iShares", "Vanguard", "Xtrackers", "Amundi", "Technology", "jdoe", "asmith", "3", "7"]
+
+
+def questions(count: int) -> List[str]:
+    return [
+        TEMPLATES[i % len(TEMPLATES)].format(VALUES[i // len(TEMPLATES) % len(VALUES)])
+        for i in range(count)
+    ]
+
+
+def timed(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    llm = LLM(LLMType.SQL)
+    config = GenerationConfig(max_new_tokens=args.max_new_tokens)
+    prompts = SQLController.create_prompts(SCHEMA, questions(args.questions))
+    plain = [str(prompt) for prompt in prompts]
+    batches = [prompts[i : i + args.batch_size] for i in range(0, len(prompts), args.batch_size)]
+    llm.generate_response(plain[0], config)
+
+    tokenize_plain = timed(lambda: [llm.process_input(prompt) for prompt in plain])
+    tokenize_prefixed = timed(lambda: [llm.process_input(prompt) for prompt in prompts])
+    print(f"{'path':<28}{'tokenize ms':>14}{'total s':>10}{'ms/question':>14}")
+    for name, tokenize, run in (
+        (
+            "per question",
+            tokenize_plain,
+            lambda: [llm.generate_response(prompt, config) for prompt in plain],
+        ),
+        (
+            "cached schema",
+            tokenize_prefixed,
+            lambda: [llm.generate_response(prompt, config) for prompt in prompts],
+        ),
+        (
+            f"cached schema, batch {args.batch_size}",
+            timed(lambda: [llm.process_input(batch) for batch in batches]),
+            lambda: [llm.generate_batch(batch, config) for batch in batches],
+        ),
+    ):
+        elapsed = timed(run)
+        print(
+            f"{name:<28}{1e3 * tokenize:>14.1f}{elapsed:>10.2f}"
+            f"{1e3 * elapsed / len(prompts):>14.1f}"
+        )
+    print(f"schema tokens cache: {llm.registry.prefix_tokens.snapshot()}")
@@ -0,0 +1,78 @@
+"""
+Time of the portfolio analytics for ten years of daily closes of 1000 assets, a few lots per
+asset with some of them closed.
+
+The benchmark runs on synthetic in-memory data, the price history query is measured by
+`api.benchmark.price_history`.
+
+Usage:
+    python -m api.benchmark.portfolio_analytics --assets 1000 --years 10
+"""
+import argparse
+import time
+import numpy as np
+from api.main.analytics import (
+    Lots,
+    analyze,
+    covariance,
+    daily_returns,
+    forward_fill,
+    holdings_matrix,
+    max_drawdown,
+)
+
+
+def create_data(assets: int, years: int, lots_per_asset: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    dates = np.arange(np.datetime64("2014-01-01"), np.datetime64(f"{2014 + years}-01-01"))
+    dates = dates[np.is_busday(dates)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), assets)), axis=0))
+    # holidays of single exchanges
+    closes[rng.random(closes.shape) < 0.01] = np.nan
+
+    count = assets * lots_per_asset
+    opened = rng.integers(0, len(dates), count)
+    closed = np.where(
+        rng.random(count) < 0.3,
+        dates[np.minimum(opened + rng.integers(1, 500, count), len(dates) - 1)],
+        np.datetime64("NaT"),
+    )
+    lots = Lots(
+        tickers=[f"T{i:04d}" for i in range(assets)],
+        asset=np.repeat(np.arange(assets), lots_per_asset),
+        volume=rng.integers(1, 100, count).astype(np.float64),
+        opened=dates[opened],
+        closed=closed.astype("datetime64[D]"),
+    )
+    return lots, dates, closes
+
+
+def timed(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--lots-per-asset", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lots, dates, closes = create_data(args.assets, args.years, args.lots_per_asset)
+    filled = forward_fill(closes)
+    holdings = holdings_matrix(dates, lots)
+    returns = daily_returns(holdings, filled)
+    print(f"{len(dates)} days x {args.assets} assets, {len(lots.volume)} lots")
+    for name, function in (
+        ("forward_fill", lambda: forward_fill(closes)),
+        ("holdings_matrix", lambda: holdings_matrix(dates, lots)),
+        ("daily_returns", lambda: daily_returns(holdings, filled)),
+        ("max_drawdown", lambda: max_drawdown(returns)),
+        ("covariance", lambda: covariance(filled)),
+        ("analyze", lambda: analyze(lots, dates, closes, risk_free=0.03)),
+    ):
+        print(f"{name:<16}{timed(function, args.repeat) * 1e3:>10.1f} ms")
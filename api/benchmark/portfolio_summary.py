@@ -0,0 +1,99 @@
+"""
+Latency of the portfolio summary endpoint (read from the positions snapshot) against
+aggregating the lots with the same `GROUP BY` the snapshot is built with and against loading
+every lot through the investments endpoint, for a user with a growing number of lots.
+
+The benchmark user and its lots are removed afterwards.
+
+Usage:
+    python -m api.benchmark.portfolio_summary --config test --lots 1000 10000 50000
+"""
+import argparse
+import random
+import time
+from typing import List
+from sqlalchemy import insert, delete, select
+from api.main import create_app, db, ENDPOINTS_CONFIG
+from api.main.config import CONFIG
+from api.main.database import Users, Investments, InvestedETFs, InvestedStocks, ETF, Stock
+from api.main.positions import aggregate_lots, apply_lots, lots as lot
+
+USERNAME = "benchmark_portfolio"
+
+
+def add_lots(user_id: int, count: int, etfs: List[str], stocks: List[str]) -> None:
+    rng = random.Random(count)
+    for cls, column, tickers in (
+        (InvestedETFs, "etf_ticker", etfs),
+        (InvestedStocks, "stock_ticker", stocks),
+    ):
+        rows = []
+        for _ in range(count // 2):
+            open_price = rng.uniform(10, 500)
+            row = {
+                "user_id": user_id,
+                column: rng.choice(tickers),
+                "volume": rng.randint(1, 100),
+                "open_price": open_price,
+                "last_known_price": open_price * rng.uniform(0.8, 1.2),
+            }
+            if rng.random() < 0.2:
+                row["close_price"] = open_price * rng.uniform(0.8, 1.2)
+            rows.append(row)
+        ids = db.session.scalars(insert(cls).returning(cls.investment_id), rows).all()
+        apply_lots(lot.investment_id.in_(ids))
+    db.session.commit()
+
+
+def timed(client, url: str, repeat: int) -> float:
+    client.get(url)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        assert client.get(url).status_code == 200
+    return 1e3 * (time.perf_counter() - start) / repeat
+
+
+def timed_recompute(user_id: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        db.session.execute(aggregate_lots(lot.user_id == user_id)).all()
+    return 1e3 * (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="test", choices=list(CONFIG))
+    parser.add_argument("--lots", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    CONFIG[args.config].DB_ONLY = True
+    app = create_app(args.config)
+    client = app.test_client()
+    url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/{USERNAME}"
+
+    with app.app_context():
+        user = Users(username=USERNAME, email=f"{USERNAME}@example.com", password="benchmark")
+        db.session.add(user)
+        db.session.commit()
+        etfs = list(db.session.scalars(select(ETF.etf_ticker)))
+        stocks = list(db.session.scalars(select(Stock.stock_ticker)))
+        try:
+            print(f"{'lots':>8}{'summary ms':>14}{'recompute ms':>14}{'all lots ms':>14}")
+            total = 0
+            for lots in sorted(args.lots):
+                add_lots(user.user_id, lots - total, etfs, stocks)
+                total = lots
+                summary = timed(client, f"{url}/summary", args.repeat)
+                recompute = timed_recompute(user.user_id, args.repeat)
+                listing = timed(client, url, 1)
+                print(f"{lots:>8}{summary:>14.1f}{recompute:>14.1f}{listing:>14.1f}")
+        finally:
+            ids = select(Investments.investment_id).where(Investments.user_id == user.user_id)
+            for table in (InvestedETFs.__table__, InvestedStocks.__table__):
+                db.session.execute(delete(table).where(table.c.investment_id.in_(ids)))
+            db.session.execute(
+                delete(Investments.__table__).where(Investments.user_id == user.user_id)
+            )
+            db.session.delete(user)
+            db.session.commit()
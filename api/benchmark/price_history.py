@@ -0,0 +1,75 @@
+"""
+Bulk load and query time of the price history for ten years of daily closes of 500 tickers,
+from PostgreSQL and from the memory-mapped cache.
+
+The benchmark tickers are removed afterwards.
+
+Usage:
+    python -m api.benchmark.price_history --config test --tickers 500 --years 10
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+from sqlalchemy import delete
+from api.main import create_app, db
+from api.main.config import CONFIG
+from api.main.database import PriceHistory
+from api.main.prices.history import PriceCache, PriceHistoryStore
+
+PREFIX = "BENCH"
+
+
+def create_records(tickers, years: int):
+    days = np.arange(np.datetime64("2014-01-01"), np.datetime64(f"{2014 + years}-01-01"))
+    days = days[np.is_busday(days)]
+    rng = np.random.default_rng(0)
+    for ticker in tickers:
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        yield from zip([ticker] * len(days), days, closes)
+
+
+def timed(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="test", choices=list(CONFIG))
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    CONFIG[args.config].DB_ONLY = True
+    app = create_app(args.config)
+    tickers = [f"{PREFIX}{i:04d}" for i in range(args.tickers)]
+    cache_dir = tempfile.mkdtemp()
+
+    with app.app_context():
+        store = PriceHistoryStore()
+        try:
+            start = time.perf_counter()
+            loaded = store.load(create_records(tickers, args.years))
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+            print(f"load {loaded} closes: {elapsed:.2f} s ({loaded / elapsed:.0f} rows/s)")
+
+            matrix = store.get_matrix(tickers)
+            print(f"matrix {matrix.closes.shape}, NaN: {int(np.isnan(matrix.closes).sum())}")
+            cached = PriceHistoryStore(PriceCache(cache_dir))
+            for name, function, repeat in (
+                ("PostgreSQL", lambda: store.get_matrix(tickers), args.repeat),
+                ("PostgreSQL, filling the cache", lambda: cached.get_matrix(tickers), 1),
+                ("memory-mapped cache", lambda: cached.get_matrix(tickers), args.repeat),
+            ):
+                print(f"get_matrix from {name}: {timed(function, repeat) * 1e3:.0f} ms")
+            assert np.array_equal(cached.get_matrix(tickers).closes, matrix.closes)
+        finally:
+            shutil.rmtree(cache_dir)
+            db.session.execute(delete(PriceHistory).where(PriceHistory.ticker.startswith(PREFIX)))
+            db.session.commit()
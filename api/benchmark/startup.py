@@ -0,0 +1,41 @@
+"""
+Time of `create_app` with and without the LLM endpoints and time until the models are ready.
+
+Usage:
+    python -m api.benchmark.startup --config test
+"""
+import argparse
+import time
+from api.main import create_app, ENDPOINTS_CONFIG
+from api.main.config import CONFIG
+
+
+def startup(config_name: str, db_only: bool) -> None:
+    config = CONFIG[config_name]
+    default = config.DB_ONLY
+    config.DB_ONLY = db_only
+    try:
+        start = time.perf_counter()
+        app = create_app(config_name)
+        created = time.perf_counter() - start
+    finally:
+        config.DB_ONLY = default
+
+    ready = created
+    if not db_only:
+        client = app.test_client()
+        while client.get(ENDPOINTS_CONFIG.LLM_READY_ENDPOINT).status_code == 503:
+            time.sleep(0.05)
+        ready = time.perf_counter() - start
+    mode = "DB_ONLY" if db_only else f"LLM ({app.config['LLM_LOADING']})"
+    print(f"{mode:<24}{1e3 * created:>18.1f}{1e3 * ready:>16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="test", choices=list(CONFIG))
+    args = parser.parse_args()
+
+    print(f"{'config':<24}{'create_app ms':>18}{'ready ms':>16}")
+    startup(args.config, db_only=True)
+    startup(args.config, db_only=False)
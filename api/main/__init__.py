@@ -1,28 +1,28 @@
+import atexit
+from functools import partial
 from flask_restful import Api
 from flask import Flask
-from api.main.resources.sql_resource import SQLController
-from api.main.resources.summary_resource import SummaryController
-from api.main.model.llm import LLM, LLMType
+from werkzeug.middleware.proxy_fix import ProxyFix
+from api.main.resources.sql_resource import SQLBatchController, SQLController
+from api.main.resources.summary_resource import SummaryBatchController, SummaryController
+from api.main.resources.qa_resource import QAController
+from api.main.model.llm import AdapterRegistry, LLMType, BatchScheduler
+from api.main.model.cache import GenerationCache, LRUCacheBackend, RedisCacheBackend
+from api.main.model.jobs import GenerationJobQueue
 from api.main.config import ENDPOINTS_CONFIG, CONFIG
 from api.main.common.error_handler import page_not_found
 from api.main.common.util import (
     create_sql_parser,
+    create_sql_batch_parser,
     create_summary_request_parser,
-    create_currencies,
-    create_users,
-    create_etfs,
-    create_stocks_data,
-    create_etf_investment_data,
-    create_stock_investments_data,
-    create_etf_providers,
-    create_replication_methods,
+    create_summary_batch_parser,
+    create_qa_parser,
 )
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_mail import Mail
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
-from sqlalchemy import insert
 
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
@@ -33,27 +33,59 @@ mail = Mail()
 
 from api.main.resources.users_resource import UserResource, UsersResource
 from api.main.resources.asset_resource import Asset, Assets
-from api.main.resources.investments_resource import UserInvestedAssets, Invest
+from api.main.resources.investments_resource import (
+    UserInvestedAssets,
+    UserPortfolioSummary,
+    UserPositions,
+    Invest,
+)
+from api.main.resources.import_resource import InvestmentsImport
+from api.main.resources.analytics_resource import PortfolioAnalytics
+from api.main.resources.scrape_jobs_resource import ScrapeJob, ScrapeJobs
+from api.main.resources.metrics_resource import LLMMetrics
+from api.main.resources.llm_jobs_resource import LLMJob, LLMJobs
+from api.main.resources.readiness_resource import LLMReadiness
 from api.main.blueprints.auth.auth import auth
 from api.main.blueprints.index import index
 from api.main.blueprints.asset import asset
+from api.main.commands import etfs_cli, positions_cli, prices_cli
+from api.main.asset_scraper.browser import BrowserPool, create_chrome_driver
+from api.main.asset_scraper.jobs import JobQueue
+from api.main.prices.history import PriceCache, PriceHistoryStore
+
+LLM_CONTROLLERS = {
+    LLMType.SQL: (SQLController, create_sql_parser, ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT),
+    LLMType.SUMMARY: (
+        SummaryController,
+        create_summary_request_parser,
+        ENDPOINTS_CONFIG.SUMMARY_ENDPOINT,
+    ),
+    LLMType.QA: (QAController, create_qa_parser, ENDPOINTS_CONFIG.QA_ENDPOINT),
+}
+
+LLM_BATCH_CONTROLLERS = {
+    LLMType.SQL: (
+        SQLBatchController,
+        create_sql_batch_parser,
+        ENDPOINTS_CONFIG.TEX2SQL_BATCH_ENDPOINT,
+    ),
+    LLMType.SUMMARY: (
+        SummaryBatchController,
+        create_summary_batch_parser,
+        ENDPOINTS_CONFIG.SUMMARY_BATCH_ENDPOINT,
+    ),
+}
 
 
 def create_app(config_name: str):
     app = Flask(__name__)
     app.config.from_object(CONFIG[config_name])
     CONFIG[config_name].init_app(app)
+    if app.config["PROXY_FIX_X_FOR"]:
+        # remote_addr of clients behind the proxies, generation limits are counted against it
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
 
-    from api.main.database import (
-        Currency,
-        Users,
-        ETF,
-        Stock,
-        InvestedETFs,
-        InvestedStocks,
-        ETFProviders,
-        ETFReplicationMethods,
-    )
+    from api.main.bootstrap import bootstrap_database
 
     api = Api(app)
     db.init_app(app)
@@ -66,19 +98,30 @@ def create_app(config_name: str):
     app.register_blueprint(auth)
     app.register_blueprint(index)
     app.register_blueprint(asset)
+    app.cli.add_command(positions_cli)
+    app.cli.add_command(prices_cli)
+    app.cli.add_command(etfs_cli)
+
+    browser_pool = BrowserPool(
+        size=app.config["SCRAPER_POOL_SIZE"],
+        factory=partial(create_chrome_driver, app.config["SCRAPER_PAGE_LOAD_TIMEOUT"]),
+        idle_timeout=app.config["SCRAPER_IDLE_TIMEOUT"],
+        max_pages=app.config["SCRAPER_MAX_PAGES"],
+    )
+    app.extensions["browser_pool"] = browser_pool
+    atexit.register(browser_pool.close)
+    scrape_jobs = JobQueue(
+        app,
+        workers=app.config["SCRAPE_WORKERS"],
+        max_attempts=app.config["SCRAPE_MAX_ATTEMPTS"],
+        backoff=app.config["SCRAPE_RETRY_BACKOFF"],
+        ttl=app.config["SCRAPE_JOB_TTL"],
+    )
+    app.extensions["scrape_jobs"] = scrape_jobs
+    atexit.register(scrape_jobs.close)
 
     with app.app_context():
-        db.metadata.drop_all(db.engine)
-        db.create_all()
-        db.session.execute(insert(Currency).values(create_currencies()))
-        db.session.execute(insert(ETFReplicationMethods).values(create_replication_methods()))
-        db.session.add_all([Users(**user) for user in create_users()])
-        db.session.execute(insert(ETFProviders).values(create_etf_providers()))
-        db.session.execute(insert(ETF).values(create_etfs()))
-        db.session.execute(insert(Stock).values(create_stocks_data()))
-        db.session.execute(insert(InvestedETFs), create_etf_investment_data())
-        db.session.execute(insert(InvestedStocks), create_stock_investments_data())
-        db.session.commit()
+        bootstrap_database(reset=app.config["RESET_DB"])
     print(f"Connected to {app.config['SQLALCHEMY_DATABASE_URI']}")
 
     api.add_resource(
@@ -91,28 +134,121 @@ def create_app(config_name: str):
         UserInvestedAssets,
         f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/<username>",
     )
+    api.add_resource(
+        UserPortfolioSummary,
+        f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/<username>/summary",
+    )
+    api.add_resource(
+        UserPositions,
+        f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/<username>/positions",
+    )
+    api.add_resource(
+        PortfolioAnalytics,
+        f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/<username>/analytics",
+        resource_class_kwargs={
+            "store": PriceHistoryStore(
+                PriceCache(app.config["PRICE_CACHE_DIR"]) if app.config["PRICE_CACHE_DIR"] else None
+            )
+        },
+    )
+    api.add_resource(ScrapeJobs, ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT)
+    api.add_resource(ScrapeJob, f"{ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT}/<job_id>")
+    api.add_resource(InvestmentsImport, f"{ENDPOINTS_CONFIG.IMPORT_ENDPOINT}/<username>")
     api.add_resource(
         Invest,
         f"{ENDPOINTS_CONFIG.INVEST_ENDPOINT}/<string:username>/<string:investment_type>",
     )
 
     if not CONFIG[config_name].DB_ONLY:
-        sql_model = LLM(LLMType.SQL)
-        sql_parser = create_sql_parser()
+        llm_types = [LLMType[name.strip().upper()] for name in app.config["LLM_ADAPTERS"]]
+        cpu_types = [LLMType[name.strip().upper()] for name in app.config["LLM_CPU_ADAPTERS"]]
+        registry = AdapterRegistry(
+            llm_types,
+            app.config["LLM_PAD_TO_MULTIPLE_OF"],
+            load=False,
+            cpu_task_types=cpu_types,
+            prefix_cache_size=app.config["LLM_PREFIX_CACHE_SIZE"],
+            retry_interval=app.config["LLM_LOAD_RETRY_INTERVAL"],
+        )
+        if app.config["LLM_LOADING"] == "eager":
+            registry.load()
+        elif app.config["LLM_LOADING"] == "background":
+            registry.load_in_background()
+        llm_jobs = GenerationJobQueue(
+            app.config["LLM_JOB_WORKERS"],
+            app.config["LLM_JOB_QUEUE_SIZE"],
+            app.config["LLM_JOB_CLIENT_LIMIT"],
+            app.config["LLM_JOB_TTL"],
+        )
+        app.extensions["llm_jobs"] = llm_jobs
+        atexit.register(llm_jobs.close)
+        schedulers = {}
+        job_tasks = {}
+        cache = GenerationCache(
+            LRUCacheBackend(app.config["LLM_CACHE_SIZE"], app.config["LLM_CACHE_TTL"]),
+            RedisCacheBackend(app.config["LLM_CACHE_REDIS_URL"], app.config["LLM_CACHE_TTL"])
+            if app.config["LLM_CACHE_REDIS_URL"]
+            else None,
+        )
+        app.extensions["llm_cache"] = cache
 
-        summary_model = LLM(LLMType.SUMMARY)
-        summary_parser = create_summary_request_parser()
+        for llm_type in llm_types:
+            controller, create_parser, endpoint = LLM_CONTROLLERS[llm_type]
+            schedulers[llm_type.name.lower()] = BatchScheduler(
+                registry.get(llm_type),
+                max_batch_size=app.config["LLM_MAX_BATCH_SIZE"],
+                max_wait_ms=app.config["LLM_BATCH_WINDOW_MS"],
+            )
+            api.add_resource(
+                controller,
+                endpoint,
+                resource_class_kwargs={
+                    "model": schedulers[llm_type.name.lower()],
+                    "parser": create_parser(),
+                    "cache": cache,
+                    "jobs": llm_jobs,
+                },
+            )
+            job_tasks[llm_type.name.lower()] = (
+                schedulers[llm_type.name.lower()],
+                create_parser(),
+                controller.prompt_from,
+            )
+            if llm_type not in LLM_BATCH_CONTROLLERS:
+                continue
+            controller, create_parser, endpoint = LLM_BATCH_CONTROLLERS[llm_type]
+            api.add_resource(
+                controller,
+                endpoint,
+                resource_class_kwargs={
+                    "model": schedulers[llm_type.name.lower()],
+                    "parser": create_parser(),
+                    "cache": cache,
+                    "max_items": app.config["LLM_MAX_BATCH_ITEMS"],
+                    "jobs": llm_jobs,
+                },
+            )
 
         api.add_resource(
-            SQLController,
-            ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT,
-            resource_class_kwargs={"model": sql_model, "parser": sql_parser},
+            LLMJobs,
+            ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT,
+            resource_class_kwargs={"tasks": job_tasks, "jobs": llm_jobs},
+        )
+        api.add_resource(
+            LLMJob,
+            f"{ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT}/<string:job_id>",
+            resource_class_kwargs={"jobs": llm_jobs},
         )
 
         api.add_resource(
-            SummaryController,
-            ENDPOINTS_CONFIG.SUMMARY_ENDPOINT,
-            resource_class_kwargs={"model": summary_model, "parser": summary_parser},
+            LLMMetrics,
+            ENDPOINTS_CONFIG.LLM_METRICS_ENDPOINT,
+            resource_class_kwargs={"schedulers": schedulers},
+        )
+        api.add_resource(
+            LLMReadiness,
+            ENDPOINTS_CONFIG.LLM_READY_ENDPOINT,
+            resource_class_kwargs={"registry": registry},
         )
 
     return app
@@ -0,0 +1,228 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from api.main import db
+from api.main.positions import lots as investments
+from api.main.prices.history import DateLike, PriceHistoryStore
+
+TRADING_DAYS = 252
+
+
+@dataclass
+class Lots:
+    """
+    Investments of a user as parallel arrays.
+
+    Attributes:
+        tickers (List[str]): Distinct tickers, columns of the price matrix.
+        asset (np.ndarray): Index of the ticker of every lot.
+        volume (np.ndarray): Volume of every lot.
+        opened (np.ndarray): `datetime64[D]` open day of every lot.
+        closed (np.ndarray): `datetime64[D]` close day of every lot, NaT if it is open.
+    """
+
+    tickers: List[str]
+    asset: np.ndarray
+    volume: np.ndarray
+    opened: np.ndarray
+    closed: np.ndarray
+
+
+def load_lots(user_id: int) -> Lots:
+    """
+    Lots of the user from `InvestedETFs` and `InvestedStocks` with one query.
+    """
+    ticker = func.coalesce(
+        investments.InvestedETFs.etf_ticker, investments.InvestedStocks.stock_ticker
+    )
+    rows = db.session.execute(
+        select(
+            ticker, investments.volume, investments.open_datetime, investments.close_datetime
+        ).where(investments.user_id == user_id)
+    ).all()
+    tickers, asset = np.unique(
+        np.array([row[0] for row in rows], dtype=object), return_inverse=True
+    )
+    return Lots(
+        tickers=tickers.tolist(),
+        asset=asset.astype(np.intp),
+        volume=np.array([row[1] for row in rows], dtype=np.float64),
+        opened=np.array([row[2] for row in rows], dtype="datetime64[D]"),
+        closed=np.array([row[3] for row in rows], dtype="datetime64[D]"),
+    )
+
+
+def holdings_matrix(dates: np.ndarray, lots: Lots) -> np.ndarray:
+    """
+    Volume of every asset held at the end of every day, a lot is held from its open day
+    until the day before it is closed.
+
+    Args:
+        dates (np.ndarray): Sorted `datetime64[D]` days, shape (days,).
+        lots (Lots): Lots of the portfolio.
+
+    Returns:
+        np.ndarray: Holdings, shape (days, assets).
+    """
+    days = len(dates)
+    start = np.searchsorted(dates, lots.opened)
+    end = np.where(np.isnat(lots.closed), days, np.searchsorted(dates, lots.closed))
+    changes = np.zeros((days + 1, len(lots.tickers)))
+    np.add.at(changes, (start, lots.asset), lots.volume)
+    np.add.at(changes, (end, lots.asset), -lots.volume)
+    return np.cumsum(changes[:-1], axis=0)
+
+
+def forward_fill(closes: np.ndarray) -> np.ndarray:
+    """
+    Carry the last close over days without one (holidays of one exchange), leading NaNs are
+    kept.
+    """
+    rows = np.arange(len(closes))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isnan(closes), 0, rows), axis=0)
+    return closes[last_valid, np.arange(closes.shape[1])]
+
+
+def portfolio_values(holdings: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """
+    Market value of the portfolio at the end of every day, assets without a price yet are
+    left out.
+    """
+    return np.nansum(holdings * closes, axis=1)
+
+
+def daily_returns(holdings: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """
+    Time-weighted daily returns: the return of the holdings of the previous day, so buying
+    and selling do not count as gains or losses.
+
+    Returns:
+        np.ndarray: Returns of days 1..n, NaN on days when nothing with a price was held.
+    """
+    held = np.where(np.isnan(closes[1:]) | np.isnan(closes[:-1]), 0, holdings[:-1])
+    start = np.nansum(held * closes[:-1], axis=1)
+    end = np.nansum(held * closes[1:], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(start > 0, end / start - 1, np.nan)
+
+
+def annualized_volatility(returns: np.ndarray) -> float:
+    returns = returns[~np.isnan(returns)]
+    return float(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS)) if len(returns) > 1 else np.nan
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    """
+    Largest fall from a peak of the time-weighted wealth index, e.g. -0.25 for 25%.
+    """
+    wealth = np.cumprod(1 + np.nan_to_num(returns))
+    peaks = np.maximum.accumulate(np.concatenate(([1.0], wealth)))[1:]
+    return float(np.min(wealth / peaks - 1)) if len(wealth) else 0.0
+
+
+def sharpe_ratio(returns: np.ndarray, risk_free: float = 0.0) -> float:
+    """
+    Annualized Sharpe ratio.
+
+    Args:
+        returns (np.ndarray): Daily returns.
+        risk_free (float, optional): Annual risk-free rate. Defaults to 0.0.
+    """
+    returns = returns[~np.isnan(returns)]
+    if len(returns) < 2:
+        return np.nan
+    excess = returns - risk_free / TRADING_DAYS
+    std = np.std(excess, ddof=1)
+    return float(np.mean(excess) / std * np.sqrt(TRADING_DAYS)) if std > 0 else np.nan
+
+
+def covariance(closes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Annualized covariance and correlation of daily asset returns, over the days on which
+    every priced asset has a return. Rows and columns of assets without prices are NaN.
+
+    Args:
+        closes (np.ndarray): Forward filled closes, shape (days, assets).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Covariance and correlation, shape (assets, assets).
+    """
+    assets = closes.shape[1]
+    cov = np.full((assets, assets), np.nan)
+    corr = np.full((assets, assets), np.nan)
+    returns = closes[1:] / closes[:-1] - 1
+    priced = ~np.isnan(returns).all(axis=0)
+    returns = returns[:, priced]
+    returns = returns[~np.isnan(returns).any(axis=1)]
+    if len(returns) < 2:
+        return cov, corr
+    returns = returns - returns.mean(axis=0)
+    priced_cov = returns.T @ returns / (len(returns) - 1)
+    std = np.sqrt(np.diag(priced_cov))
+    cells = np.ix_(priced, priced)
+    cov[cells] = priced_cov * TRADING_DAYS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr[cells] = priced_cov / np.outer(std, std)
+    return cov, corr
+
+
+def analyze(
+    lots: Lots, dates: np.ndarray, closes: np.ndarray, risk_free: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Risk and return metrics of a portfolio.
+
+    Args:
+        lots (Lots): Lots of the portfolio.
+        dates (np.ndarray): `datetime64[D]` days, shape (days,).
+        closes (np.ndarray): Closes of `lots.tickers`, shape (days, assets).
+        risk_free (float, optional): Annual risk-free rate. Defaults to 0.0.
+
+    Returns:
+        Dict[str, Any]: Value series, returns and metrics.
+    """
+    closes = forward_fill(closes)
+    holdings = holdings_matrix(dates, lots)
+    values = portfolio_values(holdings, closes)
+    returns = daily_returns(holdings, closes)
+    valid = returns[~np.isnan(returns)]
+    total_return = float(np.prod(1 + valid) - 1)
+    cov, corr = covariance(closes)
+    return {
+        "dates": dates,
+        "values": values,
+        "returns": returns,
+        "total_return": total_return,
+        "annualized_return": (1 + total_return) ** (TRADING_DAYS / len(valid)) - 1
+        if len(valid)
+        else np.nan,
+        "annualized_volatility": annualized_volatility(returns),
+        "max_drawdown": max_drawdown(returns),
+        "sharpe_ratio": sharpe_ratio(returns, risk_free),
+        "covariance": cov,
+        "correlation": corr,
+    }
+
+
+def analyze_user(
+    user_id: int,
+    store: PriceHistoryStore,
+    start: DateLike = None,
+    end: DateLike = None,
+    risk_free: float = 0.0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Analyze the portfolio of a user over the price history between two days.
+
+    Returns:
+        Optional[Dict[str, Any]]: Metrics, see `analyze`, with `tickers`. None if the user
+            has no lots or no prices of them were loaded.
+    """
+    user_lots = load_lots(user_id)
+    if not len(user_lots.tickers):
+        return None
+    matrix = store.get_matrix(user_lots.tickers, start, end)
+    if not len(matrix.dates):
+        return None
+    return {"tickers": matrix.tickers, **analyze(user_lots, matrix.dates, matrix.closes, risk_free)}
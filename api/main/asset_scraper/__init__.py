@@ -3,8 +3,9 @@ from dataclasses import dataclass, field
 from api.main import db
 from sqlalchemy import select
 from api.main.database import Investments
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from api.main.config import AssetTypes
+from api.main.asset_scraper.browser import BrowserPool, get_browser_pool
 from flask import current_app
 
 
@@ -27,6 +28,8 @@ def get_types_from_DB() -> Dict[str, int]:
 url_mapper = {
     AssetTypes.ETF: {
         "exists_url": "https://www.justetf.com/en/find-etf.html?query={}",
+        # unknown ETFs redirect to the search
+        "search_url": "https://www.justetf.com/en/find-etf.html",
         "details_url": "https://www.justetf.com/en/etf-profile.html?query={query}&isin={isin}",
     },
     AssetTypes.STOCK: {"todo": "todo"},
@@ -37,6 +40,8 @@ url_mapper = {
 class ScraperConfig:
     ASSET_TYPE: int
     URLS: Dict[str, str] = field(init=False)
+    # browsers of the application by default
+    POOL: Optional[BrowserPool] = None
 
     def __post_init__(self):
         types = get_types_from_DB()
@@ -46,6 +51,8 @@ class ScraperConfig:
                     f"Asset type {t} not found in AssetTypes enum. Add {t} to the AssetTypes!"
                 )
         self.URLS = url_mapper[self.ASSET_TYPE]
+        if self.POOL is None:
+            self.POOL = get_browser_pool()
 
 
 class AssetScraper(ABC):
@@ -0,0 +1,244 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from flask import current_app
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+
+def create_chrome_driver(page_load_timeout: float = 30) -> webdriver.Chrome:
+    """
+    Starts a headless Chrome.
+
+    Args:
+        page_load_timeout (float, optional): Seconds to wait for a page. Defaults to 30.
+
+    Returns:
+        webdriver.Chrome: Driver of the browser.
+    """
+    opt = webdriver.ChromeOptions()
+    opt.add_argument("--disable-gpu")
+    opt.add_argument("--disable-extensions")
+    opt.add_argument("--disable-infobars")
+    opt.add_argument("--start-maximized")
+    opt.add_argument("--disable-notifications")
+    opt.add_argument("--headless")
+    opt.add_argument("--no-sandbox")
+    opt.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(options=opt)
+    driver.set_page_load_timeout(page_load_timeout)
+    return driver
+
+
+def is_healthy(driver: Any) -> bool:
+    """
+    Checks if the browser still responds, a crashed browser or a closed window raises.
+    """
+    try:
+        driver.current_url
+    except WebDriverException:
+        return False
+    return True
+
+
+@dataclass
+class _Browser:
+    driver: Any
+    pages: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class BrowserPool:
+    """
+    Bounded pool of headless browsers shared by the scrapers. Browsers are started on demand,
+    checked before they are handed out and quit when they were idle for `idle_timeout` or
+    loaded `max_pages` pages, so a leaking or crashed browser is eventually replaced.
+
+    Args:
+        size (int, optional): Maximum number of running browsers. Defaults to 2.
+        factory (Callable[[], Any], optional): Starts a browser. Defaults to
+            `create_chrome_driver`.
+        idle_timeout (float, optional): Seconds after which an idle browser is quit, 0 keeps
+            them running. Defaults to 300.
+        max_pages (int, optional): Pages loaded by a browser before it is restarted, 0 for
+            no limit. Defaults to 100.
+        acquire_timeout (float, optional): Seconds to wait for a free browser. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        factory: Callable[[], Any] = create_chrome_driver,
+        idle_timeout: float = 300,
+        max_pages: int = 100,
+        acquire_timeout: float = 60,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Browser pool size must be at least 1!")
+        self.size = size
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.max_pages = max_pages
+        self.acquire_timeout = acquire_timeout
+        self.stats = {"started": 0, "recycled": 0, "unhealthy": 0, "pages": 0}
+        # the most recently used browser is handed out first, so the others can grow idle
+        self._idle: List[_Browser] = []
+        self._running = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+
+    @contextmanager
+    def browser(self) -> Iterator[Any]:
+        """
+        Borrows a browser for loading one page, it is returned to the pool on exit.
+
+        Raises:
+            TimeoutError: If no browser became free within `acquire_timeout`.
+
+        Yields:
+            Iterator[Any]: Driver of the browser.
+        """
+        browser = self._acquire()
+        try:
+            yield browser.driver
+        finally:
+            self._release(browser)
+
+    def _acquire(self) -> _Browser:
+        deadline = time.monotonic() + self.acquire_timeout
+        expired: List[_Browser] = []
+        try:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed!")
+                    expired += self._take_expired()
+                    if len(self._idle):
+                        browser = self._idle.pop()
+                        break
+                    if self._running < self.size:
+                        self._running += 1
+                        browser = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free browser within {self.acquire_timeout} s!")
+                    self._condition.wait(remaining)
+        finally:
+            # browsers are started and quit outside of the lock, it takes seconds
+            self._quit(expired)
+
+        if browser is not None and not is_healthy(browser.driver):
+            self._count("unhealthy")
+            self._quit([browser])
+            browser = None
+        if browser is None:
+            browser = self._start()
+        return browser
+
+    def _start(self) -> _Browser:
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify()
+            raise
+        self._count("started")
+        self._start_reaper()
+        return _Browser(driver)
+
+    def _release(self, browser: _Browser) -> None:
+        browser.pages += 1
+        browser.last_used = time.monotonic()
+        worn_out = self.max_pages and browser.pages >= self.max_pages
+        with self._condition:
+            self.stats["pages"] += 1
+            if not self._closed and not worn_out:
+                self._idle.append(browser)
+                self._condition.notify()
+                return
+            self._running -= 1
+            self.stats["recycled"] += bool(worn_out)
+            self._condition.notify()
+        self._quit([browser])
+
+    def _count(self, name: str) -> None:
+        with self._condition:
+            self.stats[name] += 1
+
+    def _take_expired(self) -> List[_Browser]:
+        """
+        Removes browsers idle for longer than `idle_timeout`, the caller holds the lock.
+        """
+        if not self.idle_timeout:
+            return []
+        now = time.monotonic()
+        expired = [b for b in self._idle if now - b.last_used >= self.idle_timeout]
+        if len(expired):
+            self._idle = [b for b in self._idle if now - b.last_used < self.idle_timeout]
+            self._running -= len(expired)
+            self.stats["recycled"] += len(expired)
+        return expired
+
+    def recycle_idle(self) -> int:
+        """
+        Quits browsers idle for longer than `idle_timeout`.
+
+        Returns:
+            int: Number of quit browsers.
+        """
+        with self._condition:
+            expired = self._take_expired()
+            self._condition.notify_all()
+        self._quit(expired)
+        return len(expired)
+
+    def _start_reaper(self) -> None:
+        if not self.idle_timeout or self._reaper is not None:
+            return
+        with self._condition:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, daemon=True)
+                self._reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed, self.idle_timeout / 2)
+                if self._closed:
+                    return
+            self.recycle_idle()
+
+    @staticmethod
+    def _quit(browsers: List[_Browser]) -> None:
+        for browser in browsers:
+            try:
+                browser.driver.quit()
+            except WebDriverException:
+                pass
+
+    def close(self) -> None:
+        """
+        Quits the idle browsers, browsers in use are quit when they are returned.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+            self._condition.notify_all()
+        self._quit(idle)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self.stats, "running": self._running, "idle": len(self._idle)}
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Browser pool of the current application, created by `create_app`.
+    """
+    return current_app.extensions["browser_pool"]
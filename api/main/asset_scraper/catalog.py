@@ -0,0 +1,227 @@
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from api.main import db
+from api.main.asset_scraper import ScraperConfig
+from api.main.asset_scraper.scrapers import ETFScraper
+from api.main.database import ETF, ETFProviders, ETFReplicationMethods
+
+# columns refreshed when a scraped ETF is already in the catalog
+UPDATED_COLUMNS = (
+    "fund_currency",
+    "name",
+    "ter",
+    "volatility_1yr",
+    "distribution_policy",
+    "distribution_frequency",
+    "fund_size",
+    "fund_provider",
+    "replication_method_id",
+    "holdings",
+    "top_holdings",
+)
+
+
+def read_pairs(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads ISIN and ticker pairs from a CSV file with `isin,ticker` columns, a header is
+    optional.
+
+    Returns:
+        List[Tuple[str, str]]: Upper case ISINs and tickers, duplicated ISINs are dropped.
+    """
+    pairs = {}
+    with open(path, newline="") as file:
+        for row in csv.reader(file):
+            if len(row) < 2 or row[0].strip().lower() == "isin":
+                continue
+            pairs.setdefault(row[0].strip().upper(), row[1].strip().upper())
+    return list(pairs.items())
+
+
+@dataclass
+class IngestReport:
+    total: int = 0
+    skipped: int = 0
+    scraped: int = 0
+    stored: int = 0
+    failed: List[Dict[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "scraped": self.scraped,
+            "stored": self.stored,
+            "failed": self.failed,
+            "seconds": self.seconds,
+            "per_second": self.scraped / self.seconds if self.seconds else 0.0,
+        }
+
+
+def upsert_etfs(rows: List[Dict[str, Any]]) -> int:
+    """
+    Inserts or updates scraped ETFs with their providers and replication methods, three
+    statements for the whole batch. The caller commits the transaction.
+
+    ETFs are matched by ISIN, a new ISIN with the ticker of another ETF violates the primary
+    key and fails the statement instead of overwriting the other fund.
+
+    Args:
+        rows (List[Dict[str, Any]]): Outputs of `ETFScraper.scrape`.
+
+    Returns:
+        int: Number of stored ETFs.
+    """
+    if not len(rows):
+        return 0
+    db.session.execute(
+        pg_insert(ETFProviders)
+        .values([{"provider_name": name} for name in {row["fund_provider"] for row in rows}])
+        .on_conflict_do_nothing()
+    )
+    methods = {row["replication"] for row in rows}
+    db.session.execute(
+        pg_insert(ETFReplicationMethods)
+        .values([{"replication_method": method} for method in methods])
+        .on_conflict_do_nothing(index_elements=["replication_method"])
+    )
+    method_ids = dict(
+        db.session.execute(
+            select(
+                ETFReplicationMethods.replication_method,
+                ETFReplicationMethods.replication_method_id,
+            ).where(ETFReplicationMethods.replication_method.in_(methods))
+        ).all()
+    )
+
+    values = []
+    for row in rows:
+        row = dict(row)
+        row["replication_method_id"] = method_ids[row.pop("replication")]
+        values.append(row)
+    statement = pg_insert(ETF).values(values)
+    return db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ETF.isin],
+            set_={name: statement.excluded[name] for name in UPDATED_COLUMNS},
+        )
+    ).rowcount
+
+
+class CatalogIngester:
+    """
+    Scrapes many ETFs from justETF in parallel and stores them in batches.
+
+    At most `concurrency` pages are loaded at once by browsers of the pool of `config`, the
+    pool should hold as many browsers. ETFs whose ISIN is already in the catalog are skipped.
+
+    Args:
+        config (ScraperConfig): ETF scraper config with the browser pool.
+        concurrency (int, optional): Parallel scrapes. Defaults to 2.
+        batch_size (int, optional): ETFs stored and committed together. Defaults to 100.
+        progress (Callable[[IngestReport], None], optional): Called after every batch.
+            Defaults to None.
+    """
+
+    def __init__(
+        self,
+        config: ScraperConfig,
+        concurrency: int = 2,
+        batch_size: int = 100,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> None:
+        self.config = config
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def scrape(self, isin: str, ticker: str) -> Dict[str, Any]:
+        if len(ticker) > ETF.__table__.c.etf_ticker.type.length:
+            raise ValueError(f"Ticker {ticker} is too long!")
+        scraper = ETFScraper.check_if_exists(self.config, isin=isin, query=ticker)
+        page_isin = scraper.page_isin()
+        if page_isin != isin:
+            raise ValueError(f"justETF answered {ticker} with the page of {page_isin}!")
+        return {**scraper.scrape(), "isin": isin, "etf_ticker": ticker}
+
+    def run(self, pairs: Iterable[Tuple[str, str]]) -> IngestReport:
+        """
+        Scrapes and stores the ETFs.
+
+        Args:
+            pairs (Iterable[Tuple[str, str]]): ISIN and ticker of every ETF.
+
+        Returns:
+            IngestReport: Counts, failures and duration.
+        """
+        start = time.perf_counter()
+        pairs = list(pairs)
+        known = set(
+            db.session.scalars(select(ETF.isin).where(ETF.isin.in_([isin for isin, _ in pairs])))
+        )
+        report = IngestReport(total=len(pairs), skipped=sum(isin in known for isin, _ in pairs))
+        # tickers of other ETFs, the ISINs of the catalog are skipped
+        taken = set(
+            db.session.scalars(
+                select(ETF.etf_ticker).where(ETF.etf_ticker.in_([ticker for _, ticker in pairs]))
+            )
+        )
+        pending = {}
+        for isin, ticker in pairs:
+            if isin in known:
+                continue
+            if ticker in pending or ticker in taken:
+                report.failed.append(
+                    {"isin": isin, "ticker": ticker, "error": f"Duplicated ticker {ticker}!"}
+                )
+                continue
+            pending[ticker] = isin
+
+        batch: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="etf-scraper") as executor:
+            futures = {
+                executor.submit(self.scrape, isin, ticker): (isin, ticker)
+                for ticker, isin in pending.items()
+            }
+            for future in as_completed(futures):
+                isin, ticker = futures[future]
+                try:
+                    batch.append(future.result())
+                    report.scraped += 1
+                except Exception as e:
+                    report.failed.append({"isin": isin, "ticker": ticker, "error": str(e)})
+                if len(batch) >= self.batch_size:
+                    self._store(batch, report, start)
+                    batch = []
+            self._store(batch, report, start)
+        return report
+
+    def _store(self, batch: List[Dict[str, Any]], report: IngestReport, start: float) -> None:
+        try:
+            report.stored += upsert_etfs(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # one invalid row, e.g. an unknown currency, fails the whole statement
+            for row in batch:
+                try:
+                    report.stored += upsert_etfs([row])
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    report.failed.append(
+                        {
+                            "isin": row["isin"],
+                            "ticker": row["etf_ticker"],
+                            "error": str(getattr(e, "orig", e)).strip(),
+                        }
+                    )
+        report.seconds = time.perf_counter() - start
+        if self.progress is not None:
+            self.progress(report)
@@ -0,0 +1,208 @@
+import heapq
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+from flask import Flask, current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from api.main import db
+from api.main.config import AssetTypes
+from api.main.database import ASSET_TYPE_MAPPING, ETFProviders, ETFReplicationMethods
+from api.main.asset_scraper import ScraperConfig
+from api.main.asset_scraper.scrapers import ASSET_TYPE_TO_SCRAPER_CLASS
+from api.main.common.jobs import BaseJobQueue, JobStatus
+
+
+class PermanentError(Exception):
+    """
+    Failure that retrying does not fix, e.g. the asset does not exist.
+    """
+
+
+@dataclass
+class ScrapeJob:
+    asset_type: AssetTypes
+    isin: str
+    ticker: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JobStatus.QUEUED
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def key(self) -> Tuple[AssetTypes, str]:
+        return self.asset_type, self.isin
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "asset_type": self.asset_type.name,
+            "isin": self.isin,
+            "ticker": self.ticker,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def scrape_asset(job: ScrapeJob) -> None:
+    """
+    Scrapes the asset of the job and inserts it, runs inside an application context.
+
+    Raises:
+        PermanentError: If the asset does not exist or cannot be stored.
+    """
+    if job.asset_type not in ASSET_TYPE_TO_SCRAPER_CLASS:
+        raise PermanentError(f"Scraping {job.asset_type.name} is not supported!")
+    asset_class = ASSET_TYPE_MAPPING[job.asset_type]["class"]
+    if db.session.scalar(select(asset_class).where(asset_class.isin == job.isin)) is not None:
+        return
+    try:
+        asset_scraper = ASSET_TYPE_TO_SCRAPER_CLASS[job.asset_type].check_if_exists(
+            ScraperConfig(job.asset_type), isin=job.isin, query=job.ticker
+        )
+    except ValueError:
+        raise PermanentError(
+            f"{job.asset_type.name} with ISIN: {job.isin}, ticker: {job.ticker} does not exists!"
+        )
+
+    asset_details = asset_scraper.scrape()
+    replication = asset_details.pop("replication")
+    asset_details["replication_method_id"] = db.session.scalar(
+        select(ETFReplicationMethods.replication_method_id).where(
+            ETFReplicationMethods.replication_method == replication
+        )
+    )
+    if asset_details["replication_method_id"] is None:
+        raise PermanentError(f"Replication method {replication} does not exist in the database!")
+
+    db.session.execute(
+        pg_insert(ETFProviders)
+        .values(provider_name=asset_details["fund_provider"])
+        .on_conflict_do_nothing()
+    )
+    asset_schema = ASSET_TYPE_MAPPING[job.asset_type]["schema"]()
+    db.session.add(asset_schema.load(asset_details, transient=True))
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        # inserted concurrently, e.g. by /asset/add or the catalog ingestion
+        if db.session.scalar(select(asset_class).where(asset_class.isin == job.isin)) is not None:
+            return
+        # e.g. the ticker belongs to another asset, scraping it again does not help
+        reason = str(e.orig).splitlines()[0]
+        raise PermanentError(f"{job.asset_type.name} {job.ticker} cannot be stored: {reason}")
+
+
+class JobQueue(BaseJobQueue[ScrapeJob]):
+    """
+    Background scraping of assets by a pool of worker threads.
+
+    A job for an asset that is already queued or running is not created again, the pending
+    job is returned instead. Failed attempts are retried after `backoff * 2 ** (attempt - 1)`
+    seconds unless they raise `PermanentError`. Finished jobs are kept for `ttl` seconds.
+
+    Args:
+        app (Flask): Application whose context the workers run in.
+        workers (int, optional): Number of worker threads, started on the first job.
+            Defaults to 2.
+        max_attempts (int, optional): Attempts before a job fails. Defaults to 3.
+        backoff (float, optional): Seconds before the first retry. Defaults to 2.0.
+        ttl (float, optional): Seconds finished jobs are kept. Defaults to 3600.
+        handler (Callable[[ScrapeJob], None], optional): Runs a job. Defaults to
+            `scrape_asset`.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        workers: int = 2,
+        max_attempts: int = 3,
+        backoff: float = 2.0,
+        ttl: float = 3600,
+        handler: Callable[[ScrapeJob], None] = scrape_asset,
+    ) -> None:
+        super().__init__(workers, ttl)
+        self.app = app
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.handler = handler
+        self._pending: Dict[Tuple[AssetTypes, str], ScrapeJob] = {}
+
+    def submit(self, asset_type: AssetTypes, isin: str, ticker: str) -> ScrapeJob:
+        """
+        Queues a scrape of the asset.
+
+        Returns:
+            ScrapeJob: New job or the pending job of the same asset.
+        """
+        job = ScrapeJob(asset_type, isin.upper(), ticker.upper())
+        with self._condition:
+            self._check_open()
+            if job.key in self._pending:
+                return self._pending[job.key]
+            self._jobs[job.job_id] = self._pending[job.key] = job
+            self._schedule(job, 0)
+        return job
+
+    def _schedule(self, job: ScrapeJob, delay: float) -> None:
+        # retried jobs wait in the heap until they are ready
+        self._push(time.monotonic() + delay, job)
+
+    def _next(self) -> Optional[ScrapeJob]:
+        with self._condition:
+            while not self._closed:
+                if len(self._heap):
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        job = heapq.heappop(self._heap)[2]
+                        job.status = JobStatus.RUNNING
+                        job.attempts += 1
+                        return job
+                else:
+                    wait = None
+                self._condition.wait(wait)
+        return None
+
+    def _work(self) -> None:
+        while (job := self._next()) is not None:
+            with self.app.app_context():
+                try:
+                    self.handler(job)
+                except Exception as e:
+                    db.session.rollback()
+                    self._failed(job, e)
+                else:
+                    self._finish(job, JobStatus.DONE)
+
+    def _failed(self, job: ScrapeJob, error: Exception) -> None:
+        job.error = str(error) or type(error).__name__
+        if isinstance(error, PermanentError) or job.attempts >= self.max_attempts:
+            current_app.logger.warning("Scrape job %s failed: %s", job.job_id, job.error)
+            self._finish(job, JobStatus.FAILED)
+            return
+        with self._condition:
+            job.status = JobStatus.QUEUED
+            self._schedule(job, self.backoff * 2 ** (job.attempts - 1))
+
+    def _finish(self, job: ScrapeJob, status: str) -> None:
+        with self._condition:
+            job.status = status
+            job.finished_at = time.time()
+            if status == JobStatus.DONE:
+                job.error = None
+            del self._pending[job.key]
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Scrape job queue of the current application, created by `create_app`.
+    """
+    return current_app.extensions["scrape_jobs"]
@@ -1,25 +1,79 @@
+import soupsieve
 from bs4 import BeautifulSoup
-from typing import Dict, Any, Union
-from requests import get
+from bs4.filter import ElementFilter
+from typing import Dict, Any, Optional, Union
 from api.main.asset_scraper import AssetScraper, ScraperConfig, AssetTypes
-from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+# seconds to wait for the details table after the page was loaded
+DETAILS_TIMEOUT = 3
+
+COMPANY_SELECTOR = soupsieve.compile("table.table.mb-0 tbody tr a span")
+PERCENTAGE_SELECTOR = soupsieve.compile("table.table tbody tr div.right.ws span")
+DETAILS_ROW_SELECTOR = soupsieve.compile("table tbody tr")
+IDENTIFIER_SELECTOR = soupsieve.compile("div.identfier span.val")
+
+
+class ETFDetailsFilter(ElementFilter):
+    """
+    Builds only the subtrees read by `ETFScraper`: the details table, the holdings columns,
+    the profile body values, the identifiers and the title. Everything else on the page
+    (scripts, navigation, charts, listings) is skipped while parsing.
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        attrs = attrs or {}
+        classes = set(attrs.get("class", "").split())
+        if name == "table":
+            return "etf-data-table" in classes
+        if name == "div":
+            return (
+                "columns-2" in classes
+                or "identfier" in classes
+                or {"d-flex", "d-flex-column"} <= classes
+            )
+        if name == "h1":
+            return attrs.get("id") == "etf-title"
+        return False
+
+    def allow_string_creation(self, string) -> bool:
+        # strings inside the kept subtrees are not filtered
+        return False
+
+
+def parse_details_page(html: str) -> BeautifulSoup:
+    """
+    Parses an ETF details page with lxml into a soup of the subtrees read by `ETFScraper`.
+    """
+    return BeautifulSoup(html, "lxml", parse_only=ETFDetailsFilter())
+
 
 class ETFScraper(AssetScraper):
-    def __init__(self, isin: str, ticker: str, config: ScraperConfig, arguments) -> None:
+    def __init__(
+        self,
+        isin: str,
+        ticker: str,
+        config: ScraperConfig,
+        arguments,
+        soup: Optional[BeautifulSoup] = None,
+    ) -> None:
         self.config = config
         self.arguments = arguments
         self.isin = isin
         self.ticker = ticker
-        self._create_soup()
+        if soup is None:
+            self._create_soup()
+        else:
+            self.soup = soup
 
     @classmethod
     def check_if_exists(cls, config: ScraperConfig, **url_kwargs) -> "ETFScraper":
         """
-        Checks if ETF with given ticker and ISIN exists.
+        Checks if ETF with given ticker and ISIN exists, the loaded details page is kept
+        for scraping.
 
         Args:
             config (ScraperConfig): Config for specific asset type.
@@ -30,36 +84,65 @@ class ETFScraper(AssetScraper):
         Returns:
             ETFScraper: Scraper object.
         """
-        response = get(config.URLS["details_url"].format(**url_kwargs), allow_redirects=False)
-        if response.status_code == 302:
+        soup = cls._load_details(config, url_kwargs)
+        if soup is None:
             raise ValueError(f"Could not find ETF with {url_kwargs}")
         return cls(
             isin=url_kwargs["isin"].upper(),
             ticker=url_kwargs["query"].upper(),
             config=config,
             arguments=url_kwargs,
+            soup=soup,
         )
 
+    @staticmethod
+    def _load_details(config: ScraperConfig, arguments: Dict[str, str]) -> Optional[BeautifulSoup]:
+        """
+        Loads the details page with a browser of the pool.
+
+        Raises:
+            TimeoutException: If the page did not load within `DETAILS_TIMEOUT` seconds.
+            WebDriverException: If the page redirected anywhere but the search.
+
+        Returns:
+            Optional[BeautifulSoup]: Soup of the page, None if the ETF was not found and
+                justETF redirected to the search.
+        """
+        url = config.URLS["details_url"].format(**arguments)
+        table = (By.CLASS_NAME, "etf-data-table")
+        with config.POOL.browser() as driver:
+            driver.get(url)
+            # a slow page is not a missing ETF, the timeout is raised so the scrape is retried
+            WebDriverWait(driver, DETAILS_TIMEOUT).until(
+                EC.any_of(EC.presence_of_element_located(table), EC.url_changes(url))
+            )
+            if len(driver.find_elements(*table)):
+                return parse_details_page(driver.page_source)
+            if driver.current_url.startswith(config.URLS["search_url"]):
+                return None
+            raise WebDriverException(f"Unexpected page {driver.current_url} instead of {url}!")
+
     def _create_soup(self):
         """
-        Creates selenium webdriver for scraping and creates bs4 soup.
+        Loads the details page and creates bs4 soup.
+        """
+        soup = self._load_details(self.config, self.arguments)
+        if soup is None:
+            raise ValueError(f"Could not find ETF with {self.arguments}")
+        self.soup = soup
+
+    def page_isin(self) -> Optional[str]:
+        """
+        Reads the ISIN shown on the details page, justETF may answer a query with another
+        fund than the one of the ISIN in the URL.
+
+        Returns:
+            Optional[str]: ISIN of the loaded page, None if the page does not show it.
         """
-        opt = webdriver.ChromeOptions()
-        opt.add_argument("--disable-gpu")
-        opt.add_argument("--disable-extensions")
-        opt.add_argument("--disable-infobars")
-        opt.add_argument("--start-maximized")
-        opt.add_argument("--disable-notifications")
-        opt.add_argument("--headless")
-        opt.add_argument("--no-sandbox")
-        opt.add_argument("--disable-dev-shm-usage")
-        driver = webdriver.Chrome(options=opt)
-        url = self.config.URLS["details_url"].format(**self.arguments)
-        driver.get(url)
-        wait = WebDriverWait(driver, 3)
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "etf-data-table")))
-        self.soup = BeautifulSoup(driver.page_source, "html.parser")
-        driver.quit()
+        identifiers = IDENTIFIER_SELECTOR.select(self.soup, limit=1)
+        if not len(identifiers):
+            return None
+        return identifiers[0].get_text(strip=True).upper()
 
     def _find_top_holdings(self) -> Dict[str, str]:
         """
@@ -70,11 +153,11 @@ class ETFScraper(AssetScraper):
         """
         holdings = {}
         for tag in self.soup.find_all("div", {"class": "columns-2"}):
-            company = tag.select("table.table.mb-0 tbody tr a span")
+            company = COMPANY_SELECTOR.select(tag)
             companies = [row.get_text(strip=True) for row in company]
             if not len(companies):
                 continue
-            percentage = tag.select("table.table tbody tr div.right.ws span")
+            percentage = PERCENTAGE_SELECTOR.select(tag)
             percentages = [p.get_text(strip=True) for p in percentage]
             holdings = {k: v for k, v in zip(companies, percentages)}
         return holdings
@@ -88,7 +171,7 @@ class ETFScraper(AssetScraper):
         """
         details = {}
         table = self.soup.find("table", {"class": "table etf-data-table"})
-        for tr in table.select("table tbody tr"):
+        for tr in DETAILS_ROW_SELECTOR.select(table):
             td_elements = tr.find_all("td")
             data = td_elements[0].get_text(strip=True).lower().replace(" ", "_")
             value = td_elements[1].get_text(strip=True)
@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template
 from flask_login import current_user, login_required
+from sqlalchemy import select
+from api.main import db
+from api.main.database import PortfolioPosition
 
 
 index = Blueprint("index", __name__, url_prefix="/")
@@ -18,4 +21,9 @@ def index_page():
 def profile():
     if not current_user.confirmed:
         return render_template("unconfirmed.html")
-    return render_template("profile.html", user=current_user), 200
+    positions = db.session.scalars(
+        select(PortfolioPosition)
+        .where(PortfolioPosition.user_id == current_user.user_id)
+        .order_by(PortfolioPosition.type, PortfolioPosition.ticker)
+    ).all()
+    return render_template("profile.html", user=current_user, positions=positions), 200
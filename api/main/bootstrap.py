@@ -0,0 +1,138 @@
+from api.main import db, bcrypt
+from api.main.database import (
+    Currency,
+    Users,
+    ETF,
+    Stock,
+    Investments,
+    InvestedETFs,
+    InvestedStocks,
+    ETFProviders,
+    ETFReplicationMethods,
+    SchemaVersion,
+)
+from api.main.common.util import (
+    create_currencies,
+    create_users,
+    create_etfs,
+    create_stocks_data,
+    create_etf_investment_data,
+    create_stock_investments_data,
+    create_etf_providers,
+    create_replication_methods,
+)
+from api.main.positions import rebuild_positions
+from sqlalchemy import select, insert, func, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Optional
+
+# bump when tables, columns, indexes or seed data change
+SCHEMA_VERSION = 6
+# key of the PostgreSQL advisory lock taken by workers bootstrapping at the same time
+BOOTSTRAP_LOCK_KEY = 0x706F7274
+
+
+def get_schema_version() -> Optional[int]:
+    """
+    Returns:
+        Optional[int]: Version of the schema in the database, None if it wasn't bootstrapped.
+    """
+    if not inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        return None
+    return db.session.scalar(select(func.max(SchemaVersion.version)))
+
+
+def bootstrap_database(reset: bool = False) -> None:
+    """
+    Create the schema and seed data if the database is not at `SCHEMA_VERSION`.
+
+    When the schema is up to date it costs a single version lookup. Otherwise only missing
+    tables are created and seed rows are upserted (`ON CONFLICT DO NOTHING`), existing data
+    is left untouched.
+
+    Args:
+        reset (bool, optional): Drop all tables and recreate them from scratch
+            (for tests and development only!). Defaults to False.
+    """
+    if not reset and get_schema_version() == SCHEMA_VERSION:
+        db.session.commit()
+        return
+
+    with db.engine.connect() as lock_connection:
+        lock_connection.execute(select(func.pg_advisory_lock(BOOTSTRAP_LOCK_KEY)))
+        try:
+            if reset:
+                db.metadata.drop_all(db.engine)
+            elif get_schema_version() == SCHEMA_VERSION:
+                # another worker bootstrapped the database while this one waited for the lock
+                db.session.commit()
+                return
+            db.create_all()
+            create_missing_indexes()
+            seed_database()
+            # positions are maintained incrementally afterwards
+            rebuild_positions()
+            db.session.execute(
+                pg_insert(SchemaVersion).values(version=SCHEMA_VERSION).on_conflict_do_nothing()
+            )
+            db.session.commit()
+        finally:
+            lock_connection.execute(select(func.pg_advisory_unlock(BOOTSTRAP_LOCK_KEY)))
+
+
+def create_missing_indexes() -> None:
+    """
+    Create indexes added to tables that already existed (`create_all` skips such tables).
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def seed_database() -> None:
+    """
+    Insert seed rows that are missing with one bulk statement per table.
+    """
+    db.session.execute(pg_insert(Currency).on_conflict_do_nothing(), create_currencies())
+    db.session.execute(
+        pg_insert(ETFReplicationMethods).on_conflict_do_nothing(), create_replication_methods()
+    )
+    db.session.execute(pg_insert(ETFProviders).on_conflict_do_nothing(), create_etf_providers())
+    db.session.execute(pg_insert(ETF).on_conflict_do_nothing(), create_etfs())
+    db.session.execute(pg_insert(Stock).on_conflict_do_nothing(), create_stocks_data())
+
+    users = create_users()
+    existing = set(
+        db.session.scalars(
+            select(Users.username).where(Users.username.in_([user["username"] for user in users]))
+        )
+    )
+    # hash passwords only for the users that will be inserted, bcrypt is slow on purpose
+    new_users = [
+        {
+            **{k: v for k, v in user.items() if k != "password"},
+            "password_hash": bcrypt.generate_password_hash(user["password"]).decode("utf-8"),
+        }
+        for user in users
+        if user["username"] not in existing
+    ]
+    if new_users:
+        db.session.execute(pg_insert(Users).on_conflict_do_nothing(), new_users)
+
+    # investments have no natural key, so they are seeded only into an empty table
+    if db.session.scalar(select(func.count()).select_from(Investments)) == 0:
+        user_ids = dict(db.session.execute(select(Users.username, Users.user_id)).all())
+        for cls, rows in [
+            (InvestedETFs, create_etf_investment_data()),
+            (InvestedStocks, create_stock_investments_data()),
+        ]:
+            db.session.execute(
+                insert(cls),
+                [
+                    {
+                        **{k: v for k, v in row.items() if k != "username"},
+                        "user_id": user_ids[row["username"]],
+                    }
+                    for row in rows
+                ],
+            )
@@ -0,0 +1,139 @@
+import csv
+import time
+from functools import partial
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+from api.main import db
+from api.main.asset_scraper import ScraperConfig
+from api.main.asset_scraper.browser import BrowserPool, create_chrome_driver
+from api.main.asset_scraper.catalog import CatalogIngester, IngestReport, read_pairs
+from api.main.config import AssetTypes
+from api.main.database import Users
+from api.main.positions import check_positions, rebuild_positions
+from api.main.prices.history import PriceCache, PriceHistoryStore
+from api.main.prices.refresh import refresh_prices
+from api.main.prices.sources import FilePriceSource
+
+positions_cli = AppGroup("positions", help="Maintain the portfolio_positions snapshot.")
+prices_cli = AppGroup("prices", help="Refresh last known prices of open investments.")
+etfs_cli = AppGroup("etfs", help="Maintain the ETF catalog.")
+
+
+def resolve_user_id(username: str):
+    if username is None:
+        return None
+    user_id = db.session.scalar(select(Users.user_id).where(Users.username == username))
+    if user_id is None:
+        raise click.BadParameter(f"User '{username}' not found in the database!")
+    return user_id
+
+
+@positions_cli.command("check")
+@click.option("--username", default=None, help="Check only this user.")
+def check_positions_command(username):
+    """Compare positions with a full recompute from the lots."""
+    mismatches = check_positions(resolve_user_id(username))
+    for mismatch in mismatches:
+        click.echo(mismatch)
+    if len(mismatches):
+        raise click.ClickException(f"{len(mismatches)} inconsistent position(s)!")
+    click.echo("Positions are consistent.")
+
+
+@positions_cli.command("rebuild")
+@click.option("--username", default=None, help="Rebuild only this user.")
+def rebuild_positions_command(username):
+    """Recompute positions from the lots."""
+    rebuild_positions(resolve_user_id(username))
+    db.session.commit()
+    click.echo("Positions rebuilt.")
+
+
+@prices_cli.command("refresh")
+@click.option(
+    "--file",
+    "path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV (ticker,price) or JSON file with the prices.",
+)
+@click.option(
+    "--interval", type=float, default=None, help="Refresh every INTERVAL seconds until stopped."
+)
+def refresh_prices_command(path, interval):
+    """Set last_known_price of all open investments."""
+    source = FilePriceSource(path)
+    while True:
+        report = refresh_prices(source)
+        db.session.commit()
+        click.echo(
+            f"Quoted {report['quoted']}/{report['securities']} securities,"
+            f" updated {report['updated_lots']} investments."
+        )
+        if len(report["missing"]):
+            click.echo(f"No price for: {', '.join(report['missing'])}")
+        if interval is None:
+            break
+        time.sleep(interval)
+
+
+@prices_cli.command("load")
+@click.option(
+    "--file",
+    "path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV file with ticker,date,close columns.",
+)
+def load_price_history_command(path):
+    """Insert or replace daily closes in the price history."""
+    cache_dir = current_app.config["PRICE_CACHE_DIR"]
+    store = PriceHistoryStore(PriceCache(cache_dir) if cache_dir else None)
+    with open(path, newline="") as file:
+        records = ((row["ticker"], row["date"], row["close"]) for row in csv.DictReader(file))
+        loaded = store.load(records)
+    db.session.commit()
+    click.echo(f"Loaded {loaded} closes.")
+
+
+@etfs_cli.command("ingest")
+@click.option(
+    "--file",
+    "path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV file with isin,ticker columns.",
+)
+@click.option("--concurrency", type=int, default=4, help="Parallel scrapes (browsers).")
+@click.option("--batch-size", type=int, default=100, help="ETFs stored in one transaction.")
+def ingest_etfs_command(path, concurrency, batch_size):
+    """Scrape ETFs from justETF and upsert them into the catalog."""
+    pairs = read_pairs(path)
+
+    def progress(report: IngestReport):
+        done = report.scraped + len(report.failed)
+        click.echo(
+            f"{done}/{report.total - report.skipped} scraped, {report.stored} stored,"
+            f" {len(report.failed)} failed, {report.to_dict()['per_second']:.2f} ETFs/s"
+        )
+
+    pool = BrowserPool(
+        size=concurrency,
+        factory=partial(create_chrome_driver, current_app.config["SCRAPER_PAGE_LOAD_TIMEOUT"]),
+        max_pages=current_app.config["SCRAPER_MAX_PAGES"],
+    )
+    try:
+        ingester = CatalogIngester(
+            ScraperConfig(AssetTypes.ETF, POOL=pool), concurrency, batch_size, progress
+        )
+        report = ingester.run(pairs)
+    finally:
+        pool.close()
+    for failure in report.failed:
+        click.echo(f"{failure['isin']} {failure['ticker']}: {failure['error']}", err=True)
+    click.echo(
+        f"Stored {report.stored} of {report.total} ETFs ({report.skipped} already in the"
+        f" catalog, {len(report.failed)} failed) in {report.seconds:.1f} s."
+    )
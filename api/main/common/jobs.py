@@ -0,0 +1,91 @@
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+
+J = TypeVar("J")
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class BaseJobQueue(ABC, Generic[J]):
+    """
+    Jobs run by a pool of worker threads that are started on the first job.
+
+    Jobs wait in a heap ordered by the key they are pushed with and then by the order they
+    were pushed. Finished jobs (with `finished_at` set) are kept for `ttl` seconds.
+
+    Args:
+        workers (int): Number of worker threads.
+        ttl (float): Seconds finished jobs are kept.
+    """
+
+    def __init__(self, workers: int, ttl: float) -> None:
+        self.workers = workers
+        self.ttl = ttl
+        self._jobs: Dict[str, J] = {}
+        # (key, sequence, job)
+        self._heap: List[Tuple[Any, int, J]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def get(self, job_id: str) -> Optional[J]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def _check_open(self) -> None:
+        """
+        Called with the condition held before a job is added, drops expired jobs.
+
+        Raises:
+            RuntimeError: If the queue is closed.
+        """
+        if self._closed:
+            raise RuntimeError("Job queue is closed!")
+        self._expire()
+
+    def _push(self, key: Any, job: J) -> None:
+        """
+        Adds the job to the heap and wakes a worker, called with the condition held.
+        """
+        heapq.heappush(self._heap, (key, next(self._sequence), job))
+        self._condition.notify()
+        self._start_workers()
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _expire(self) -> None:
+        deadline = time.time() - self.ttl
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < deadline
+        ]:
+            del self._jobs[job_id]
+
+    @abstractmethod
+    def _work(self) -> None:
+        """
+        Runs jobs of the heap until the queue is closed, the target of the worker threads.
+        """
+
+    def close(self) -> None:
+        """
+        Stops the workers after their current jobs, queued jobs are not run.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
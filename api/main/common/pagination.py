@@ -0,0 +1,109 @@
+import base64
+import json
+from urllib.parse import urlencode
+from flask import abort, request
+from marshmallow import Schema
+from sqlalchemy import Select, select
+from sqlalchemy.orm import InstrumentedAttribute
+from typing import Any, Dict, List, Optional, Tuple
+from api.main import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(value: Any) -> str:
+    """
+    Encode the primary key of the last returned row into an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, primary_key: InstrumentedAttribute) -> Any:
+    """
+    Decode a cursor created by `encode_cursor`, aborts with 400 unless it holds a value of
+    the type of the primary key.
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        abort(400, "Invalid cursor!")
+    python_type = primary_key.type.python_type
+    # bool is a subclass of int but never a key
+    if not isinstance(value, python_type) or isinstance(value, bool):
+        abort(400, "Invalid cursor!")
+    return value
+
+
+def project_fields(model, schema: Schema, fields: Optional[str]) -> List[str]:
+    """
+    Columns of the model to select, either requested with `fields=a,b` or all columns
+    dumped by the schema.
+
+    Args:
+        model: ORM class.
+        schema (Schema): Schema used to dump the rows.
+        fields (Optional[str]): Comma separated field names.
+
+    Returns:
+        List[str]: Names of the columns.
+    """
+    available = [name for name in schema.dump_fields if name in model.__table__.columns]
+    if not fields:
+        return available
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    invalid = [field for field in requested if field not in available]
+    if invalid:
+        abort(400, f"Invalid fields: {', '.join(invalid)}! Available: {', '.join(available)}.")
+    return requested
+
+
+def paginate(
+    model,
+    primary_key: InstrumentedAttribute,
+    schema: Schema,
+    args: Dict[str, Any],
+    query: Optional[Select] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Keyset pagination over the primary key with column projection, only `limit` rows of the
+    requested columns are loaded regardless of the size of the table.
+
+    Args:
+        model: ORM class.
+        primary_key (InstrumentedAttribute): Primary key column used for ordering.
+        schema (Schema): Schema used to dump the rows.
+        args (Dict[str, Any]): Parsed `limit`, `cursor` and `fields` arguments.
+        query (Optional[Select], optional): Query to add conditions to. Defaults to None.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, str]]: Page of dumped rows and headers
+            with the cursor of the next page (if there is one).
+    """
+    limit = args.get("limit") or DEFAULT_LIMIT
+    if not 0 < limit <= MAX_LIMIT:
+        abort(400, f"Limit must be between 1 and {MAX_LIMIT}!")
+    fields = project_fields(model, schema, args.get("fields"))
+
+    columns = [getattr(model, field) for field in fields]
+    query = (select(model) if query is None else query).with_only_columns(
+        *columns, primary_key.label("_cursor")
+    )
+    if args.get("cursor"):
+        query = query.where(primary_key > decode_cursor(args["cursor"], primary_key))
+    rows = db.session.execute(query.order_by(primary_key).limit(limit + 1)).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = encode_cursor(rows[-1]._cursor)
+        headers["X-Next-Cursor"] = cursor
+        headers["Link"] = f'<{request.base_url}?{next_page_query(cursor)}>; rel="next"'
+    dump_schema = schema.__class__(only=fields)
+    return [dump_schema.dump(row._asdict()) for row in rows], headers
+
+
+def next_page_query(cursor: str) -> str:
+    args = request.args.copy()
+    args["cursor"] = cursor
+    return urlencode(list(args.items(multi=True)))
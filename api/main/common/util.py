@@ -1,4 +1,4 @@
-from flask_restful import reqparse, fields
+from flask_restful import reqparse, fields, inputs
 
 response_blueprint = {
     "code": fields.Integer,
@@ -6,6 +6,33 @@ response_blueprint = {
     "tokenizer_warning": fields.String,
 }
 
+batch_response_blueprint = {
+    "code": fields.Integer,
+    "results": fields.List(
+        fields.Nested(
+            {
+                "generated_sequence": fields.List(fields.String),
+                "tokenizer_warning": fields.String,
+            }
+        )
+    ),
+}
+
+portfolio_valuation_blueprint = {
+    "lots": fields.Integer,
+    "open_lots": fields.Integer,
+    "market_value": fields.Float,
+    "cost_basis": fields.Float,
+    "unrealized_profit": fields.Float,
+    "realized_profit": fields.Float,
+}
+
+portfolio_summary_blueprint = {
+    "username": fields.String,
+    **portfolio_valuation_blueprint,
+    "by_type": fields.List(fields.Nested({"type": fields.String, **portfolio_valuation_blueprint})),
+}
+
 
 def create_sql_parser() -> reqparse.RequestParser:
     sql_parser = reqparse.RequestParser()
@@ -47,6 +74,24 @@ def create_sql_parser() -> reqparse.RequestParser:
     return sql_parser
 
 
+def create_sql_batch_parser() -> reqparse.RequestParser:
+    sql_batch_parser = create_sql_parser()
+    sql_batch_parser.replace_argument(
+        "sql_table", type=str, required=False, help="Code generating SQL table of the questions."
+    )
+    sql_batch_parser.remove_argument("question")
+    sql_batch_parser.add_argument(
+        "questions", type=str, action="append", help="Questions regarding the SQL table."
+    )
+    sql_batch_parser.add_argument(
+        "items",
+        type=dict,
+        action="append",
+        help="Objects with sql_table and question, used instead of sql_table and questions.",
+    )
+    return sql_batch_parser
+
+
 def create_summary_request_parser() -> reqparse.RequestParser:
     summary_request_parser = reqparse.RequestParser()
     summary_request_parser.add_argument("text", type=str, required=True, help="Text to summarize.")
@@ -81,9 +126,113 @@ def create_summary_request_parser() -> reqparse.RequestParser:
         default=512,
         help="Maximum number of tokens to generate.",
     )
+    summary_request_parser.add_argument(
+        "stream",
+        type=bool,
+        required=False,
+        default=False,
+        help="Stream generated tokens as Server-Sent Events.",
+    )
     return summary_request_parser
 
 
+def create_summary_batch_parser() -> reqparse.RequestParser:
+    summary_batch_parser = create_summary_request_parser()
+    summary_batch_parser.remove_argument("text")
+    summary_batch_parser.remove_argument("stream")
+    summary_batch_parser.add_argument(
+        "texts", type=str, action="append", required=True, help="Texts to summarize."
+    )
+    return summary_batch_parser
+
+
+def create_qa_parser() -> reqparse.RequestParser:
+    qa_parser = reqparse.RequestParser()
+    qa_parser.add_argument("question", type=str, required=True, help="Financial question.")
+    qa_parser.add_argument(
+        "context", type=str, required=False, default=None, help="Context of the question."
+    )
+    qa_parser.add_argument(
+        "num_return_sequences",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of sequences to return. (To work properly do_sample=True!)",
+    )
+    qa_parser.add_argument(
+        "temperature",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Temperature for sampling logits. (Works only with do_sample=True)",
+    )
+    qa_parser.add_argument(
+        "top_k", type=int, required=False, default=50, help="Top k probabilities to sample from."
+    )
+    qa_parser.add_argument(
+        "do_sample",
+        type=bool,
+        required=False,
+        default=False,
+        help="Multinomial sampling from logits.",
+    )
+    qa_parser.add_argument(
+        "max_new_tokens",
+        type=int,
+        required=False,
+        default=256,
+        help="Maximum number of tokens to generate.",
+    )
+    return qa_parser
+
+
+def create_analytics_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "start", type=str, required=False, location="args", help="First day (YYYY-MM-DD)."
+    )
+    parser.add_argument(
+        "end", type=str, required=False, location="args", help="Last day (YYYY-MM-DD)."
+    )
+    parser.add_argument(
+        "risk_free",
+        type=float,
+        default=0.0,
+        location="args",
+        help="Annual risk-free rate used by the Sharpe ratio, e.g. 0.03.",
+    )
+    parser.add_argument(
+        "series",
+        type=inputs.boolean,
+        default=False,
+        location="args",
+        help="Include daily values and returns.",
+    )
+    return parser
+
+
+def create_pagination_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "limit", type=int, required=False, location="args", help="Maximum number of rows."
+    )
+    parser.add_argument(
+        "cursor",
+        type=str,
+        required=False,
+        location="args",
+        help="Cursor of the next page returned in X-Next-Cursor header.",
+    )
+    parser.add_argument(
+        "fields",
+        type=str,
+        required=False,
+        location="args",
+        help="Comma separated fields to return.",
+    )
+    return parser
+
+
 def create_user_parser() -> reqparse.RequestParser:
     user_parser = reqparse.RequestParser()
     user_parser.add_argument("username", type=str, required=True, help="Username.")
@@ -170,6 +319,43 @@ def create_invest_parser() -> reqparse.RequestParser:
     return invest_etf_parser
 
 
+def create_scrape_job_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "asset_type", type=str, required=True, help="Asset type, e.g. 'etf', is required"
+    )
+    parser.add_argument("isin", type=str, required=True, help="ISIN is required")
+    parser.add_argument("ticker", type=str, required=True, help="Ticker is required")
+    return parser
+
+
+def create_llm_job_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "task", type=str, required=True, help="Task of the generation, e.g. 'sql' or 'summary'."
+    )
+    parser.add_argument(
+        "priority",
+        type=int,
+        default=5,
+        choices=range(1, 10),
+        help="Priority from 1 (first) to 9 (last).",
+    )
+    return parser
+
+
+def create_llm_job_wait_parser() -> reqparse.RequestParser:
+    parser = reqparse.RequestParser()
+    parser.add_argument(
+        "wait",
+        type=float,
+        default=0.0,
+        location="args",
+        help="Seconds to wait for the job to finish.",
+    )
+    return parser
+
+
 def create_invest_etf_parser() -> reqparse.RequestParser:
     parser = create_invest_parser()
     parser.add_argument("etf_ticker", type=str, required=True, help="ETF ticker is required")
@@ -84,7 +84,7 @@ class Currency(db.Model):
 class Investments(db.Model):
     __tablename__ = "investments"
     investment_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), index=True)
     type = db.Column(db.String(40), nullable=False)
     volume = db.Column(db.Numeric(9, 2), nullable=False)
     open_price = db.Column(db.Numeric(9, 2), nullable=False)
@@ -98,24 +98,45 @@ class Investments(db.Model):
 
     @hybrid_property
     def profit(self):
-        if self.close_price:
+        # same branches as the SQL expression, a price of 0 is still a price
+        if self.close_price is not None:
             return (self.close_price - self.open_price) * self.volume
-        elif self.last_known_price and self.close_price is None:
+        elif self.last_known_price is not None:
             return (self.last_known_price - self.open_price) * self.volume
         return None
 
+    @profit.expression
+    def profit(cls):
+        return db.case(
+            (cls.close_price.is_not(None), (cls.close_price - cls.open_price) * cls.volume),
+            (
+                cls.last_known_price.is_not(None),
+                (cls.last_known_price - cls.open_price) * cls.volume,
+            ),
+            else_=None,
+        )
+
     @hybrid_property
     def duration(self):
         if self.close_datetime is None:
             return None
         return self.close_datetime - self.open_datetime
 
+    @duration.expression
+    def duration(cls):
+        # NULL close_datetime propagates through the subtraction
+        return cls.close_datetime - cls.open_datetime
+
     @hybrid_property
     def market_value(self):
         if self.last_known_price is None:
             return None
         return self.last_known_price * self.volume
 
+    @market_value.expression
+    def market_value(cls):
+        return cls.last_known_price * cls.volume
+
     __mapper_args__ = {"polymorphic_on": "type"}
 
 
@@ -126,13 +147,13 @@ class ETF(db.Model):
     name = db.Column(db.String(100), nullable=False)
     google_ticker = db.Column(db.String(20), nullable=True)
     isin = db.Column(db.String(12), nullable=False, unique=True)
-    ter = db.Column(db.Numeric(6, 2), nullable=False)
-    volatility_1yr = db.Column(db.Numeric(6, 2), nullable=True)
+    ter = db.Column(db.Numeric(6, 2), nullable=False, index=True)
+    volatility_1yr = db.Column(db.Numeric(6, 2), nullable=True, index=True)
     distribution_policy = db.Column(
         db.Enum("Accumulating", "Distributing", name="distribution_policy"), nullable=False
     )
     distribution_frequency = db.Column(db.String(20), nullable=True)
-    fund_size = db.Column(db.Numeric(20, 2), nullable=True)
+    fund_size = db.Column(db.Numeric(20, 2), nullable=True, index=True)
     fund_provider = db.Column(db.String, db.ForeignKey("etf_providers.provider_name"))
     replication_method_id = db.Column(
         db.ForeignKey("etf_replication_methods.replication_method_id")
@@ -168,7 +189,7 @@ class Stock(db.Model):
     name = db.Column(db.String(50), nullable=False)
     google_ticker = db.Column(db.String(20), nullable=False)
     isin = db.Column(db.String(12), nullable=False)
-    dividend_yield = db.Column(db.Numeric(2, 2), nullable=False)
+    dividend_yield = db.Column(db.Numeric(2, 2), nullable=False, index=True)
     currency = db.relationship("Currency", back_populates="stock")
     user_stocks = db.relationship("InvestedStocks", back_populates="stock_fk")
 
@@ -179,7 +200,7 @@ class InvestedStocks(Investments):
         db.Integer, db.ForeignKey("investments.investment_id"), primary_key=True
     )
 
-    stock_ticker = db.Column(db.ForeignKey("stocks.stock_ticker"))
+    stock_ticker = db.Column(db.ForeignKey("stocks.stock_ticker"), index=True)
     stock_fk = db.relationship("Stock", back_populates="user_stocks")
 
     __mapper_args__ = {
@@ -193,12 +214,60 @@ class InvestedETFs(Investments):
         db.Integer, db.ForeignKey("investments.investment_id"), primary_key=True
     )
 
-    etf_ticker = db.Column(db.ForeignKey("etfs.etf_ticker"))
+    etf_ticker = db.Column(db.ForeignKey("etfs.etf_ticker"), index=True)
     etf_fk = db.relationship("ETF", back_populates="user_etfs")
 
     __mapper_args__ = {"polymorphic_identity": "etfs"}
 
 
+class SchemaVersion(db.Model):
+    __tablename__ = "schema_version"
+    version = db.Column(db.Integer, primary_key=True)
+    applied_at = db.Column(
+        db.TIMESTAMP(timezone=False), nullable=False, server_default=db.func.now()
+    )
+
+
+class PortfolioPosition(db.Model):
+    """
+    Aggregated lots of a user per security, maintained incrementally by `api.main.positions`.
+    """
+
+    __tablename__ = "portfolio_positions"
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True
+    )
+    type = db.Column(db.String(40), primary_key=True)
+    ticker = db.Column(db.String(5), primary_key=True)
+    lots = db.Column(db.Integer, nullable=False)
+    open_lots = db.Column(db.Integer, nullable=False)
+    # of the open lots
+    volume = db.Column(db.Numeric(16, 2), nullable=False)
+    cost_basis = db.Column(db.Numeric(18, 4), nullable=False)
+    market_value = db.Column(db.Numeric(18, 4), nullable=False)
+    unrealized_profit = db.Column(db.Numeric(18, 4), nullable=False)
+    # of the closed lots
+    realized_profit = db.Column(db.Numeric(18, 4), nullable=False)
+
+    @hybrid_property
+    def average_open_price(self):
+        if not self.volume:
+            return None
+        return self.cost_basis / self.volume
+
+
+class PriceHistory(db.Model):
+    """
+    Daily closes, range partitioned by year, see `api.main.prices.history`.
+    """
+
+    __tablename__ = "price_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (date)"}
+    ticker = db.Column(db.String(20), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    close = db.Column(db.Double, nullable=False)
+
+
 class ETFSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = ETF
@@ -254,6 +323,19 @@ class InvestedETFsSchema(InvestmentsSchema):
         include_fk = True
 
 
+class PortfolioPositionSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = PortfolioPosition
+        exclude = ("user_id",)
+
+    volume = ma.Float(places=2)
+    cost_basis = ma.Float(places=2)
+    market_value = ma.Float(places=2)
+    unrealized_profit = ma.Float(places=2)
+    realized_profit = ma.Float(places=2)
+    average_open_price = ma.Float(places=2, dump_only=True, allow_none=True)
+
+
 TYPE_TO_TICKER_MAPPING = {AssetTypes.ETF: "etf_ticker", AssetTypes.STOCK: "stock_ticker"}
 
 ASSET_TYPE_MAPPING: Dict[AssetTypes, Dict] = {
@@ -0,0 +1,275 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from sqlalchemy import Table, func, insert, select
+from api.main import db
+from api.main.config import AssetTypes
+from api.main.database import (
+    ASSET_TYPE_MAPPING,
+    TYPE_TO_TICKER_MAPPING,
+    InvestedETFs,
+    InvestedStocks,
+    Investments,
+)
+from api.main.positions import apply_lots, lots
+from api.main.resources.asset_resource import parse_asset_type
+
+INVESTMENT_CLASSES = {AssetTypes.ETF: InvestedETFs, AssetTypes.STOCK: InvestedStocks}
+# columns of the investments table filled from a record, in COPY order
+INVESTMENT_COLUMNS = (
+    "investment_id",
+    "user_id",
+    "type",
+    "volume",
+    "open_price",
+    "open_datetime",
+    "close_datetime",
+    "close_price",
+    "last_known_price",
+)
+PRICE_FIELDS = ("open_price", "close_price", "last_known_price")
+DATETIME_FIELDS = ("open_datetime", "close_datetime")
+# investments.volume and prices are NUMERIC(9, 2)
+MAX_NUMERIC = Decimal("10000000")
+
+Record = Union[Dict[str, Any], ValueError]
+
+# files repeat a handful of type names, resolving them is slow compared to parsing a row
+_parse_asset_type = lru_cache(maxsize=64)(parse_asset_type)
+
+
+def read_csv(stream: IO[str]) -> Iterator[Tuple[int, Record]]:
+    """
+    Read records of a CSV file with a header row.
+
+    Yields:
+        Tuple[int, Record]: Line number and the record.
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        if None in record:
+            yield reader.line_num, ValueError("Too many values!")
+        else:
+            yield reader.line_num, record
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[Tuple[int, Record]]:
+    """
+    Read records of a JSON Lines file, blank lines are skipped.
+
+    Yields:
+        Tuple[int, Record]: Line number and the record or the error of a malformed line.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("Expected a JSON object!")
+            continue
+        yield line_number, record
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _decimal(record: Dict[str, Any], field: str, required: bool = False) -> Optional[Decimal]:
+    value = record.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"'{field}' is required!")
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid number '{value}' for '{field}'!")
+    if not number.is_finite() or not 0 <= number < MAX_NUMERIC:
+        raise ValueError(f"'{field}' must be between 0 and {MAX_NUMERIC}!")
+    return number
+
+
+def _datetime(record: Dict[str, Any], field: str) -> Optional[datetime]:
+    value = record.get(field)
+    if value is None or value == "":
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid ISO 8601 datetime '{value}' for '{field}'!")
+
+
+def parse_record(record: Dict[str, Any]) -> Tuple[AssetTypes, str, Dict[str, Any]]:
+    """
+    Validate a record of the import file, e.g.
+    `{"type": "etf", "ticker": "VTI", "volume": 10, "open_price": 200.5}`.
+
+    Args:
+        record (Dict[str, Any]): Record with `type`, `ticker`, `volume`, `open_price` and
+            optional `open_datetime`, `close_datetime`, `close_price`, `last_known_price`.
+
+    Raises:
+        ValueError: Record is invalid.
+
+    Returns:
+        Tuple[AssetTypes, str, Dict[str, Any]]: Asset type, ticker and column values.
+    """
+    asset_type = _parse_asset_type(str(record.get("type") or ""))
+    if asset_type is None:
+        raise ValueError(f"Type '{record.get('type')}' not supported!")
+    ticker = str(record.get("ticker") or "").strip()
+    if not ticker:
+        raise ValueError("'ticker' is required!")
+
+    values = {"volume": _decimal(record, "volume", required=True)}
+    if values["volume"] == 0:
+        raise ValueError("'volume' must be positive!")
+    for field in PRICE_FIELDS:
+        values[field] = _decimal(record, field, required=field == "open_price")
+    for field in DATETIME_FIELDS:
+        values[field] = _datetime(record, field)
+    return asset_type, ticker, values
+
+
+class InvestmentImporter:
+    """
+    Import investments of a user in batches.
+
+    Records are validated in Python, tickers are checked with one query per batch
+    for the tickers not seen yet and valid rows are written with PostgreSQL `COPY`
+    (or multi-row `INSERT`s) under preallocated ids, so a batch costs a fixed number of
+    round trips regardless of its size. Invalid records are reported and skipped.
+
+    Args:
+        user_id (int): Owner of the imported investments.
+        batch_size (int, optional): Records written at once. Defaults to 10000.
+        method (str, optional): 'copy' or 'insert'. Defaults to "copy".
+    """
+
+    def __init__(self, user_id: int, batch_size: int = 10000, method: str = "copy"):
+        if method not in ("copy", "insert"):
+            raise ValueError(f"Unknown import method '{method}'!")
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.method = method
+        self.imported = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.known_tickers: Dict[AssetTypes, Set[str]] = {t: set() for t in AssetTypes}
+        self.missing_tickers: Dict[AssetTypes, Set[str]] = {t: set() for t in AssetTypes}
+        self.now: Optional[datetime] = None
+
+    def run(self, records: Iterable[Tuple[int, Record]]) -> Dict[str, Any]:
+        """
+        Import the records, the caller commits the transaction.
+
+        Args:
+            records (Iterable[Tuple[int, Record]]): Line numbers and records, see `READERS`.
+
+        Returns:
+            Dict[str, Any]: Report with the number of imported rows and per-line errors.
+        """
+        batch = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                batch.append((line_number, *parse_record(record)))
+            except ValueError as e:
+                self.errors.append({"line": line_number, "error": str(e)})
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if len(batch):
+            self.write(batch)
+        # unknown tickers are reported when their batch is written
+        self.errors.sort(key=lambda error: error["line"])
+        return {"imported": self.imported, "failed": len(self.errors), "errors": self.errors}
+
+    def validate_tickers(self, batch: List[Tuple[int, AssetTypes, str, Dict[str, Any]]]) -> None:
+        for asset_type in AssetTypes:
+            unknown = {
+                ticker
+                for _, row_type, ticker, _ in batch
+                if row_type == asset_type
+                and ticker not in self.known_tickers[asset_type]
+                and ticker not in self.missing_tickers[asset_type]
+            }
+            if not len(unknown):
+                continue
+            column = getattr(
+                ASSET_TYPE_MAPPING[asset_type]["class"], TYPE_TO_TICKER_MAPPING[asset_type]
+            )
+            found = set(db.session.scalars(select(column).where(column.in_(unknown))))
+            self.known_tickers[asset_type] |= found
+            self.missing_tickers[asset_type] |= unknown - found
+
+    def write(self, batch: List[Tuple[int, AssetTypes, str, Dict[str, Any]]]) -> None:
+        self.validate_tickers(batch)
+        rows = []
+        for line_number, asset_type, ticker, values in batch:
+            if ticker in self.known_tickers[asset_type]:
+                rows.append((asset_type, ticker, values))
+            else:
+                name = ASSET_TYPE_MAPPING[asset_type]["class"].__name__
+                self.errors.append({"line": line_number, "error": f"{name} '{ticker}' not found!"})
+        if not len(rows):
+            return
+
+        sequence = func.pg_get_serial_sequence(Investments.__tablename__, "investment_id")
+        ids = db.session.scalars(
+            select(func.nextval(sequence)).select_from(func.generate_series(1, len(rows)))
+        ).all()
+        if self.now is None:
+            # the server default of open_datetime
+            self.now = db.session.scalar(select(func.now()))
+
+        investments = []
+        subclass_rows: Dict[AssetTypes, List[Tuple[int, str]]] = {t: [] for t in AssetTypes}
+        for investment_id, (asset_type, ticker, values) in zip(ids, rows):
+            cls = INVESTMENT_CLASSES[asset_type]
+            investments.append(
+                (
+                    investment_id,
+                    self.user_id,
+                    cls.__mapper__.polymorphic_identity,
+                    values["volume"],
+                    values["open_price"],
+                    values["open_datetime"] or self.now,
+                    values["close_datetime"],
+                    values["close_price"],
+                    values["last_known_price"],
+                )
+            )
+            subclass_rows[asset_type].append((investment_id, ticker))
+
+        self.write_rows(Investments.__table__, INVESTMENT_COLUMNS, investments)
+        for asset_type, cls in INVESTMENT_CLASSES.items():
+            if len(subclass_rows[asset_type]):
+                columns = ("investment_id", TYPE_TO_TICKER_MAPPING[asset_type])
+                self.write_rows(cls.__table__, columns, subclass_rows[asset_type])
+        apply_lots(lots.investment_id.in_(ids))
+        self.imported += len(rows)
+
+    def write_rows(self, table: Table, columns: Tuple[str, ...], rows: List[Tuple]) -> None:
+        if self.method == "insert":
+            db.session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+            return
+
+        buffer = io.StringIO()
+        # None is written as an unquoted empty field which COPY reads as NULL
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Dict, Optional, Tuple
+from api.main.config import LLMType
+from api.main.model.llm import GenerationConfig, generation_parameters
+
+# parameters that have no effect on greedy/beam search output
+SAMPLING_PARAMETERS = frozenset(["temperature", "top_k", "top_p", "typical_p", "min_p"])
+
+
+class CacheBackend(ABC):
+    """
+    Storage of generated responses.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        pass
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    Bounded in-process LRU cache with time-to-live.
+
+    Args:
+        max_size (int, optional): Maximum number of stored responses. Defaults to 1024.
+        ttl (float, optional): Seconds after which a response expires. Defaults to 3600.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared between processes stored in Redis (requires `redis` package).
+
+    Args:
+        url (str): Redis connection URL.
+        ttl (float, optional): Seconds after which a response expires. Defaults to 3600.
+        prefix (str, optional): Prefix of the keys. Defaults to "llm-cache:".
+    """
+
+    def __init__(self, url: str, ttl: float = 3600, prefix: str = "llm-cache:") -> None:
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisCacheBackend requires 'redis' package to be installed!") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+
+class GenerationCache:
+    """
+    Cache of deterministic generations keyed by adapter type, prompt and generation parameters.
+
+    Responses are looked up in the in-process LRU first and then in the optional shared backend.
+    Sampled generations (`do_sample=True`) are never cached.
+
+    Args:
+        local (LRUCacheBackend): In-process cache.
+        shared (Optional[CacheBackend], optional): Cache shared between workers. Defaults to None.
+
+    Attributes:
+        hits (int): Number of requests answered from the cache.
+        misses (int): Number of cacheable requests that had to be generated.
+    """
+
+    def __init__(self, local: LRUCacheBackend, shared: Optional[CacheBackend] = None) -> None:
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cacheable(generation_config: GenerationConfig) -> bool:
+        return not generation_config.do_sample
+
+    @staticmethod
+    def key(task_type: LLMType, prompt: str, generation_config: GenerationConfig) -> str:
+        """
+        Returns:
+            str: Cache key of the generation.
+        """
+        parameters = {
+            k: v
+            for k, v in generation_parameters(generation_config).items()
+            if k not in SAMPLING_PARAMETERS
+        }
+        payload = json.dumps(
+            [task_type.name, prompt.strip(), parameters], sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.local.set(key, deepcopy(value))
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def headers(self, status: str) -> Dict[str, str]:
+        """
+        Args:
+            status (str): HIT, MISS or BYPASS.
+
+        Returns:
+            Dict[str, str]: Response headers with the cache status and counters.
+        """
+        return {
+            "X-Cache": status,
+            "X-Cache-Hits": str(self.hits),
+            "X-Cache-Misses": str(self.misses),
+        }
@@ -0,0 +1,160 @@
+import heapq
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+from api.main.common.jobs import BaseJobQueue, JobStatus
+
+
+class QueueFull(Exception):
+    """
+    The queue holds `max_size` jobs waiting for a worker.
+    """
+
+
+class ClientLimitExceeded(Exception):
+    """
+    The client has `max_per_client` jobs queued or running.
+    """
+
+
+@dataclass
+class GenerationJob:
+    work: Callable[[], Any] = field(repr=False)
+    client: str
+    priority: int
+    task: Optional[str] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JobStatus.QUEUED
+    result: Any = None
+    error: Optional[Exception] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the job is finished.
+
+        Returns:
+            bool: True if it finished within `timeout` seconds.
+        """
+        return self.done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "task": self.task,
+            "status": self.status,
+            "priority": self.priority,
+            "result": self.result,
+            "error": None if self.error is None else str(self.error),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class GenerationJobQueue(BaseJobQueue[GenerationJob]):
+    """
+    Runs generations on a fixed pool of inference threads, so request handlers only wait for
+    (or poll) their results and never run `generate` themselves.
+
+    Jobs with a lower `priority` run first, jobs of the same priority in the order they were
+    submitted. At most `max_size` jobs wait for a worker and every client has at most
+    `max_per_client` jobs queued or running. Finished jobs are kept for `ttl` seconds.
+
+    Args:
+        workers (int, optional): Number of inference threads, started on the first job.
+            Defaults to 2.
+        max_size (int, optional): Maximum number of queued jobs. Defaults to 64.
+        max_per_client (int, optional): Maximum number of unfinished jobs of a client.
+            Defaults to 4.
+        ttl (float, optional): Seconds finished jobs are kept. Defaults to 600.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_size: int = 64,
+        max_per_client: int = 4,
+        ttl: float = 600,
+    ) -> None:
+        super().__init__(workers, ttl)
+        self.max_size = max_size
+        self.max_per_client = max_per_client
+        self._active: Dict[str, int] = {}
+
+    def submit(
+        self,
+        work: Callable[[], Any],
+        client: str,
+        priority: int = 5,
+        task: Optional[str] = None,
+    ) -> GenerationJob:
+        """
+        Queues the work.
+
+        Args:
+            work (Callable[[], Any]): Runs the generation, its return value is the job result.
+            client (str): Identifier of the client the job counts against.
+            priority (int, optional): Lower runs first. Defaults to 5.
+            task (Optional[str], optional): Name of the task, reported by `to_dict`.
+                Defaults to None.
+
+        Raises:
+            QueueFull: If `max_size` jobs are queued.
+            ClientLimitExceeded: If the client has `max_per_client` unfinished jobs.
+
+        Returns:
+            GenerationJob: Queued job.
+        """
+        job = GenerationJob(work, client, priority, task)
+        with self._condition:
+            self._check_open()
+            if self._active.get(client, 0) >= self.max_per_client:
+                raise ClientLimitExceeded(
+                    f"Client already has {self.max_per_client} unfinished generations!"
+                )
+            if len(self._heap) >= self.max_size:
+                raise QueueFull(f"{self.max_size} generations are already queued!")
+            self._jobs[job.job_id] = job
+            self._active[client] = self._active.get(client, 0) + 1
+            self._push(priority, job)
+        return job
+
+    def _next(self) -> Optional[GenerationJob]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or len(self._heap))
+            if self._closed:
+                return None
+            job = heapq.heappop(self._heap)[2]
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            return job
+
+    def _work(self) -> None:
+        while (job := self._next()) is not None:
+            try:
+                job.result = job.work()
+                job.status = JobStatus.DONE
+            except Exception as e:
+                job.error = e
+                job.status = JobStatus.FAILED
+            with self._condition:
+                job.finished_at = time.time()
+                self._active[job.client] -= 1
+                if not self._active[job.client]:
+                    del self._active[job.client]
+            job.done.set()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "queued": len(self._heap),
+                "running": sum(job.status == JobStatus.RUNNING for job in self._jobs.values()),
+                "jobs": len(self._jobs),
+                "clients": len(self._active),
+            }
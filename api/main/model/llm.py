@@ -1,8 +1,481 @@
+import glob
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import torch
-from transformers import T5ForConditionalGeneration, AutoTokenizer, GenerationConfig, BatchEncoding
+from transformers import (
+    T5ForConditionalGeneration,
+    AutoConfig,
+    AutoTokenizer,
+    GenerationConfig,
+    BatchEncoding,
+    TextIteratorStreamer,
+)
 from peft import PeftConfig, PeftModel
-from typing import List, Union, Dict
-from api.main.config import LLMType, mapping
+from typing import List, Union, Dict, Optional, Any, Callable, Iterable, Iterator, Tuple
+from api.main.config import LLMType, MERGED_CONFIG_NAME, mapping
+
+
+class LoadState:
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class Engine:
+    # unmerged LoRA adapters on the shared bfloat16 base model
+    LORA = "lora"
+    # model exported by flan_t5/export_model.py with the adapter merged
+    MERGED = "merged"
+    # adapter merged into a float32 copy of the base model with int8 dynamic quantization
+    INT8 = "int8"
+
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def read_merged_config(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns:
+        Optional[Dict[str, Any]]: Export settings if `path` holds an exported merged model.
+    """
+    config_path = os.path.join(path, MERGED_CONFIG_NAME)
+    if not os.path.isfile(config_path):
+        return None
+    with open(config_path) as file:
+        return json.load(file)
+
+
+def load_safetensors_mmap(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Map a safetensors file into memory, the tensors are views of the mapping instead of
+    copies. The mapping is copy-on-write, so workers forked or started from the same file
+    share the pages of the weights through the page cache.
+
+    Args:
+        path (str): Path of the safetensors file.
+
+    Returns:
+        Dict[str, torch.Tensor]: Tensors by name.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    (header_size,) = struct.unpack("<Q", buffer[:8])
+    header = json.loads(buffer[8 : 8 + header_size])
+    header.pop("__metadata__", None)
+    tensors = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if end == start:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=(end - start) // dtype.itemsize,
+            offset=8 + header_size + start,
+        ).view(info["shape"])
+    return tensors
+
+
+def load_merged_artifact(
+    path: str, quantize: bool = False, device: Union[str, torch.device] = "cpu"
+) -> T5ForConditionalGeneration:
+    """
+    Load a model exported by flan_t5/export_model.py without copying its weights, the
+    modules are created on the meta device and the memory mapped tensors are assigned to them.
+
+    Args:
+        path (str): Directory of the exported model.
+        quantize (bool, optional): Apply int8 dynamic quantization (on CPU), the quantized
+            weights are private to the process. Defaults to False.
+        device (Union[str, torch.device], optional): Device the model is moved to unless it
+            is quantized, the weights stay memory mapped only on CPU. Defaults to "cpu".
+
+    Returns:
+        T5ForConditionalGeneration: Model in evaluation mode.
+    """
+    state_dict = {}
+    for file_path in sorted(glob.glob(os.path.join(path, "*.safetensors"))):
+        state_dict.update(load_safetensors_mmap(file_path))
+    with torch.device("meta"):
+        model = T5ForConditionalGeneration(AutoConfig.from_pretrained(path))
+    # tied embeddings are not stored, they are tied again below
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if len(missing):
+        raise ValueError(f"Weights {', '.join(missing)} are missing in {path}!")
+    if os.path.isfile(os.path.join(path, "generation_config.json")):
+        model.generation_config = GenerationConfig.from_pretrained(path)
+    model.eval()
+    return quantize_int8(model) if quantize else model.to(device)
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Replace the linear layers with int8 dynamically quantized ones, weights are stored in
+    int8 and activations are quantized on the fly (CPU only). The model is modified in place,
+    a copy would hold a second float32 model in memory while quantizing.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def load_merged_model(
+    base_model_name: str, adapter_path: str, quantize: bool = True
+) -> T5ForConditionalGeneration:
+    """
+    Load the base model on CPU with the LoRA adapter merged into its weights, so inference
+    runs without the extra LoRA matmuls.
+
+    Args:
+        base_model_name (str): Base model the adapter was trained on.
+        adapter_path (str): Path or hub name of the adapter.
+        quantize (bool, optional): Apply int8 dynamic quantization. Defaults to True.
+
+    Returns:
+        T5ForConditionalGeneration: Model in evaluation mode.
+    """
+    model = T5ForConditionalGeneration.from_pretrained(base_model_name, torch_dtype=torch.float32)
+    model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
+    model.eval()
+    return quantize_int8(model) if quantize else model
+
+
+class PrefixedPrompt(str):
+    """
+    Prompt made of a prefix shared by many prompts (e.g. the schema of text2sql prompts) and
+    a suffix, joined by whitespace. It is the joined string everywhere else, `LLM` tokenizes
+    the prefix only once and reuses its tokens.
+
+    Args:
+        prefix (str): Shared part, without trailing whitespace.
+        suffix (str): Part specific to the prompt, without leading whitespace.
+        separator (str, optional): Whitespace between them. Defaults to "\n".
+    """
+
+    def __new__(cls, prefix: str, suffix: str, separator: str = "\n") -> "PrefixedPrompt":
+        prompt = super().__new__(cls, f"{prefix}{separator}{suffix}")
+        prompt.prefix, prompt.suffix, prompt.separator = prefix, suffix, separator
+        return prompt
+
+
+class TokenCache:
+    """
+    Bounded LRU of token ids of prompt prefixes.
+
+    Args:
+        tokenize (Callable[[str], List[int]]): Tokenizes a prefix without special tokens.
+        max_size (int, optional): Maximum number of stored prefixes. Defaults to 256.
+
+    Attributes:
+        hits (int): Number of prefixes found in the cache.
+        misses (int): Number of prefixes that had to be tokenized.
+    """
+
+    def __init__(self, tokenize: Callable[[str], List[int]], max_size: int = 256) -> None:
+        self.tokenize = tokenize
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prefix: str) -> List[int]:
+        with self._lock:
+            ids = self._data.get(prefix)
+            if ids is not None:
+                self._data.move_to_end(prefix)
+                self.hits += 1
+                return ids
+            self.misses += 1
+        # tokenized outside of the lock, a prefix tokenized twice at once is harmless
+        ids = self.tokenize(prefix)
+        with self._lock:
+            self._data[prefix] = ids
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return ids
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class AdapterRegistry:
+    """
+    Single FLAN-T5 base model shared by the LORA adapters of several tasks.
+
+    Adapters are attached with `load_adapter` and switched with `set_adapter`, so every
+    additional task costs only the adapter weights instead of a full copy of the base model.
+    Weights can be loaded lazily with `load` or `load_in_background`, `states` reports
+    the progress of every adapter.
+
+    Tasks listed in `cpu_task_types` use the `Engine.INT8` engine instead: a separate copy of
+    the base model with the adapter merged and the linear layers quantized to int8, which is
+    faster on machines without a GPU. Tasks whose `mapping` path is a model exported by
+    flan_t5/export_model.py load it memory mapped (`Engine.MERGED`, or `Engine.INT8` if it
+    was exported with `--quantize` or listed in `cpu_task_types`). `Engine.MERGED` models are
+    moved to the GPU if there is one, like the shared base model.
+
+    Args:
+        task_types (Iterable[LLMType]): Tasks whose adapters should be loaded.
+        pad_to_multiple_of (Optional[int], optional): Passed to the `LLM` of every task.
+            Defaults to None.
+        load (bool, optional): Load the weights right away. Defaults to True.
+        cpu_task_types (Iterable[LLMType], optional): Tasks served by merged int8 models.
+            Defaults to ().
+        prefix_cache_size (int, optional): Prefixes of `PrefixedPrompt`s whose tokens are
+            kept. Defaults to 256.
+        retry_interval (float, optional): Minimum seconds between `load_in_background`
+            retries of failed adapters. Defaults to 30.
+
+    Attributes:
+        lora_configs (Dict[LLMType, PeftConfig]): Configuration of every adapter.
+        artifacts (Dict[LLMType, Dict[str, Any]]): Export settings of the exported models.
+        model (PeftModel): Base model with all the adapters attached.
+        merged_models (Dict[LLMType, T5ForConditionalGeneration]): Models of `cpu_task_types`
+            and of the exported models.
+        tokenizer (AutoTokenizer): Tokenizer shared by the adapters.
+        prefix_tokens (TokenCache): Token ids of prompt prefixes.
+        states (Dict[LLMType, str]): `LoadState` of every adapter.
+    """
+
+    def __init__(
+        self,
+        task_types: Iterable[LLMType],
+        pad_to_multiple_of: Optional[int] = None,
+        load: bool = True,
+        cpu_task_types: Iterable[LLMType] = (),
+        prefix_cache_size: int = 256,
+        retry_interval: float = 30.0,
+    ) -> None:
+        self.task_types = list(task_types)
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.retry_interval = retry_interval
+        self.prefix_tokens = TokenCache(
+            lambda prefix: self.tokenizer(prefix, add_special_tokens=False, verbose=False)[
+                "input_ids"
+            ],
+            prefix_cache_size,
+        )
+        cpu_task_types = set(cpu_task_types)
+        self.artifacts: Dict[LLMType, Dict[str, Any]] = {}
+        self.engines: Dict[LLMType, str] = {}
+        for task_type in self.task_types:
+            artifact = read_merged_config(mapping[task_type])
+            if artifact is not None:
+                self.artifacts[task_type] = artifact
+                quantize = artifact.get("quantize") or task_type in cpu_task_types
+                self.engines[task_type] = Engine.INT8 if quantize else Engine.MERGED
+            else:
+                self.engines[task_type] = (
+                    Engine.INT8 if task_type in cpu_task_types else Engine.LORA
+                )
+        self.lora_configs: Dict[LLMType, PeftConfig] = {}
+        self.model: Optional[PeftModel] = None
+        self.merged_models: Dict[LLMType, T5ForConditionalGeneration] = {}
+        self.tokenizer: Optional[AutoTokenizer] = None
+        self.states = {task_type: LoadState.PENDING for task_type in self.task_types}
+        self.errors: Dict[LLMType, str] = {}
+        # held while an adapter is switched and generating
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # guards _loader and _failed_at, never held during a generation
+        self._loader_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+        self._failed_at = float("-inf")
+        self._llms: Dict[LLMType, "LLM"] = {}
+        if load:
+            self.load()
+
+    def load(self) -> None:
+        """
+        Load the base model and the adapters that are not loaded yet, so calling it again
+        retries the adapters that failed. Every adapter becomes ready as soon as it is attached
+        to the base model.
+
+        Raises:
+            ValueError: If adapters were trained on different base models.
+        """
+        with self._load_lock:
+            pending = [t for t in self.task_types if self.states[t] != LoadState.READY]
+            if not pending:
+                return
+            for task_type in pending:
+                self.states[task_type] = LoadState.LOADING
+            try:
+                self.lora_configs.update(
+                    {
+                        t: PeftConfig.from_pretrained(mapping[t])
+                        for t in pending
+                        if t not in self.artifacts
+                    }
+                )
+                base_model_names = {
+                    t: c.base_model_name_or_path for t, c in self.lora_configs.items()
+                }
+                base_model_names.update(
+                    {t: a["base_model_name_or_path"] for t, a in self.artifacts.items()}
+                )
+                base_model_name = base_model_names[self.task_types[0]]
+                for task_type, name in base_model_names.items():
+                    if name != base_model_name:
+                        raise ValueError(
+                            f"Adapter {task_type.name} was trained on "
+                            + f"{name} not on {base_model_name}!"
+                        )
+                if self.tokenizer is None:
+                    # exported models include the tokenizer, it is not looked up in the hub cache
+                    self.tokenizer = AutoTokenizer.from_pretrained(
+                        mapping[next(iter(self.artifacts))] if self.artifacts else base_model_name
+                    )
+                # the shared base model is not needed if every task has a merged model
+                model = (
+                    T5ForConditionalGeneration.from_pretrained(
+                        base_model_name, device_map="auto", torch_dtype=torch.bfloat16
+                    )
+                    if self.model is None and any(self.engines[t] == Engine.LORA for t in pending)
+                    else None
+                )
+            except Exception as e:
+                for task_type in pending:
+                    self._failed(task_type, e)
+                raise
+
+            errors = []
+            for task_type in pending:
+                try:
+                    if task_type in self.artifacts:
+                        # served where the shared base model would be, unless quantized
+                        self.merged_models[task_type] = load_merged_artifact(
+                            mapping[task_type],
+                            self.engines[task_type] == Engine.INT8,
+                            "cuda" if torch.cuda.is_available() else "cpu",
+                        )
+                        self._ready(task_type)
+                        continue
+                    if self.engines[task_type] == Engine.INT8:
+                        self.merged_models[task_type] = load_merged_model(
+                            base_model_name, mapping[task_type]
+                        )
+                        self._ready(task_type)
+                        continue
+                    # adapters are attached while other tasks may already be generating
+                    with self._lock:
+                        if self.model is None:
+                            self.model = PeftModel.from_pretrained(
+                                model, mapping[task_type], task_type.name, is_trainable=False
+                            )
+                        else:
+                            self.model.load_adapter(
+                                mapping[task_type], task_type.name, is_trainable=False
+                            )
+                        # newly attached LoRA dropout layers are in training mode
+                        self.model.eval()
+                    self._ready(task_type)
+                except Exception as e:
+                    self._failed(task_type, e)
+                    errors.append(e)
+            if errors:
+                raise errors[0]
+
+    def _ready(self, task_type: LLMType) -> None:
+        self.states[task_type] = LoadState.READY
+        self.errors.pop(task_type, None)
+
+    def _failed(self, task_type: LLMType, error: Exception) -> None:
+        self.states[task_type] = LoadState.FAILED
+        self.errors[task_type] = str(error)
+        with self._loader_lock:
+            self._failed_at = time.monotonic()
+
+    def load_in_background(self) -> threading.Thread:
+        """
+        Start loading the weights in a daemon thread, unless it is running already. Adapters
+        that failed are retried at most once per `retry_interval` seconds.
+
+        Returns:
+            threading.Thread: Loading thread.
+        """
+        with self._loader_lock:
+            retry = (
+                LoadState.FAILED in self.states.values()
+                and time.monotonic() - self._failed_at >= self.retry_interval
+            )
+            if self._loader is None or (retry and not self._loader.is_alive()):
+                self._loader = threading.Thread(target=self._load_quietly, daemon=True)
+                self._loader.start()
+            return self._loader
+
+    def _load_quietly(self) -> None:
+        try:
+            self.load()
+        except Exception:
+            # failure is reported through states and errors
+            pass
+
+    def is_ready(self, task_type: LLMType) -> bool:
+        return self.states.get(task_type) == LoadState.READY
+
+    def model_for(self, task_type: LLMType) -> Union[PeftModel, T5ForConditionalGeneration]:
+        return self.merged_models.get(task_type, self.model)
+
+    @contextmanager
+    def activate(
+        self, task_type: LLMType
+    ) -> Iterator[Union[PeftModel, T5ForConditionalGeneration]]:
+        """
+        Switch the model to the adapter of the task for the duration of the context.
+
+        Args:
+            task_type (LLMType): Task whose adapter should be active.
+
+        Yields:
+            Union[PeftModel, T5ForConditionalGeneration]: Model with the adapter active or
+                the merged model of the task.
+        """
+        if not self.is_ready(task_type):
+            raise KeyError(f"Adapter {task_type.name} is not loaded!")
+        if task_type in self.merged_models:
+            # merged models are not shared between tasks, nothing to switch
+            yield self.merged_models[task_type]
+            return
+        with self._lock:
+            if self.model.active_adapter != task_type.name:
+                self.model.set_adapter(task_type.name)
+            yield self.model
+
+    def get(self, task_type: LLMType) -> "LLM":
+        """
+        Returns:
+            LLM: Model wrapper bound to the adapter of the task.
+        """
+        if task_type not in self._llms:
+            self._llms[task_type] = LLM(task_type, self, self.pad_to_multiple_of)
+        return self._llms[task_type]
 
 
 class LLM:
@@ -11,49 +484,179 @@ class LLM:
 
     Args:
         task_type (LLMType): Type of the task.
+        registry (Optional[AdapterRegistry], optional): Registry holding the adapter of the task.
+            New registry with only this adapter is created if not given. Defaults to None.
+        pad_to_multiple_of (Optional[int], optional): Round padded length up to a multiple of
+            this value (e.g. 32 or 64) to keep tensor shapes reusable. Defaults to None.
 
     Attributes:
-        lora_config (PeftConfig): Configuration for the LORA model.
+        lora_config (Optional[PeftConfig]): Configuration for the LORA model, None for
+            exported merged models.
         model (PeftModel): LORA model.
         tokenizer (AutoTokenizer): Tokenizer for the LORA model.
     """
 
-    def __init__(self, task_type: LLMType) -> None:
-        self.lora_config = PeftConfig.from_pretrained(mapping[task_type])
-        self.model = T5ForConditionalGeneration.from_pretrained(
-            self.lora_config.base_model_name_or_path, device_map="auto", torch_dtype=torch.bfloat16
-        )
-        self.model = PeftModel.from_pretrained(self.model, mapping[task_type], is_trainable=False)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.lora_config.base_model_name_or_path)
-        self.model.eval()
+    def __init__(
+        self,
+        task_type: LLMType,
+        registry: Optional[AdapterRegistry] = None,
+        pad_to_multiple_of: Optional[int] = None,
+    ) -> None:
+        self.task_type = task_type
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.registry = registry if registry is not None else AdapterRegistry([task_type])
+
+    @property
+    def lora_config(self) -> Optional[PeftConfig]:
+        # exported merged models have no adapter
+        return self.registry.lora_configs.get(self.task_type)
+
+    @property
+    def model(self) -> Union[PeftModel, T5ForConditionalGeneration]:
+        return self.registry.model_for(self.task_type)
+
+    @property
+    def tokenizer(self) -> AutoTokenizer:
+        return self.registry.tokenizer
+
+    @property
+    def ready(self) -> bool:
+        return self.registry.is_ready(self.task_type)
 
-    def process_input(self, input_text: str, return_tensors: str = "pt") -> BatchEncoding:
+    def process_input(
+        self, input_text: Union[str, List[str]], return_tensors: str = "pt"
+    ) -> BatchEncoding:
         """
         Process the input text to be fed to the model.
 
+        Texts are padded to the longest one in the batch (rounded up to `pad_to_multiple_of`
+        if set) instead of `model_max_length`, so short prompts don't run the encoder over
+        hundreds of padding positions.
+
         Args:
-            input_text (str): Input text to process.
+            input_text (Union[str, List[str]]): Input text or batch of texts to process.
             return_tensors (str, optional): Type of tensors to return. Defaults to "pt".
 
         Returns:
-            BatchEncoding: Processed input text.
+            BatchEncoding: Processed input text, "tokenizer_warning" holds one entry per text.
         """
-        tokenized_input = self.tokenizer(
-            input_text,
-            return_tensors=return_tensors,
-            padding="max_length",
-            truncation=True,
-            max_length=self.tokenizer.model_max_length,
-            return_length=True,
+        return self.pad(
+            self.encode([input_text] if isinstance(input_text, str) else input_text),
+            return_tensors,
+        )
+
+    def encode(self, texts: List[str]) -> List[List[int]]:
+        """
+        Token ids of the texts with EOS and without truncation.
+
+        Prefixes of `PrefixedPrompt`s are tokenized once and taken from the registry's
+        `prefix_tokens` afterwards, only their suffixes are tokenized.
+        """
+        # plain texts and suffixes of prefixed prompts are tokenized with one call, suffixes
+        # keep the separator so tokenizers that encode whitespace see the joined text
+        encoded = self.tokenizer(
+            [
+                text.separator + text.suffix if isinstance(text, PrefixedPrompt) else text
+                for text in texts
+            ],
+            truncation=False,
             verbose=False,
         )
-        if tokenized_input["length"][0] > self.tokenizer.model_max_length:
-            tokenized_input["tokenizer_warning"] = (
-                f"Input text longer than {self.tokenizer.model_max_length} "
-                + "tokens output might be inaccurate due to truncation."
-            )
+        return [
+            self.registry.prefix_tokens.get(text.prefix) + ids
+            if isinstance(text, PrefixedPrompt)
+            else ids
+            for text, ids in zip(texts, encoded["input_ids"])
+        ]
+
+    def pad(self, encoded_ids: List[List[int]], return_tensors: str = "pt") -> BatchEncoding:
+        """
+        Truncate and pad token ids returned by `encode`, see `process_input`.
+        """
+        max_length = self.tokenizer.model_max_length
+        lengths = [len(ids) for ids in encoded_ids]
+        # truncate by hand (keeping EOS) to know which texts were longer than max_length
+        input_ids = [
+            ids if len(ids) <= max_length else ids[: max_length - 1] + [self.tokenizer.eos_token_id]
+            for ids in encoded_ids
+        ]
+        tokenized_input = self.tokenizer.pad(
+            {"input_ids": input_ids},
+            padding="longest",
+            pad_to_multiple_of=self.pad_to_multiple_of,
+            return_tensors=return_tensors,
+        )
+        tokenized_input["length"] = lengths
+        tokenized_input["tokenizer_warning"] = [
+            f"Input text longer than {max_length} "
+            + "tokens output might be inaccurate due to truncation."
+            if length > max_length
+            else None
+            for length in lengths
+        ]
         return tokenized_input
 
+    def generate_batch(
+        self, texts: List[str], generation_config: GenerationConfig
+    ) -> List[Dict[str, Union[str, List[str]]]]:
+        """
+        Generate responses for a batch of texts with a single `generate` call.
+
+        Args:
+            texts (List[str]): Input texts.
+            generation_config (GenerationConfig): Configuration shared by the whole batch.
+
+        Returns:
+            List[Dict[str, Union[str, List[str]]]]: Generated text and warning for every input.
+        """
+        return self._generate(self.process_input(texts), generation_config)
+
+    def generate_many(
+        self, texts: List[str], generation_config: GenerationConfig, batch_size: int = 8
+    ) -> List[Dict[str, Union[str, List[str]]]]:
+        """
+        Generate responses for any number of texts in batches of `batch_size`. Texts are
+        sorted by their number of tokens first, so every batch is padded as little as possible.
+
+        Args:
+            texts (List[str]): Input texts.
+            generation_config (GenerationConfig): Configuration shared by all the texts.
+            batch_size (int, optional): Texts generated with one `generate` call. Defaults to 8.
+
+        Returns:
+            List[Dict[str, Union[str, List[str]]]]: Generated text and warning for every input,
+                in the order of `texts`.
+        """
+        encoded_ids = self.encode(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded_ids[i]))
+        results: List[Optional[Dict[str, Union[str, List[str]]]]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            batch = self.pad([encoded_ids[i] for i in indices])
+            for i, result in zip(indices, self._generate(batch, generation_config)):
+                results[i] = result
+        return results
+
+    def _generate(
+        self, input: BatchEncoding, generation_config: GenerationConfig
+    ) -> List[Dict[str, Union[str, List[str]]]]:
+        with self.registry.activate(self.task_type) as model:
+            generated_ids = model.generate(
+                input_ids=input["input_ids"].to(model.device),
+                attention_mask=input["attention_mask"].to(model.device),
+                generation_config=generation_config,
+            )
+        sequences = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
+        # generate returns num_return_sequences consecutive rows for every input
+        n = generation_config.num_return_sequences or 1
+        return [
+            {
+                "generated_sequence": sequences[i * n : (i + 1) * n],
+                "tokenizer_warning": warning,
+            }
+            for i, warning in enumerate(input["tokenizer_warning"])
+        ]
+
     def generate_response(
         self, text: str, generation_config: GenerationConfig
     ) -> Dict[str, Union[str, List[str]]]:
@@ -67,17 +670,268 @@ class LLM:
         Returns:
             Dict[str, Union[str, List[str]]]: Generated text and warning if any.
         """
+        return self.generate_batch([text], generation_config)[0]
+
+    def stream_response(
+        self,
+        text: str,
+        generation_config: GenerationConfig,
+        run: Optional[Callable[[Callable[[], None]], Any]] = None,
+    ) -> Tuple[Iterator[str], Optional[str]]:
+        """
+        Generate the response in the background and stream decoded text as it is produced.
+
+        Args:
+            text (str): Input text.
+            generation_config (GenerationConfig): Configuration for the generation.
+            run (Optional[Callable[[Callable[[], None]], Any]], optional): Starts the
+                generation without waiting for it, e.g. as a job of a `GenerationJobQueue`.
+                Defaults to None, a new daemon thread.
+
+        Raises:
+            ValueError: If more than one sequence should be returned.
+
+        Returns:
+            Tuple[Iterator[str], Optional[str]]: Iterator over decoded chunks of the response
+                and tokenizer warning if any.
+        """
+        if (generation_config.num_return_sequences or 1) > 1:
+            raise ValueError("Streaming supports only num_return_sequences=1!")
         input = self.process_input(text)
-        generated_ids = self.model.generate(
-            input_ids=input["input_ids"].to(self.model.device), generation_config=generation_config
-        )
-        response = {
-            "generated_sequence": self.tokenizer.batch_decode(
-                generated_ids, skip_special_tokens=True
-            ),
-            "tokenizer_warning": input.get("tokenizer_warning", None),
-        }
-        return response
+        streamer = TextIteratorStreamer(self.tokenizer, skip_special_tokens=True)
+        errors = []
+
+        def generate():
+            try:
+                with self.registry.activate(self.task_type) as model:
+                    model.generate(
+                        input_ids=input["input_ids"].to(model.device),
+                        attention_mask=input["attention_mask"].to(model.device),
+                        generation_config=generation_config,
+                        streamer=streamer,
+                    )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        def chunks():
+            yield from (chunk for chunk in streamer if chunk)
+            if errors:
+                raise errors[0]
+
+        if run is None:
+            threading.Thread(target=generate, daemon=True).start()
+        else:
+            run(generate)
+        return chunks(), input["tokenizer_warning"][0]
+
+
+_GENERATION_FIELDS = frozenset(GenerationConfig().to_dict()) - {"transformers_version"}
+
+
+def generation_parameters(generation_config: GenerationConfig) -> Dict[str, Any]:
+    """
+    Generation parameters of the config that differ from the defaults.
+
+    Other request fields passed to `GenerationConfig` (e.g. the question) are stored as its
+    attributes too, so they are filtered out.
+
+    Args:
+        generation_config (GenerationConfig): Configuration for the generation.
+
+    Returns:
+        Dict[str, Any]: Parameter name to value.
+    """
+    return {k: v for k, v in generation_config.to_diff_dict().items() if k in _GENERATION_FIELDS}
+
+
+@dataclass
+class BatchMetrics:
+    """
+    Batch-size and queue-wait statistics of a `BatchScheduler`.
+    """
+
+    requests: int = 0
+    batches: int = 0
+    max_batch_size: int = 0
+    total_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+    batch_size_histogram: Dict[int, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, queue_waits: List[float]) -> None:
+        """
+        Record one executed batch.
+
+        Args:
+            queue_waits (List[float]): Seconds every request of the batch spent in the queue.
+        """
+        size = len(queue_waits)
+        with self.lock:
+            self.requests += size
+            self.batches += 1
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.total_queue_wait += sum(queue_waits)
+            self.max_queue_wait = max(self.max_queue_wait, *queue_waits)
+            self.batch_size_histogram[size] = self.batch_size_histogram.get(size, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: JSON serializable copy of the metrics.
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "avg_queue_wait_ms": 1e3 * self.total_queue_wait / self.requests
+                if self.requests
+                else 0.0,
+                "max_queue_wait_ms": 1e3 * self.max_queue_wait,
+                "batch_size_histogram": {str(k): v for k, v in self.batch_size_histogram.items()},
+            }
+
+
+@dataclass
+class _PendingRequest:
+    text: str
+    generation_config: GenerationConfig
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent `generate_response` calls into batched `generate` calls.
+
+    The first queued request opens a window of `max_wait_ms`, requests arriving within it
+    (up to `max_batch_size`) are grouped by their generation config and every group is
+    generated with one call. Exposes the same `generate_response` as `LLM`.
+
+    Args:
+        model (LLM): Model used for the generation.
+        max_batch_size (int, optional): Maximum number of requests in a batch. Defaults to 8.
+        max_wait_ms (float, optional): Batching window in milliseconds. Defaults to 10.
+
+    Attributes:
+        metrics (BatchMetrics): Batch-size and queue-wait statistics.
+    """
+
+    def __init__(self, model: LLM, max_batch_size: int = 8, max_wait_ms: float = 10.0) -> None:
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1e3
+        self.metrics = BatchMetrics()
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    @property
+    def task_type(self) -> LLMType:
+        return self.model.task_type
+
+    @property
+    def registry(self) -> AdapterRegistry:
+        return self.model.registry
+
+    @property
+    def ready(self) -> bool:
+        return self.model.ready
+
+    def stream_response(
+        self,
+        text: str,
+        generation_config: GenerationConfig,
+        run: Optional[Callable[[Callable[[], None]], Any]] = None,
+    ) -> Tuple[Iterator[str], Optional[str]]:
+        """
+        Streamed generations are not batched, see `LLM.stream_response`.
+        """
+        return self.model.stream_response(text, generation_config, run)
+
+    def generate_many(
+        self, texts: List[str], generation_config: GenerationConfig
+    ) -> List[Dict[str, Union[str, List[str]]]]:
+        """
+        Texts of one request are batched already and are not queued, see `LLM.generate_many`.
+        """
+        return self.model.generate_many(texts, generation_config, self.max_batch_size)
+
+    def generate_response(
+        self, text: str, generation_config: GenerationConfig, timeout: float = 300.0
+    ) -> Dict[str, Union[str, List[str]]]:
+        """
+        Queue the text and wait for its slice of the batched generation.
+
+        Args:
+            text (str): Input text.
+            generation_config (GenerationConfig): Configuration for the generation.
+            timeout (float, optional): Seconds to wait for the result. Defaults to 300.
+
+        Raises:
+            TimeoutError: If the result is not ready within `timeout` seconds.
+
+        Returns:
+            Dict[str, Union[str, List[str]]]: Generated text and warning if any.
+        """
+        request = _PendingRequest(text, generation_config)
+        self._queue.put(request)
+        return request.future.result(timeout)
+
+    @staticmethod
+    def config_key(generation_config: GenerationConfig) -> str:
+        """
+        Key under which requests with compatible generation configs are batched together.
+        """
+        return json.dumps(generation_parameters(generation_config), sort_keys=True, default=str)
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # requests that queued up during the previous generate are taken without waiting
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                batch.append(
+                    self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch: List[_PendingRequest] = []
+            try:
+                batch = self._collect()
+                groups: Dict[str, List[_PendingRequest]] = {}
+                for request in batch:
+                    groups.setdefault(self.config_key(request.generation_config), []).append(
+                        request
+                    )
+                for group in groups.values():
+                    self._generate(group)
+            except Exception as e:
+                # the single worker serves every caller, only the broken batch fails
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _generate(self, group: List[_PendingRequest]) -> None:
+        started = time.monotonic()
+        try:
+            self.metrics.record([started - request.enqueued_at for request in group])
+            results = self.model.generate_batch(
+                [request.text for request in group], group[0].generation_config
+            )
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        for request, result in zip(group, results):
+            request.future.set_result(result)
 
 
 if __name__ == "__main__":
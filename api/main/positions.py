@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy import ColumnElement, Select, delete, func, or_, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import with_polymorphic
+from api.main import db
+from api.main.database import InvestedETFs, InvestedStocks, Investments, PortfolioPosition
+
+KEY_COLUMNS = ("user_id", "type", "ticker")
+# columns of `PortfolioPosition` that are sums over the lots
+ADDITIVE_COLUMNS = (
+    "lots",
+    "open_lots",
+    "volume",
+    "cost_basis",
+    "market_value",
+    "unrealized_profit",
+    "realized_profit",
+)
+
+lots = with_polymorphic(Investments, [InvestedETFs, InvestedStocks])
+
+
+def aggregate_lots(condition: ColumnElement = true()) -> Select:
+    """
+    Aggregate lots into positions, the same way `PortfolioPosition` rows are defined.
+
+    Args:
+        condition (ColumnElement, optional): Lots to aggregate, columns of `lots`.
+            Defaults to all lots.
+
+    Returns:
+        Select: Positions with `KEY_COLUMNS` and `ADDITIVE_COLUMNS`.
+    """
+    ticker = func.coalesce(lots.InvestedETFs.etf_ticker, lots.InvestedStocks.stock_ticker)
+    open_lot = lots.close_price.is_(None)
+
+    def total(value, where) -> ColumnElement:
+        return func.coalesce(func.sum(value).filter(where), 0)
+
+    return (
+        select(
+            lots.user_id,
+            lots.type,
+            ticker.label("ticker"),
+            func.count().label("lots"),
+            func.count().filter(open_lot).label("open_lots"),
+            total(lots.volume, open_lot).label("volume"),
+            total(lots.open_price * lots.volume, open_lot).label("cost_basis"),
+            total(lots.market_value, open_lot).label("market_value"),
+            total(lots.profit, open_lot).label("unrealized_profit"),
+            total(lots.profit, ~open_lot).label("realized_profit"),
+        )
+        .where(lots.user_id.is_not(None), condition)
+        .group_by(lots.user_id, lots.type, ticker)
+    )
+
+
+def apply_lots(condition: ColumnElement, sign: int = 1) -> None:
+    """
+    Add (or subtract) the contribution of the lots to their positions with one upsert.
+
+    Call it with `sign=1` after lots are inserted. When lots are updated or deleted, call
+    it with `sign=-1` before the change and with `sign=1` after it (for updates), all in
+    the same transaction.
+
+    Args:
+        condition (ColumnElement): Lots that changed, columns of `lots`,
+            e.g. `lots.investment_id.in_(ids)`.
+        sign (int, optional): 1 to add the lots, -1 to subtract them. Defaults to 1.
+    """
+    contributions = aggregate_lots(condition).subquery()
+    values = select(
+        *[contributions.c[name] for name in KEY_COLUMNS],
+        *[contributions.c[name] * sign for name in ADDITIVE_COLUMNS],
+    )
+    statement = pg_insert(PortfolioPosition).from_select([*KEY_COLUMNS, *ADDITIVE_COLUMNS], values)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            name: getattr(PortfolioPosition, name) + statement.excluded[name]
+            for name in ADDITIVE_COLUMNS
+        },
+    )
+    db.session.execute(statement)
+    if sign < 0:
+        db.session.execute(delete(PortfolioPosition).where(PortfolioPosition.lots <= 0))
+
+
+def rebuild_positions(user_id: Optional[int] = None) -> None:
+    """
+    Recompute positions from all lots, of one user or of everyone.
+
+    Args:
+        user_id (Optional[int], optional): User whose positions are rebuilt. Defaults to None.
+    """
+    owner = PortfolioPosition.user_id == user_id if user_id is not None else true()
+    db.session.execute(delete(PortfolioPosition).where(owner))
+    apply_lots(lots.user_id == user_id if user_id is not None else true())
+
+
+def check_positions(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Compare the positions with a full recompute from the lots.
+
+    Args:
+        user_id (Optional[int], optional): User whose positions are checked.
+            Defaults to None (all users).
+
+    Returns:
+        List[Dict[str, Any]]: Keys of inconsistent positions with the stored and the expected
+            values, empty when the snapshot is consistent.
+    """
+    expected = aggregate_lots(lots.user_id == user_id if user_id is not None else true()).subquery()
+    stored = (
+        select(PortfolioPosition)
+        .where(PortfolioPosition.user_id == user_id if user_id is not None else true())
+        .subquery()
+    )
+    on_key = [stored.c[name] == expected.c[name] for name in KEY_COLUMNS]
+    query = (
+        select(
+            *[func.coalesce(stored.c[name], expected.c[name]).label(name) for name in KEY_COLUMNS],
+            *[stored.c[name].label(f"stored_{name}") for name in ADDITIVE_COLUMNS],
+            *[expected.c[name].label(f"expected_{name}") for name in ADDITIVE_COLUMNS],
+        )
+        .select_from(stored.join(expected, db.and_(*on_key), full=True))
+        .where(
+            or_(*[stored.c[name].is_distinct_from(expected.c[name]) for name in ADDITIVE_COLUMNS])
+        )
+        .order_by(*KEY_COLUMNS)
+    )
+    return [row._asdict() for row in db.session.execute(query)]
@@ -0,0 +1,28 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional
+from api.main.config import AssetTypes
+
+
+@dataclass(frozen=True)
+class Security:
+    asset_type: AssetTypes
+    ticker: str
+    google_ticker: Optional[str] = None
+
+
+class PriceSource(ABC):
+    @abstractmethod
+    def get_prices(self, securities: List[Security]) -> Dict[Security, Decimal]:
+        """
+        Fetch the latest prices of the securities in one batch.
+
+        Args:
+            securities (List[Security]): Securities to quote.
+
+        Returns:
+            Dict[Security, Decimal]: Prices of the securities that were found, securities
+                without a quote are left out.
+        """
+        pass
@@ -0,0 +1,285 @@
+import csv
+import io
+import os
+from dataclasses import dataclass
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+import numpy as np
+from sqlalchemy import func, literal_column, select, text
+from api.main import db
+from api.main.database import PriceHistory
+
+EPOCH = np.datetime64("1970-01-01", "D")
+# `date - EPOCH_DATE` is the number of days since the epoch in PostgreSQL
+EPOCH_DATE = literal_column("DATE '1970-01-01'")
+
+Series = Tuple[np.ndarray, np.ndarray]
+DateLike = Union[date, str, np.datetime64, None]
+
+
+@dataclass
+class PriceMatrix:
+    """
+    Closes of several tickers aligned on the union of their trading days.
+
+    Attributes:
+        dates (np.ndarray): Sorted `datetime64[D]` trading days, shape (days,).
+        tickers (List[str]): Column labels.
+        closes (np.ndarray): float64 closes, shape (days, tickers), NaN where a ticker has
+            no close on a day.
+    """
+
+    dates: np.ndarray
+    tickers: List[str]
+    closes: np.ndarray
+
+
+def to_days(value: DateLike) -> Optional[int]:
+    if value is None:
+        return None
+    return int((np.datetime64(value, "D") - EPOCH).astype(np.int64))
+
+
+def unpack_array(buffer: memoryview, dtype: str) -> np.ndarray:
+    """
+    Decode a one dimensional PostgreSQL array without NULLs in binary format (`array_send`).
+
+    Args:
+        buffer (memoryview): Output of `array_send`.
+        dtype (str): Big-endian element type, e.g. '>f8' for float8 or '>i4' for int4.
+
+    Returns:
+        np.ndarray: Elements in native byte order.
+    """
+    ndim = int.from_bytes(buffer[:4], "big")
+    # every element is prefixed by its length
+    element = np.dtype([("length", ">i4"), ("value", dtype)])
+    values = np.frombuffer(buffer, element, offset=12 + 8 * ndim)["value"]
+    return values.astype(values.dtype.newbyteorder("="))
+
+
+class PriceCache:
+    """
+    Memory-mapped per-ticker series stored as .npy files, days since the epoch (int32) and
+    closes (float64). Entries are replaced atomically and dropped when the ticker is reloaded.
+
+    Args:
+        directory (str): Directory of the cache files, created if missing.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, ticker: str) -> Tuple[str, str]:
+        name = quote(ticker, safe="")
+        return (
+            os.path.join(self.directory, f"{name}.days.npy"),
+            os.path.join(self.directory, f"{name}.close.npy"),
+        )
+
+    def get(self, ticker: str) -> Optional[Series]:
+        try:
+            days, closes = (np.load(path, mmap_mode="r") for path in self._paths(ticker))
+        except (FileNotFoundError, ValueError):
+            return None
+        # the ticker was rewritten between reading the two files
+        if len(days) != len(closes):
+            return None
+        return days, closes
+
+    def put(self, ticker: str, days: np.ndarray, closes: np.ndarray) -> None:
+        for path, values in zip(self._paths(ticker), (days, closes)):
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                np.save(file, values)
+            os.replace(temporary, path)
+
+    def invalidate(self, tickers: Iterable[str]) -> None:
+        for ticker in tickers:
+            for path in self._paths(ticker):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class PriceHistoryStore:
+    """
+    Bulk loader and query API of the `price_history` table.
+
+    Args:
+        cache (Optional[PriceCache], optional): Cache of whole series of queried tickers.
+            Defaults to None.
+        chunk_size (int, optional): Records sent with one COPY. Defaults to 100000.
+    """
+
+    def __init__(self, cache: Optional[PriceCache] = None, chunk_size: int = 100000) -> None:
+        self.cache = cache
+        self.chunk_size = chunk_size
+
+    def ensure_partitions(self, years: Iterable[int]) -> None:
+        for year in sorted(set(years)):
+            db.session.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {PriceHistory.__tablename__}_{year:04d}"
+                    f" PARTITION OF {PriceHistory.__tablename__}"
+                    f" FOR VALUES FROM ('{year:04d}-01-01') TO ('{year + 1:04d}-01-01')"
+                )
+            )
+
+    def load(self, records: Iterable[Tuple[str, DateLike, float]]) -> int:
+        """
+        Insert or replace closes, the caller commits the transaction.
+
+        Records are copied into a temporary table and merged with one
+        `INSERT ... ON CONFLICT (ticker, date) DO UPDATE`, missing yearly partitions are
+        created first.
+
+        Args:
+            records (Iterable[Tuple[str, DateLike, float]]): Ticker, day and close.
+
+        Returns:
+            int: Number of merged rows.
+        """
+        staging = f"{PriceHistory.__tablename__}_staging"
+        db.session.execute(
+            text(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging}"
+                " (ticker VARCHAR(20) NOT NULL, date DATE NOT NULL, close FLOAT8 NOT NULL)"
+                " ON COMMIT DROP"
+            )
+        )
+        cursor = db.session.connection().connection.cursor()
+        try:
+            records = iter(records)
+            while chunk := list(islice(records, self.chunk_size)):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    (ticker, np.datetime64(day, "D"), repr(float(close)))
+                    for ticker, day, close in chunk
+                )
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {staging} FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+        years = db.session.scalars(
+            text(f"SELECT DISTINCT extract(year FROM date)::int FROM {staging}")
+        ).all()
+        self.ensure_partitions(years)
+        # the last close of a duplicated (ticker, date) wins
+        merged = db.session.execute(
+            text(
+                f"INSERT INTO {PriceHistory.__tablename__} (ticker, date, close)"
+                f" SELECT DISTINCT ON (ticker, date) ticker, date, close FROM {staging}"
+                " ORDER BY ticker, date, ctid DESC"
+                " ON CONFLICT (ticker, date) DO UPDATE SET close = excluded.close"
+            )
+        ).rowcount
+        if self.cache is not None:
+            self.cache.invalidate(
+                db.session.scalars(text(f"SELECT DISTINCT ticker FROM {staging}")).all()
+            )
+        db.session.execute(text(f"TRUNCATE {staging}"))
+        return merged
+
+    def fetch(self, tickers: Sequence[str], start: DateLike, end: DateLike) -> Dict[str, Series]:
+        """
+        Series of the tickers from the database, one row of two binary arrays per ticker.
+        """
+        if not len(tickers):
+            return {}
+        # both aggregates see the rows in the same order, sorting them in NumPy is much
+        # cheaper than `array_agg(... ORDER BY date)` which sorts all rows on the server
+        query = (
+            select(
+                PriceHistory.ticker,
+                func.array_send(func.array_agg(PriceHistory.date - EPOCH_DATE)),
+                func.array_send(func.array_agg(PriceHistory.close)),
+            )
+            .where(PriceHistory.ticker.in_(tickers))
+            .group_by(PriceHistory.ticker)
+        )
+        if start is not None:
+            query = query.where(PriceHistory.date >= np.datetime64(start, "D").item())
+        if end is not None:
+            query = query.where(PriceHistory.date <= np.datetime64(end, "D").item())
+        series = {}
+        for ticker, days, closes in db.session.execute(query):
+            days = unpack_array(days, ">i4")
+            order = np.argsort(days, kind="stable")
+            series[ticker] = days[order], unpack_array(closes, ">f8")[order]
+        return series
+
+    def get_series(self, ticker: str, start: DateLike = None, end: DateLike = None) -> Series:
+        """
+        Closes of one ticker between two days (inclusive).
+
+        Returns:
+            Series: `datetime64[D]` days and float64 closes, empty if nothing was loaded.
+        """
+        return self.get_many([ticker], start, end).get(
+            ticker, (np.empty(0, "datetime64[D]"), np.empty(0, np.float64))
+        )
+
+    def get_many(
+        self, tickers: Sequence[str], start: DateLike = None, end: DateLike = None
+    ) -> Dict[str, Series]:
+        first, last = to_days(start), to_days(end)
+        series: Dict[str, Series] = {}
+        missing = []
+        for ticker in dict.fromkeys(tickers):
+            cached = self.cache.get(ticker) if self.cache is not None else None
+            if cached is None:
+                missing.append(ticker)
+            else:
+                series[ticker] = cached
+
+        if self.cache is None:
+            series.update(self.fetch(missing, start, end))
+        else:
+            # whole series are cached and sliced below
+            for ticker, (days, closes) in self.fetch(missing, None, None).items():
+                self.cache.put(ticker, days, closes)
+                series[ticker] = days, closes
+
+        result = {}
+        for ticker, (days, closes) in series.items():
+            lo = np.searchsorted(days, first) if first is not None else 0
+            hi = np.searchsorted(days, last, side="right") if last is not None else len(days)
+            result[ticker] = (days[lo:hi] + EPOCH, closes[lo:hi])
+        return result
+
+    def get_matrix(
+        self, tickers: Sequence[str], start: DateLike = None, end: DateLike = None
+    ) -> PriceMatrix:
+        """
+        Closes of the tickers between two days (inclusive) aligned on common trading days.
+
+        Args:
+            tickers (Sequence[str]): Tickers, columns of the matrix.
+            start (DateLike, optional): First day. Defaults to None (no bound).
+            end (DateLike, optional): Last day. Defaults to None (no bound).
+
+        Returns:
+            PriceMatrix: Days, tickers and the closes.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        series = self.get_many(tickers, start, end)
+        days = [days for days, _ in series.values()]
+        if not len(days):
+            dates = np.empty(0, "datetime64[D]")
+        elif all(np.array_equal(days[0], other) for other in days[1:]):
+            # tickers of one exchange usually share their trading days
+            dates = days[0]
+        else:
+            dates = np.unique(np.concatenate(days))
+        closes = np.full((len(dates), len(tickers)), np.nan)
+        for column, ticker in enumerate(tickers):
+            if ticker in series:
+                ticker_days, values = series[ticker]
+                closes[np.searchsorted(dates, ticker_days), column] = values
+        return PriceMatrix(dates, tickers, closes)
@@ -0,0 +1,166 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Union
+from sqlalchemy import String, Numeric, and_, column, literal, select, union_all, update, values
+from api.main import db
+from api.main.config import AssetTypes
+from api.main.database import (
+    ASSET_TYPE_MAPPING,
+    TYPE_TO_TICKER_MAPPING,
+    InvestedETFs,
+    InvestedStocks,
+    Investments,
+    PortfolioPosition,
+)
+from api.main.prices import PriceSource, Security
+
+INVESTMENT_CLASSES = {AssetTypes.ETF: InvestedETFs, AssetTypes.STOCK: InvestedStocks}
+# investments.last_known_price is NUMERIC(9, 2)
+PRICE_PRECISION = Decimal("0.01")
+
+
+def collect_securities() -> List[Security]:
+    """
+    Distinct securities held in open lots, one query per asset type.
+
+    Returns:
+        List[Security]: Securities to quote.
+    """
+    securities = []
+    for asset_type, cls in INVESTMENT_CLASSES.items():
+        asset = ASSET_TYPE_MAPPING[asset_type]["class"]
+        ticker = getattr(asset, TYPE_TO_TICKER_MAPPING[asset_type])
+        held = (
+            select(cls.investment_id)
+            .where(
+                getattr(cls, TYPE_TO_TICKER_MAPPING[asset_type]) == ticker,
+                cls.close_price.is_(None),
+            )
+            .exists()
+        )
+        for row in db.session.execute(
+            select(ticker, asset.google_ticker).where(held).order_by(ticker)
+        ):
+            securities.append(Security(asset_type, row[0], row[1]))
+    return securities
+
+
+def fetch_prices(
+    securities: List[Security], sources: Dict[AssetTypes, PriceSource]
+) -> Dict[Security, Decimal]:
+    """
+    Quote the securities with one batch per price source.
+
+    Args:
+        securities (List[Security]): Securities to quote.
+        sources (Dict[AssetTypes, PriceSource]): Price source of each asset type, a source
+            may serve several types.
+
+    Returns:
+        Dict[Security, Decimal]: Prices rounded to the precision of `last_known_price`.
+    """
+    batches: Dict[int, List[Security]] = {}
+    for security in securities:
+        if security.asset_type in sources:
+            batches.setdefault(id(sources[security.asset_type]), []).append(security)
+
+    prices = {}
+    for batch in batches.values():
+        quotes = sources[batch[0].asset_type].get_prices(batch)
+        for security, price in quotes.items():
+            if price.is_finite() and price > 0:
+                prices[security] = price.quantize(PRICE_PRECISION)
+    return prices
+
+
+def write_prices(prices: Dict[Security, Decimal]) -> int:
+    """
+    Set `last_known_price` of the open lots and revalue their positions, with one
+    `UPDATE ... FROM (VALUES ...)` for each table.
+
+    Args:
+        prices (Dict[Security, Decimal]): Prices of the securities.
+
+    Returns:
+        int: Number of updated lots.
+    """
+    if not len(prices):
+        return 0
+    quotes = values(
+        column("type", String), column("ticker", String), column("price", Numeric), name="quotes"
+    ).data(
+        [
+            (
+                INVESTMENT_CLASSES[security.asset_type].__mapper__.polymorphic_identity,
+                security.ticker,
+                price,
+            )
+            for security, price in prices.items()
+        ]
+    )
+    lot_tickers = union_all(
+        *[
+            select(
+                cls.__table__.c.investment_id,
+                literal(cls.__mapper__.polymorphic_identity).label("type"),
+                cls.__table__.c[TYPE_TO_TICKER_MAPPING[asset_type]].label("ticker"),
+            )
+            for asset_type, cls in INVESTMENT_CLASSES.items()
+        ]
+    ).subquery("lot_tickers")
+    priced_lots = (
+        select(lot_tickers.c.investment_id, quotes.c.price)
+        .join(
+            quotes,
+            and_(quotes.c.type == lot_tickers.c.type, quotes.c.ticker == lot_tickers.c.ticker),
+        )
+        .subquery("priced_lots")
+    )
+    result = db.session.execute(
+        update(Investments.__table__)
+        .where(
+            Investments.investment_id == priced_lots.c.investment_id,
+            Investments.close_price.is_(None),
+        )
+        .values(last_known_price=priced_lots.c.price)
+    )
+
+    # every open lot of a position now has the same price, so the position is revalued
+    # from its aggregates instead of its lots
+    market_value = PortfolioPosition.volume * quotes.c.price
+    db.session.execute(
+        update(PortfolioPosition)
+        .where(PortfolioPosition.type == quotes.c.type, PortfolioPosition.ticker == quotes.c.ticker)
+        .values(
+            market_value=market_value,
+            unrealized_profit=market_value - PortfolioPosition.cost_basis,
+        )
+    )
+    return result.rowcount
+
+
+def refresh_prices(sources: Union[PriceSource, Dict[AssetTypes, PriceSource]]) -> Dict[str, Any]:
+    """
+    Refresh `last_known_price` of all open lots, the caller commits the transaction.
+
+    The cost grows with the number of distinct securities: one query per asset type to
+    collect them, one batch per price source and two set-based updates.
+
+    Args:
+        sources (Union[PriceSource, Dict[AssetTypes, PriceSource]]): Price source for all
+            asset types or for each of them.
+
+    Returns:
+        Dict[str, Any]: Numbers of quoted securities and updated lots and tickers without a
+            quote.
+    """
+    if isinstance(sources, PriceSource):
+        sources = {asset_type: sources for asset_type in AssetTypes}
+    securities = collect_securities()
+    prices = fetch_prices(securities, sources)
+    updated = write_prices(prices)
+    return {
+        "securities": len(securities),
+        "quoted": len(prices),
+        "updated_lots": updated,
+        "missing": [security.ticker for security in securities if security not in prices],
+    }
@@ -0,0 +1,55 @@
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Union
+from api.main.prices import PriceSource, Security
+
+
+class StaticPriceSource(PriceSource):
+    """
+    Quotes prices from a mapping of ticker (or Google ticker) to price, for tests and fixtures.
+    """
+
+    def __init__(self, prices: Dict[str, Union[str, float, Decimal]]) -> None:
+        self.prices = {ticker: Decimal(str(price)) for ticker, price in prices.items()}
+        self.requests: List[List[Security]] = []
+
+    def get_prices(self, securities: List[Security]) -> Dict[Security, Decimal]:
+        self.requests.append(securities)
+        quotes = {}
+        for security in securities:
+            for key in (security.ticker, security.google_ticker):
+                if key in self.prices:
+                    quotes[security] = self.prices[key]
+                    break
+        return quotes
+
+
+class FilePriceSource(StaticPriceSource):
+    """
+    Quotes prices from a CSV file with `ticker,price` columns or a JSON object
+    `{"ticker": price}`. The file is read on every batch, so it can be replaced between
+    refreshes.
+    """
+
+    def __init__(self, path: str) -> None:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Price file '{path}' not found!")
+        self.path = path
+        super().__init__({})
+
+    def read(self) -> Dict[str, Decimal]:
+        with open(self.path, newline="") as file:
+            if self.path.endswith(".json"):
+                prices = json.load(file)
+            else:
+                prices = {row["ticker"]: row["price"] for row in csv.DictReader(file)}
+        try:
+            return {ticker.strip(): Decimal(str(price)) for ticker, price in prices.items()}
+        except InvalidOperation:
+            raise ValueError(f"Price file '{self.path}' contains invalid prices!")
+
+    def get_prices(self, securities: List[Security]) -> Dict[Security, Decimal]:
+        self.prices = self.read()
+        return super().get_prices(securities)
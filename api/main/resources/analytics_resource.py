@@ -0,0 +1,70 @@
+from typing import Any, Dict
+import numpy as np
+from flask import abort
+from flask_restful import Resource
+from sqlalchemy import select
+from api.main import db
+from api.main.analytics import analyze_user
+from api.main.common.util import create_analytics_parser
+from api.main.database import Users
+from api.main.prices.history import PriceHistoryStore
+
+
+def to_json(value: Any) -> Any:
+    """
+    Convert NumPy arrays and scalars to JSON types, NaN becomes None.
+    """
+    if isinstance(value, np.ndarray) and np.issubdtype(value.dtype, np.datetime64):
+        return np.datetime_as_string(value, unit="D").tolist()
+    value = np.asarray(value, dtype=np.float64)
+    # whole array at once, masking NaN in an object array instead of per element checks
+    return np.where(np.isnan(value), None, value).tolist()
+
+
+class PortfolioAnalytics(Resource):
+    def __init__(self, **kwargs) -> None:
+        self.store: PriceHistoryStore = kwargs["store"]
+        self.parser = create_analytics_parser()
+
+    def get(self, username: str):
+        args = self.parser.parse_args()
+        user_id = db.session.scalar(select(Users.user_id).where(Users.username == username))
+        if user_id is None:
+            abort(400, f"User '{username}' not found in the database!")
+
+        try:
+            result = analyze_user(user_id, self.store, args.start, args.end, args.risk_free)
+        except ValueError as e:
+            abort(400, f"Invalid date: {e}")
+        if result is None:
+            abort(404, f"No price history of the investments of '{username}'!")
+
+        response: Dict[str, Any] = {
+            "username": username,
+            "start": to_json(result["dates"][:1])[0],
+            "end": to_json(result["dates"][-1:])[0],
+            "days": len(result["dates"]),
+            **{
+                key: to_json(result[key])
+                for key in (
+                    "total_return",
+                    "annualized_return",
+                    "annualized_volatility",
+                    "max_drawdown",
+                    "sharpe_ratio",
+                )
+            },
+            "covariance": {"tickers": result["tickers"], "matrix": to_json(result["covariance"])},
+            "correlation": {
+                "tickers": result["tickers"],
+                "matrix": to_json(result["correlation"]),
+            },
+        }
+        if args.series:
+            response["series"] = {
+                "dates": to_json(result["dates"]),
+                "values": to_json(result["values"]),
+                # the first day has no return
+                "returns": [None, *to_json(result["returns"])],
+            }
+        return response, 200
@@ -7,14 +7,20 @@ from api.main.database import (
     TYPE_TO_TICKER_MAPPING,
 )
 from api.main import db
+from api.main.config import AssetTypes
+from api.main.common.util import create_pagination_parser
+from api.main.common.pagination import paginate
 from flask import abort, request
 from flask_restful import Resource
-from sqlalchemy import select
-from typing import Union
+from sqlalchemy import select, ColumnElement
+from werkzeug.datastructures import MultiDict
+from typing import Union, List, Optional
 
 
-def map_str_to_math_operator(operator: str, attr_name: str, val2: Union[int, float]):
-    column = getattr(ETF, attr_name)
+def map_str_to_math_operator(
+    operator: str, attr_name: str, val2: Union[int, float], cls: Union[ETF, Stock] = ETF
+):
+    column = getattr(cls, attr_name)
     mapper = {
         "eq": column == val2,
         "ne": column != val2,
@@ -28,10 +34,74 @@ def map_str_to_math_operator(operator: str, attr_name: str, val2: Union[int, flo
     return mapper[operator]
 
 
+def create_filters(cls: Union[ETF, Stock], args: MultiDict) -> List[ColumnElement]:
+    """
+    Create SQL conditions from `<column>__<operator>=<value>` query arguments,
+    e.g. `ter__lt=0.2&fund_size__gt=1e9`.
+
+    Args:
+        cls (Union[ETF, Stock]): Filtered asset class.
+        args (MultiDict): Query arguments, arguments without '__' are skipped.
+
+    Returns:
+        List[ColumnElement]: Conditions to be joined with AND.
+    """
+    conditions = []
+    for key, value in args.items(multi=True):
+        if "__" not in key:
+            continue
+        attr_name, operator = key.rsplit("__", 1)
+        column = cls.__table__.columns.get(attr_name)
+        if column is None:
+            abort(400, f"{cls.__name__} has no attribute '{attr_name}'!")
+        try:
+            value = column.type.python_type(value)
+        except (ValueError, ArithmeticError):
+            abort(400, f"Invalid value '{value}' for '{attr_name}'!")
+        conditions.append(map_str_to_math_operator(operator, attr_name, value, cls))
+    return conditions
+
+
+def parse_asset_type(investment_type: Union[str, AssetTypes]) -> Optional[AssetTypes]:
+    """
+    Resolve the name or value of an asset type, e.g. 'etf', 'ETFs' or '1'.
+
+    Args:
+        investment_type (Union[str, AssetTypes]): Name or value of the asset type.
+
+    Returns:
+        Optional[AssetTypes]: Asset type, None if it is not supported.
+    """
+    if isinstance(investment_type, AssetTypes):
+        return investment_type
+    name = investment_type.strip().upper()
+    name = name[:-1] if name.endswith("S") else name
+    if name in AssetTypes.__members__:
+        return AssetTypes[name]
+    if name.isdigit() and int(name) in set(AssetTypes):
+        return AssetTypes(int(name))
+    return None
+
+
+def get_asset_type(investment_type: Union[str, AssetTypes]) -> AssetTypes:
+    """
+    Resolve the asset type given in the URL, aborts with 400 if it is not supported.
+
+    Args:
+        investment_type (Union[str, AssetTypes]): Name or value of the asset type.
+
+    Returns:
+        AssetTypes: Asset type.
+    """
+    asset_type = parse_asset_type(investment_type)
+    if asset_type is None:
+        abort(400, f"Type '{investment_type}' not supported!")
+    return asset_type
+
+
 class Asset(Resource):
     def get(self, investment_type: str):
-        if investment_type not in ASSET_TYPE_MAPPING:
-            abort(400, f"Type '{investment_type}' not supported!")
+        investment_type = get_asset_type(investment_type)
 
         args = request.args
         if not len(args):
@@ -54,8 +124,7 @@ class Asset(Resource):
         return ASSET_TYPE_MAPPING[investment_type]["schema"]().dump(asset), 200
 
     def post(self, investment_type: str):
-        if investment_type not in ASSET_TYPE_MAPPING:
-            abort(400, f"Type '{investment_type}' not supported!")
+        investment_type = get_asset_type(investment_type)
 
         schema: Union[ETFSchema, StocksSchema] = ASSET_TYPE_MAPPING[investment_type]["schema"]()
         request_data = ASSET_TYPE_MAPPING[investment_type]["parser"]().parse_args()
@@ -68,19 +137,20 @@ class Asset(Resource):
 
 class Assets(Resource):
     def get(self, investment_type: str):
-        if investment_type not in ASSET_TYPE_MAPPING:
-            abort(400, f"Type '{investment_type}' not supported!")
+        investment_type = get_asset_type(investment_type)
 
         cls: Union[ETF, Stock] = ASSET_TYPE_MAPPING[investment_type]["class"]
         schema: Union[ETFSchema, StocksSchema] = ASSET_TYPE_MAPPING[investment_type]["schema"]()
+        primary_key = getattr(cls, TYPE_TO_TICKER_MAPPING[investment_type])
 
-        assets = db.session.scalars(select(cls)).all()
-        if assets is None:
-            abort(404, f"{cls.__name__} not found!")
-        return [schema.dump(asset) for asset in assets], 200
+        args = create_pagination_parser().parse_args()
+        query = select(cls).where(*create_filters(cls, request.args))
+        assets, headers = paginate(cls, primary_key, schema, args, query)
+        return assets, 200, headers
 
 
-def find_financial_assets(identifier: str, type: str) -> Union[ETF, Stock, None]:
+def find_financial_assets(identifier: str, type: Union[str, AssetTypes]) -> Union[ETF, Stock, None]:
+    type = get_asset_type(type)
     attr_name = (
         TYPE_TO_TICKER_MAPPING[type]
         if len(identifier) <= 5
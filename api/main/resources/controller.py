@@ -1,12 +1,85 @@
 from flask_restful import Resource, reqparse
+from flask import abort, current_app, make_response, request
+from flask_login import current_user
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
 from abc import ABC, abstractmethod
-from api.main.model.llm import LLM
+from api.main.config import ENDPOINTS_CONFIG
+from api.main.model.jobs import ClientLimitExceeded, GenerationJob, GenerationJobQueue, QueueFull
+from api.main.model.llm import LLM, BatchScheduler, GenerationConfig, LoadState
+from api.main.model.cache import GenerationCache
+from typing import Union, Optional, Dict, List, Tuple, Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def client_id() -> str:
+    """
+    Client of the current request that generation limits are counted against, the logged in
+    user or the IP address (taken from X-Forwarded-For if `PROXY_FIX_X_FOR` is set).
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.get_id()}"
+    return request.remote_addr or "unknown"
+
+
+def job_accepted(job: GenerationJob) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """
+    Returns:
+        Tuple[Dict[str, Any], int, Dict[str, str]]: 202 response with the job and the URL
+            to poll its result at.
+    """
+    return job.to_dict(), 202, {"Location": f"{ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT}/{job.job_id}"}
+
+
+def ensure_ready(model: Union[LLM, BatchScheduler]) -> None:
+    """
+    Make sure the adapter is loaded, starts loading it in the background if it wasn't yet
+    (or retries it if it failed).
+
+    Raises:
+        ServiceUnavailable: 503 with Retry-After header until the adapter is loaded.
+    """
+    if model.ready:
+        return
+    registry, task_type = model.registry, model.task_type
+    registry.load_in_background()
+    if registry.states[task_type] == LoadState.FAILED:
+        raise ServiceUnavailable(
+            f"Model failed to load: {registry.errors[task_type]}",
+            retry_after=current_app.config["LLM_RETRY_AFTER"],
+        )
+    raise ServiceUnavailable(
+        f"Model {task_type.name} is loading, try again later.",
+        retry_after=current_app.config["LLM_RETRY_AFTER"],
+    )
+
+
+def submit_job(
+    jobs: GenerationJobQueue, work: Callable[[], Any], priority: int, task: str
+) -> GenerationJob:
+    """
+    Queue the generation for the client of the current request.
+
+    Raises:
+        ServiceUnavailable: 503 with Retry-After header if the queue is full.
+        TooManyRequests: 429 with Retry-After header if the client has too many generations.
+    """
+    try:
+        return jobs.submit(work, client_id(), priority, task)
+    except QueueFull as e:
+        raise ServiceUnavailable(str(e), retry_after=current_app.config["LLM_RETRY_AFTER"])
+    except ClientLimitExceeded as e:
+        raise TooManyRequests(str(e), retry_after=current_app.config["LLM_RETRY_AFTER"])
 
 
 class LLMController(Resource, ABC):
     def __init__(self, **kwargs) -> None:
-        self.model: LLM = kwargs["model"]
+        self.model: Union[LLM, BatchScheduler] = kwargs["model"]
         self.parser: reqparse.RequestParser = kwargs["parser"]
+        self.cache: Optional[GenerationCache] = kwargs.get("cache")
+        # prompts of one request, only the batch controllers receive it
+        self.max_items: int = kwargs.get("max_items", 1)
+        self.jobs: Optional[GenerationJobQueue] = kwargs.get("jobs")
 
     @abstractmethod
     def post(self):
@@ -16,3 +89,108 @@ class LLMController(Resource, ABC):
     @abstractmethod
     def create_prompt() -> str:
         pass
+
+    def ensure_ready(self) -> None:
+        ensure_ready(self.model)
+
+    def run(self, work: Callable[[], T]) -> T:
+        """
+        Run the generation on the inference workers of `jobs` and wait for it, so the request
+        handler never runs `generate` itself. Synchronous requests are queued before the jobs
+        of the job API.
+
+        Generations that do not finish within `LLM_SYNC_TIMEOUT` are answered with 202 and
+        the job (see `job_accepted`), they are finished in the background and the request
+        handler is free for other requests.
+
+        Returns:
+            T: Result of `work`.
+        """
+        if self.jobs is None:
+            return work()
+        job = submit_job(self.jobs, work, 0, self.model.task_type.name.lower())
+        if not job.wait(current_app.config["LLM_SYNC_TIMEOUT"]):
+            abort(make_response(*job_accepted(job)))
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def check_items(self, count: int) -> None:
+        """
+        Aborts with 400 unless a batch request has between 1 and `max_items` prompts.
+        """
+        if not 1 <= count <= self.max_items:
+            abort(400, f"Batch must contain between 1 and {self.max_items} prompts!")
+
+    def generate(
+        self, prompt: str, generation_config: GenerationConfig
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Generate the response, deterministic generations are answered from the cache if possible.
+
+        Args:
+            prompt (str): Prompt created with `create_prompt`.
+            generation_config (GenerationConfig): Configuration for the generation.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, str]]: Generated response and cache headers.
+        """
+
+        def work() -> Dict[str, Any]:
+            return self.model.generate_response(prompt, generation_config)
+
+        if self.cache is None:
+            return self.run(work), {}
+        if not self.cache.cacheable(generation_config):
+            return self.run(work), self.cache.headers("BYPASS")
+
+        key = self.cache.key(self.model.task_type, prompt, generation_config)
+        result = self.cache.get(key)
+        if result is not None:
+            return result, self.cache.headers("HIT")
+
+        def cached_work() -> Dict[str, Any]:
+            # cached by the job, also when the request was answered with 202
+            result = work()
+            self.cache.set(key, result)
+            return result
+
+        return self.run(cached_work), self.cache.headers("MISS")
+
+    def generate_many(
+        self, prompts: List[str], generation_config: GenerationConfig
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Generate the responses of a batch request, only prompts missing in the cache are
+        generated and every distinct prompt only once.
+
+        Args:
+            prompts (List[str]): Prompts created with `create_prompt`.
+            generation_config (GenerationConfig): Configuration shared by the prompts.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, str]]: Responses in the order of `prompts`
+                and cache headers.
+        """
+        if self.cache is None or not self.cache.cacheable(generation_config):
+            results = self.run(lambda: self.model.generate_many(prompts, generation_config))
+            return results, {} if self.cache is None else self.cache.headers("BYPASS")
+
+        keys = [
+            self.cache.key(self.model.task_type, prompt, generation_config) for prompt in prompts
+        ]
+        found = {key: self.cache.get(key) for key in set(keys)}
+        missing = {key: prompt for key, prompt in zip(keys, prompts) if found[key] is None}
+        if len(missing):
+
+            def work() -> List[Dict[str, Any]]:
+                generated = self.model.generate_many(list(missing.values()), generation_config)
+                for key, result in zip(missing, generated):
+                    self.cache.set(key, result)
+                return generated
+
+            for key, result in zip(missing, self.run(work)):
+                found[key] = result
+        # results of repeated prompts are copied, the caller adds its fields to them
+        results = [dict(found[key]) for key in keys]
+        return results, self.cache.headers("MISS" if len(missing) else "HIT")
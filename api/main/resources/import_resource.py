@@ -0,0 +1,37 @@
+import io
+from flask import abort, current_app, request
+from flask_restful import Resource
+from sqlalchemy import select
+from api.main import db
+from api.main.database import Users
+from api.main.importer import READERS, InvestmentImporter
+
+MIMETYPES = {
+    "text/csv": "csv",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl",
+    "application/x-ndjson": "jsonl",
+}
+
+
+class InvestmentsImport(Resource):
+    def post(self, username: str):
+        user_id = db.session.scalar(select(Users.user_id).where(Users.username == username))
+        if user_id is None:
+            abort(400, f"User '{username}' not found in the database!")
+
+        file_format = request.args.get("format") or MIMETYPES.get(request.mimetype)
+        if file_format not in READERS:
+            abort(415, "Send text/csv or application/x-ndjson, or use ?format=csv|jsonl!")
+
+        # the body is read as it is parsed, it is never held in memory as a whole
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+        importer = InvestmentImporter(
+            user_id, current_app.config["IMPORT_BATCH_SIZE"], current_app.config["IMPORT_METHOD"]
+        )
+        try:
+            report = importer.run(READERS[file_format](stream))
+        except UnicodeDecodeError:
+            abort(400, "File must be UTF-8 encoded!")
+        db.session.commit()
+        return report, 200 if report["imported"] or not report["failed"] else 400
@@ -5,15 +5,30 @@ from api.main.database import (
     InvestedStocksSchema,
     Investments,
     InvestmentsSchema,
+    ETFSchema,
+    StocksSchema,
+    PortfolioPosition,
+    PortfolioPositionSchema,
 )
 from api.main import db
-from sqlalchemy import select, insert
+from api.main.positions import apply_lots, lots
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import with_polymorphic, joinedload
 from flask import abort, request
-from flask_restful import Resource
+from flask_restful import Resource, marshal_with
 from api.main.database import Users
 from typing import Dict, Any
-from api.main.common.util import create_invest_etf_parser, create_invest_stock_parser
-from api.main.resources.asset_resource import find_financial_assets, TYPE_TO_TICKER_MAPPING
+from api.main.common.util import (
+    create_invest_etf_parser,
+    create_invest_stock_parser,
+    portfolio_summary_blueprint,
+    portfolio_valuation_blueprint,
+)
+from api.main.resources.asset_resource import (
+    find_financial_assets,
+    get_asset_type,
+    TYPE_TO_TICKER_MAPPING,
+)
 
 
 MAPPINGS: Dict[str, Dict[str, Any]] = {
@@ -30,55 +45,125 @@ MAPPINGS: Dict[str, Dict[str, Any]] = {
     "all": {"class": Investments, "schema": InvestmentsSchema},
 }
 
+ASSET_RELATIONSHIPS: Dict[str, str] = {"etfs": "etf_fk", "stocks": "stock_fk"}
+ASSET_SCHEMAS: Dict[str, Any] = {"etfs": ETFSchema, "stocks": StocksSchema}
+
 
 class UserInvestedAssets(Resource):
     def get(self, username: str):
-        user = db.session.scalars(select(Users).where(Users.username == username)).one_or_none()
-
-        if user is None:
-            abort(400, f"User '{username}' not found in the database!")
-
         args = request.args.to_dict()
         investment_type = args["type"] if "type" in args else "all"
+        include_asset = "asset" in args.get("include", "").split(",")
 
-        if investment_type in MAPPINGS:
-            cls = MAPPINGS[investment_type]["class"]
-            investments = db.session.scalars(select(cls).where(cls.username == username)).all()
-        else:
+        if investment_type not in MAPPINGS:
             abort(400, f"Type '{args['type']}' not supported!")
 
+        # one statement: investments with their subclass tables and assets joined in
+        cls = MAPPINGS[investment_type]["class"]
+        if cls is Investments:
+            cls = with_polymorphic(Investments, [InvestedETFs, InvestedStocks])
+            asset_relationships = [cls.InvestedETFs.etf_fk, cls.InvestedStocks.stock_fk]
+        else:
+            asset_relationships = [getattr(cls, ASSET_RELATIONSHIPS[investment_type])]
+        query = (
+            select(cls)
+            .join(Users, Users.user_id == cls.user_id)
+            .where(Users.username == username)
+            .order_by(cls.investment_id)
+        )
+        if include_asset:
+            query = query.options(*[joinedload(rel) for rel in asset_relationships])
+        investments = db.session.scalars(query).all()
+
         if not len(investments):
+            if db.session.scalar(select(Users.user_id).where(Users.username == username)) is None:
+                abort(400, f"User '{username}' not found in the database!")
             abort(
                 404,
                 f"User '{username}' did not invest in any"
                 + f" {investment_type.upper() if investment_type != 'all' else 'securities'}!",
             )
 
-        return [MAPPINGS[investment.type].dump(investment) for investment in investments], 200
+        schemas = {name: MAPPINGS[name]["schema"]() for name in ASSET_RELATIONSHIPS}
+        asset_schemas = {name: ASSET_SCHEMAS[name]() for name in ASSET_RELATIONSHIPS}
+        result = []
+        for investment in investments:
+            dumped = schemas[investment.type].dump(investment)
+            if include_asset:
+                asset = getattr(investment, ASSET_RELATIONSHIPS[investment.type])
+                dumped["asset"] = asset_schemas[investment.type].dump(asset)
+            result.append(dumped)
+        return result, 200
+
+
+class UserPortfolioSummary(Resource):
+    @marshal_with(portfolio_summary_blueprint)
+    def get(self, username: str):
+        query = (
+            select(
+                PortfolioPosition.type,
+                *[
+                    func.sum(getattr(PortfolioPosition, name)).label(name)
+                    for name in portfolio_valuation_blueprint
+                ],
+            )
+            .join(Users, Users.user_id == PortfolioPosition.user_id)
+            .where(Users.username == username)
+            .group_by(PortfolioPosition.type)
+            .order_by(PortfolioPosition.type)
+        )
+        by_type = [row._asdict() for row in db.session.execute(query)]
+
+        if not len(by_type):
+            if db.session.scalar(select(Users.user_id).where(Users.username == username)) is None:
+                abort(400, f"User '{username}' not found in the database!")
+
+        summary = {
+            key: sum(breakdown[key] for breakdown in by_type)
+            for key in portfolio_valuation_blueprint
+        }
+        return {"username": username, **summary, "by_type": by_type}, 200
+
+
+class UserPositions(Resource):
+    def get(self, username: str):
+        positions = db.session.scalars(
+            select(PortfolioPosition)
+            .join(Users, Users.user_id == PortfolioPosition.user_id)
+            .where(Users.username == username)
+            .order_by(PortfolioPosition.type, PortfolioPosition.ticker)
+        ).all()
+
+        if not len(positions):
+            if db.session.scalar(select(Users.user_id).where(Users.username == username)) is None:
+                abort(400, f"User '{username}' not found in the database!")
+
+        return PortfolioPositionSchema(many=True).dump(positions), 200
 
 
 class Invest(Resource):
     def post(self, username: str, investment_type: str):
-        user = db.session.execute(select(Users).where(Users.username == username)).first()
-        if not user:
+        user_id = db.session.scalar(select(Users.user_id).where(Users.username == username))
+        if user_id is None:
             abort(400, f"User '{username}' not found in the database!")
 
-        if investment_type not in MAPPINGS:
+        if investment_type not in ASSET_RELATIONSHIPS:
             abort(400, f"Type '{investment_type}' not supported!")
 
         args = MAPPINGS[investment_type]["parser"]().parse_args()
-        args["username"] = username
-
-        asset = find_financial_assets(
-            args[TYPE_TO_TICKER_MAPPING[investment_type]], investment_type
-        )
+        # skipped arguments fall back to the column defaults
+        args = {key: value for key, value in args.items() if value is not None}
+        del args["username"]
+        args["user_id"] = user_id
 
-        if not asset:
-            abort(400, f"Security '{args[TYPE_TO_TICKER_MAPPING[investment_type]]}' not found!")
+        ticker_attr = TYPE_TO_TICKER_MAPPING[get_asset_type(investment_type)]
+        # aborts with 404 when the security does not exist
+        find_financial_assets(args[ticker_attr], investment_type)
 
         cls = MAPPINGS[investment_type]["class"]
         inserted = db.session.scalars(insert(cls).returning(cls), [args]).first()
         result = MAPPINGS[investment_type]["schema"]().dump(inserted)
+        apply_lots(lots.investment_id == inserted.investment_id)
 
         db.session.commit()
         return result, 200
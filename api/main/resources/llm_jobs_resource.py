@@ -0,0 +1,63 @@
+from flask import abort, current_app
+from flask_restful import Resource, reqparse
+from typing import Any, Callable, Dict, Tuple, Union
+from werkzeug.exceptions import HTTPException
+from api.main.common.util import create_llm_job_parser, create_llm_job_wait_parser
+from api.main.model.jobs import GenerationJobQueue
+from api.main.model.llm import LLM, BatchScheduler, GenerationConfig
+from api.main.resources.controller import ensure_ready, job_accepted, submit_job
+
+
+class LLMJobs(Resource):
+    """
+    Queues a generation of any task and answers right away with the job, the request body has
+    the fields of the task's endpoint and `task` with `priority`.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        # task name to its model, request parser and prompt of the parsed arguments
+        self.tasks: Dict[
+            str,
+            Tuple[Union[LLM, BatchScheduler], reqparse.RequestParser, Callable[[Dict], str]],
+        ] = kwargs["tasks"]
+        self.jobs: GenerationJobQueue = kwargs["jobs"]
+        self.parser = create_llm_job_parser()
+
+    def post(self):
+        args = self.parser.parse_args()
+        if args.task not in self.tasks:
+            abort(400, f"Unknown task '{args.task}', available: {', '.join(self.tasks)}!")
+        model, parser, prompt_from = self.tasks[args.task]
+        ensure_ready(model)
+        data = parser.parse_args()
+        try:
+            generation_config = GenerationConfig(**data)
+            prompt = prompt_from(data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            abort(400, str(e))
+
+        def work() -> Dict[str, Any]:
+            return model.generate_response(prompt, generation_config)
+
+        return job_accepted(submit_job(self.jobs, work, args.priority, args.task))
+
+
+class LLMJob(Resource):
+    """
+    Result of a generation job, `wait` long-polls for up to `LLM_JOB_MAX_WAIT` seconds.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        self.jobs: GenerationJobQueue = kwargs["jobs"]
+        self.parser = create_llm_job_wait_parser()
+
+    def get(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None:
+            abort(404, f"Generation job '{job_id}' not found!")
+        wait = self.parser.parse_args().wait
+        if wait > 0:
+            job.wait(min(wait, current_app.config["LLM_JOB_MAX_WAIT"]))
+        return job.to_dict(), 200
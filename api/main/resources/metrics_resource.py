@@ -0,0 +1,13 @@
+from flask_restful import Resource
+from typing import Dict
+from api.main.model.llm import BatchScheduler
+
+
+class LLMMetrics(Resource):
+    def __init__(self, **kwargs) -> None:
+        self.schedulers: Dict[str, BatchScheduler] = kwargs["schedulers"]
+
+    def get(self):
+        return {
+            name: scheduler.metrics.snapshot() for name, scheduler in self.schedulers.items()
+        }, 200
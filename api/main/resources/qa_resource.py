@@ -0,0 +1,46 @@
+from flask_restful import marshal_with
+from werkzeug.exceptions import HTTPException
+from flask import abort
+from typing import Any, Dict, Optional
+from api.main.model.llm import GenerationConfig
+from api.main.common.util import response_blueprint
+from api.main.resources.controller import LLMController
+
+
+class QAController(LLMController):
+    @marshal_with(response_blueprint)
+    def post(self):
+        self.ensure_ready()
+        data = self.parser.parse_args()
+        try:
+            generation_config = GenerationConfig(**data)
+            prompt = QAController.prompt_from(data)
+            result, headers = self.generate(prompt, generation_config)
+        except HTTPException:
+            raise
+        except Exception as e:
+            abort(400, str(e))
+        return {**result, "code": 200}, 200, headers
+
+    @staticmethod
+    def prompt_from(data: Dict[str, Any]) -> str:
+        """
+        Prompt of parsed request arguments.
+        """
+        return QAController.create_prompt(data["question"], data["context"])
+
+    def create_prompt(question: str, context: Optional[str] = None) -> str:
+        """
+        Create the prompt for the model (same format as used for fine-tuning).
+
+        Args:
+            question (str): Question.
+            context (Optional[str], optional): Context of the question. Defaults to None.
+
+        Returns:
+            str: Prompt for the model.
+        """
+        question = question.strip()
+        if not context:
+            return f"{question}\nAnswer: "
+        return f"Given the context.\n{context.strip()}\n{question}\nAnswer: "
@@ -0,0 +1,19 @@
+from flask_restful import Resource
+from api.main.model.llm import AdapterRegistry
+
+
+class LLMReadiness(Resource):
+    def __init__(self, **kwargs) -> None:
+        self.registry: AdapterRegistry = kwargs["registry"]
+
+    def get(self):
+        adapters = {
+            task_type.name.lower(): {
+                "state": state,
+                "engine": self.registry.engines[task_type],
+                "error": self.registry.errors.get(task_type),
+            }
+            for task_type, state in self.registry.states.items()
+        }
+        ready = all(self.registry.is_ready(task_type) for task_type in self.registry.states)
+        return {"ready": ready, "adapters": adapters}, 200 if ready else 503
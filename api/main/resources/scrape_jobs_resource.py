@@ -0,0 +1,28 @@
+from flask import abort
+from flask_restful import Resource
+from api.main.asset_scraper.jobs import get_job_queue
+from api.main.common.util import create_scrape_job_parser
+from api.main.config import ENDPOINTS_CONFIG
+from api.main.resources.asset_resource import get_asset_type
+
+
+class ScrapeJobs(Resource):
+    def __init__(self) -> None:
+        self.parser = create_scrape_job_parser()
+
+    def post(self):
+        args = self.parser.parse_args()
+        job = get_job_queue().submit(get_asset_type(args.asset_type), args.isin, args.ticker)
+        return (
+            job.to_dict(),
+            202,
+            {"Location": f"{ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT}/{job.job_id}"},
+        )
+
+
+class ScrapeJob(Resource):
+    def get(self, job_id: str):
+        job = get_job_queue().get(job_id)
+        if job is None:
+            abort(404, f"Scrape job '{job_id}' not found!")
+        return job.to_dict(), 200
@@ -1,24 +1,32 @@
 from flask_restful import marshal_with
+from werkzeug.exceptions import HTTPException
 from flask import abort
-from api.main.model.llm import GenerationConfig
-from api.main.common.util import response_blueprint
+from typing import Any, Dict, List
+from api.main.model.llm import GenerationConfig, PrefixedPrompt
+from api.main.common.util import batch_response_blueprint, response_blueprint
 from api.main.resources.controller import LLMController
 
 
 class SQLController(LLMController):
     @marshal_with(response_blueprint)
     def post(self):
+        """
+        SQL query answering `question` about `sql_table`, answered with 202 and the job if it
+        takes longer than `LLM_SYNC_TIMEOUT` (see `LLMController.run`).
+        """
+        self.ensure_ready()
         data = self.parser.parse_args()
         try:
             generation_config = GenerationConfig(**data)
-            prompt = SQLController.create_prompt(data["sql_table"], data["question"])
-            result = self.model.generate_response(prompt, generation_config)
+            prompt = SQLController.prompt_from(data)
+            result, headers = self.generate(prompt, generation_config)
+        except HTTPException:
+            raise
         except Exception as e:
             abort(400, str(e))
-        result["code"] = 200
-        return result
+        return {**result, "code": 200}, 200, headers
 
-    def create_prompt(table: str, question: str) -> str:
+    def create_prompt(table: str, question: str) -> PrefixedPrompt:
         """
         Create the prompt for the model.
 
@@ -27,10 +35,56 @@ class SQLController(LLMController):
             question (str): Question.
 
         Returns:
-            str: Prompt for the model.
+            PrefixedPrompt: Prompt for the model, the schema is its prefix.
         """
         table = table.strip()
         question = question.strip()
         start = "Given the SQL code.\n"
         end = f"Generate the SQL code to answer the following question.\n{question}"
-        return f"{start}{table}\n{end}\nAnswer:"
+        return PrefixedPrompt(f"{start}{table}", f"{end}\nAnswer:")
+
+    @staticmethod
+    def prompt_from(data: Dict[str, Any]) -> PrefixedPrompt:
+        """
+        Prompt of parsed request arguments.
+        """
+        return SQLController.create_prompt(data["sql_table"], data["question"])
+
+    def create_prompts(table: str, questions: List[str]) -> List[PrefixedPrompt]:
+        """
+        Create prompts of many questions about one schema, the schema is tokenized once when
+        they are generated together with `LLM.generate_many`.
+        """
+        return [SQLController.create_prompt(table, question) for question in questions]
+
+
+class SQLBatchController(SQLController):
+    @marshal_with(batch_response_blueprint)
+    def post(self):
+        """
+        Questions about one `sql_table` (`questions`) or `items` with their own `sql_table`
+        and `question`, results are returned in the order of the questions.
+        """
+        self.ensure_ready()
+        data = self.parser.parse_args()
+        if data["items"] is not None:
+            pairs = [(item.get("sql_table"), item.get("question")) for item in data["items"]]
+        elif data["sql_table"] is not None and data["questions"] is not None:
+            pairs = [(data["sql_table"], question) for question in data["questions"]]
+        else:
+            abort(400, "Either sql_table with questions or items are required!")
+        if not all(isinstance(value, str) for pair in pairs for value in pair):
+            abort(400, "Every item needs sql_table and question strings!")
+        self.check_items(len(pairs))
+        try:
+            generation_config = GenerationConfig(**data)
+            if data["items"] is not None:
+                prompts = [SQLController.create_prompt(*pair) for pair in pairs]
+            else:
+                prompts = SQLController.create_prompts(data["sql_table"], data["questions"])
+            results, headers = self.generate_many(prompts, generation_config)
+        except HTTPException:
+            raise
+        except Exception as e:
+            abort(400, str(e))
+        return {"code": 200, "results": results}, 200, headers
@@ -1,22 +1,96 @@
-from api.main.resources.controller import LLMController
-from api.main.common.util import response_blueprint
-from flask_restful import marshal_with
-from flask import abort
+import json
+from api.main.resources.controller import LLMController, submit_job
+from api.main.common.util import batch_response_blueprint, response_blueprint
+from flask_restful import marshal
+from werkzeug.exceptions import HTTPException
+from flask import abort, Response, stream_with_context
+from typing import Any, Dict, Iterator, Optional
 from api.main.model.llm import GenerationConfig
 
 
 class SummaryController(LLMController):
-    @marshal_with(response_blueprint)
     def post(self):
+        """
+        Summary of `text`, answered with 202 and the job if it takes longer than
+        `LLM_SYNC_TIMEOUT` (see `LLMController.run`). Streamed summaries are never answered
+        with 202.
+        """
+        self.ensure_ready()
         data = self.parser.parse_args()
         try:
             generation_config = GenerationConfig(**data)
-            prompt = SummaryController.create_prompt(data["text"])
-            result = self.model.generate_response(prompt, generation_config)
+            prompt = SummaryController.prompt_from(data)
+            if data["stream"]:
+                return self.stream(prompt, generation_config)
+            result, headers = self.generate(prompt, generation_config)
+        except HTTPException:
+            raise
         except Exception as e:
             abort(400, str(e))
-        result["code"] = 200
-        return result
+        return marshal({**result, "code": 200}, response_blueprint), 200, headers
+
+    def stream(self, prompt: str, generation_config: GenerationConfig) -> Response:
+        """
+        Stream the summary as Server-Sent Events. The generation runs as a job of `jobs`, so
+        streams count against the queue and client limits like other generations, cached
+        summaries are sent as one chunk.
+        """
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        cached = None
+        if self.cache is not None and self.cache.cacheable(generation_config):
+            cached = self.cache.get(self.cache.key(self.model.task_type, prompt, generation_config))
+        if cached is not None:
+            chunks, warning = iter(cached["generated_sequence"]), cached["tokenizer_warning"]
+            headers.update(self.cache.headers("HIT"))
+        else:
+            run = (
+                None
+                if self.jobs is None
+                else lambda generate: submit_job(
+                    self.jobs, generate, 0, self.model.task_type.name.lower()
+                )
+            )
+            chunks, warning = self.model.stream_response(prompt, generation_config, run)
+        return Response(
+            stream_with_context(SummaryController.stream_events(chunks, warning)),
+            mimetype="text/event-stream",
+            headers=headers,
+        )
+
+    @staticmethod
+    def stream_events(chunks: Iterator[str], tokenizer_warning: Optional[str]) -> Iterator[str]:
+        """
+        Server-Sent Events with the generated text, "token" events carry decoded chunks
+        and the final "result" event has the same shape as the non-streaming response.
+
+        Args:
+            chunks (Iterator[str]): Decoded chunks of the summary.
+            tokenizer_warning (Optional[str]): Warning returned by the tokenizer.
+
+        Yields:
+            str: Encoded events.
+        """
+        summary = []
+        try:
+            for chunk in chunks:
+                summary.append(chunk)
+                yield f"event: token\ndata: {json.dumps({'token': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'code': 400, 'message': str(e)})}\n\n"
+            return
+        result = {
+            "code": 200,
+            "generated_sequence": ["".join(summary).strip()],
+            "tokenizer_warning": tokenizer_warning,
+        }
+        yield f"event: result\ndata: {json.dumps(marshal(result, response_blueprint))}\n\n"
+
+    @staticmethod
+    def prompt_from(data: Dict[str, Any]) -> str:
+        """
+        Prompt of parsed request arguments.
+        """
+        return SummaryController.create_prompt(data["text"])
 
     def create_prompt(text: str) -> str:
         """
@@ -31,3 +105,22 @@ class SummaryController(LLMController):
         text = text.strip().strip("\n")
         start = "Summarize the following text.\n"
         return f"{start}{text}\nSummary:"
+
+
+class SummaryBatchController(SummaryController):
+    def post(self):
+        """
+        Summaries of `texts`, in the same order.
+        """
+        self.ensure_ready()
+        data = self.parser.parse_args()
+        self.check_items(len(data["texts"]))
+        try:
+            generation_config = GenerationConfig(**data)
+            prompts = [SummaryController.create_prompt(text) for text in data["texts"]]
+            results, headers = self.generate_many(prompts, generation_config)
+        except HTTPException:
+            raise
+        except Exception as e:
+            abort(400, str(e))
+        return marshal({"code": 200, "results": results}, batch_response_blueprint), 200, headers
@@ -3,7 +3,8 @@ from api.main import db
 from api.main.database import Users, UsersSchema
 from flask import request, abort
 from sqlalchemy import select, update, delete
-from api.main.common.util import create_user_parser
+from api.main.common.util import create_user_parser, create_pagination_parser
+from api.main.common.pagination import paginate
 
 
 class UserResource(Resource):
@@ -69,6 +70,6 @@ class UserResource(Resource):
 
 class UsersResource(Resource):
     def get(self):
-        users = db.session.scalars(select(Users)).all()
-        user_schema = UsersSchema()
-        return [user_schema.dump(user) for user in users], 200
+        args = create_pagination_parser().parse_args()
+        users, headers = paginate(Users, Users.user_id, UsersSchema(), args)
+        return users, 200, headers
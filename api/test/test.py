@@ -1,6 +1,43 @@
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
+import numpy as np
+import torch
+from bs4 import BeautifulSoup
+from contextlib import contextmanager
+from peft import PeftModel
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from transformers import GenerationConfig
 from api.main import db, ENDPOINTS_CONFIG, create_app
-from api.main.database import Users
+from api.main.analytics import Lots, analyze
+from api.main.asset_scraper import ScraperConfig
+from api.main.asset_scraper.browser import BrowserPool
+from api.main.asset_scraper.catalog import CatalogIngester, read_pairs, upsert_etfs
+from api.main.asset_scraper.jobs import JobQueue, PermanentError
+from api.main.common.jobs import JobStatus
+from api.main.asset_scraper.scrapers import ETFScraper, parse_details_page
+from api.main.common.pagination import encode_cursor
+from api.main.model.jobs import ClientLimitExceeded, GenerationJobQueue, QueueFull
+from api.main.model.llm import AdapterRegistry, BatchScheduler, Engine, LoadState, PrefixedPrompt
+from api.main.model.llm import load_merged_model, quantize_int8
+from api.main.resources.sql_resource import SQLController
+from api.main.database import ETF, Users, Investments, InvestedStocks, PriceHistory
+from api.main.positions import apply_lots, check_positions, lots
+from api.main.prices.history import PriceCache, PriceHistoryStore
+from api.main.prices.refresh import refresh_prices
+from api.main.prices.sources import FilePriceSource, StaticPriceSource
+from api.main.config import AssetTypes, LLMType, MERGED_CONFIG_NAME, get_model_path, mapping
+from flan_t5.export_model import export
 
 table = """CREATE TABLE department (creation VARCHAR, department_id VARCHAR);
 CREATE TABLE management (department_id VARCHAR, head_id VARCHAR);
@@ -19,13 +56,94 @@ The development server is provided for convenience,
 but is not designed to be particularly secure, stable, or efficient.
 See Deploying to Production for how to run in production.
 """
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
 app = create_app("test")
 
 
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+class FakeDriver:
+    """
+    Serves fixture pages in place of a browser, unknown URLs redirect to the ETF search.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.loads = []
+        self.broken = False
+        self.closed = False
+        self.url, self.page_source = "about:blank", ""
+
+    @property
+    def current_url(self):
+        if self.broken:
+            raise WebDriverException("chrome not reachable")
+        return self.url
+
+    def get(self, url):
+        self.loads.append(url)
+        if url in self.pages:
+            self.url, fixture = url, self.pages[url]
+        else:
+            self.url, fixture = "https://www.justetf.com/en/find-etf.html", "find_etf.html"
+        with open(os.path.join(FIXTURES, fixture)) as file:
+            self.page_source = file.read()
+
+    def find_elements(self, by, value):
+        return [self] if f'class="table {value}"' in self.page_source else []
+
+    def find_element(self, by, value):
+        if not len(self.find_elements(by, value)):
+            raise NoSuchElementException(value)
+        return self
+
+    def quit(self):
+        self.closed = True
+
+
+def wait_for_models(client, timeout: float = 600):
+    """
+    Models are loaded in the background, fails as soon as one of them failed to load.
+    """
+    deadline = time.monotonic() + timeout
+    while (response := client.get(ENDPOINTS_CONFIG.LLM_READY_ENDPOINT)).status_code == 503:
+        failed = {
+            name: adapter["error"]
+            for name, adapter in response.json["adapters"].items()
+            if adapter["state"] == "failed"
+        }
+        if failed:
+            raise RuntimeError(f"Models failed to load: {failed}")
+        if time.monotonic() > deadline:
+            raise TimeoutError("Models were not loaded in time!")
+        time.sleep(0.5)
+
+
 class TestLLMController(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         cls.app = app.test_client()
+        wait_for_models(cls.app)
+
+    def test_llm_ready(self):
+        response = self.app.get(ENDPOINTS_CONFIG.LLM_READY_ENDPOINT)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json["ready"])
+        self.assertEqual(response.json["adapters"]["sql"]["state"], "ready")
 
     def test_sql_post(self):
         response = self.app.post(
@@ -53,6 +171,323 @@ class TestLLMController(unittest.TestCase):
         self.assertIn("generated_sequence", response.json)
         self.assertIsInstance(response.json["generated_sequence"], list)
 
+    def test_sql_post_cached(self):
+        data = {"sql_table": table, "question": "How many departments are there?"}
+        first = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json=data)
+        second = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json=data)
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(first.json, second.json)
+
+        data["do_sample"] = True
+        response = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json=data)
+        self.assertEqual(response.headers["X-Cache"], "BYPASS")
+
+    def test_summary_stream(self):
+        response = self.app.post(
+            ENDPOINTS_CONFIG.SUMMARY_ENDPOINT,
+            json={"text": article, "stream": True, "max_new_tokens": 10},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = response.get_data(as_text=True).strip().split("\n\n")
+        self.assertTrue(events[-1].startswith("event: result"))
+        result = json.loads(events[-1].split("data: ", 1)[1])
+        self.assertEqual(result["code"], 200)
+        self.assertIsInstance(result["generated_sequence"], list)
+
+    def test_summary_stream_jobs(self):
+        jobs = app.extensions["llm_jobs"]
+        data = {"text": "Streams run on the inference workers.", "stream": True}
+        submitted = jobs.snapshot()["jobs"]
+        response = self.app.post(ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json=data)
+        self.assertIn("event: result", response.get_data(as_text=True))
+        self.assertEqual(jobs.snapshot()["jobs"], submitted + 1)
+        with mock.patch.object(jobs, "max_per_client", 0):
+            response = self.app.post(ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json=data)
+        self.assertEqual(response.status_code, 429)
+
+        # cached summaries are streamed without generating
+        summary = self.app.post(ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json={**data, "stream": False})
+        response = self.app.post(ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json=data)
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        result = response.get_data(as_text=True).strip().split("\n\n")[-1].split("data: ", 1)[1]
+        self.assertEqual(
+            json.loads(result)["generated_sequence"], summary.json["generated_sequence"]
+        )
+
+    def test_summary_truncation_warning(self):
+        response = self.app.post(
+            ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json={"text": article * 50, "max_new_tokens": 5}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("truncation", response.json["tokenizer_warning"])
+
+    def test_qa_post(self):
+        response = self.app.post(
+            ENDPOINTS_CONFIG.QA_ENDPOINT, json={"question": "What is an ETF?", "context": article}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json["generated_sequence"], list)
+
+    def test_llm_metrics(self):
+        self.app.post(
+            ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json={"sql_table": table, "question": question}
+        )
+        response = self.app.get(ENDPOINTS_CONFIG.LLM_METRICS_ENDPOINT)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.json["sql"]["requests"], 1)
+        self.assertIn("avg_queue_wait_ms", response.json["summary"])
+
+    def test_sql_batch_post(self):
+        questions = ["How many departments are there?", question, "List the heads.", question]
+        response = self.app.post(
+            ENDPOINTS_CONFIG.TEX2SQL_BATCH_ENDPOINT,
+            json={"sql_table": table, "questions": questions, "max_new_tokens": 10},
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json["results"]
+        self.assertEqual(len(results), len(questions))
+        self.assertEqual(results[1], results[3])
+        # the batch filled the cache, the single request has to generate on its own
+        with mock.patch.object(app.extensions["llm_cache"], "get", return_value=None):
+            single = self.app.post(
+                ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT,
+                json={"sql_table": table, "question": questions[2], "max_new_tokens": 10},
+            )
+        self.assertEqual(single.headers["X-Cache"], "MISS")
+        self.assertEqual(results[2]["generated_sequence"], single.json["generated_sequence"])
+
+        items = [{"sql_table": table, "question": q} for q in questions[:2]]
+        response = self.app.post(
+            ENDPOINTS_CONFIG.TEX2SQL_BATCH_ENDPOINT, json={"items": items, "max_new_tokens": 10}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["results"], results[:2])
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+
+    def test_batch_post_errors(self):
+        for data in (
+            {"questions": [question]},
+            {"items": [{"sql_table": table}]},
+            {"sql_table": table, "questions": [question] * 65},
+        ):
+            response = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_BATCH_ENDPOINT, json=data)
+            self.assertEqual(response.status_code, 400)
+        response = self.app.post(ENDPOINTS_CONFIG.SUMMARY_BATCH_ENDPOINT, json={"texts": []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_summary_batch_post(self):
+        texts = [article, article * 3, "Flask is a web framework."]
+        response = self.app.post(
+            ENDPOINTS_CONFIG.SUMMARY_BATCH_ENDPOINT, json={"texts": texts, "max_new_tokens": 10}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json["results"]), 3)
+        with mock.patch.object(app.extensions["llm_cache"], "get", return_value=None):
+            single = self.app.post(
+                ENDPOINTS_CONFIG.SUMMARY_ENDPOINT, json={"text": texts[2], "max_new_tokens": 10}
+            )
+        self.assertEqual(single.headers["X-Cache"], "MISS")
+        self.assertEqual(
+            response.json["results"][2]["generated_sequence"], single.json["generated_sequence"]
+        )
+
+    def test_cpu_engine(self):
+        registry = AdapterRegistry([LLMType.SQL], cpu_task_types=[LLMType.SQL])
+        self.assertIsNone(registry.model)
+        self.assertEqual(registry.engines[LLMType.SQL], Engine.INT8)
+        model = registry.model_for(LLMType.SQL)
+        self.assertNotIsInstance(model, PeftModel)
+        self.assertTrue(
+            any(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in model.modules())
+        )
+
+        result = registry.get(LLMType.SQL).generate_response(
+            f"{table}\n{question}", GenerationConfig(max_new_tokens=5)
+        )
+        self.assertIsInstance(result["generated_sequence"], list)
+
+        model = load_merged_model(
+            registry.lora_configs[LLMType.SQL].base_model_name_or_path,
+            mapping[LLMType.SQL],
+            quantize=False,
+        )
+        # quantized in place, no second float32 copy
+        self.assertIs(quantize_int8(model), model)
+
+    def test_load_retry(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        adapter_path = mapping[LLMType.SQL]
+        # no adapter_config.json, like a download that timed out
+        mapping[LLMType.SQL] = directory.name
+        try:
+            registry = AdapterRegistry([LLMType.SQL], load=False)
+            with self.assertRaises(ValueError):
+                registry.load()
+        finally:
+            mapping[LLMType.SQL] = adapter_path
+        self.assertEqual(registry.states[LLMType.SQL], LoadState.FAILED)
+        registry.load()
+        self.assertTrue(registry.is_ready(LLMType.SQL))
+        self.assertNotIn(LLMType.SQL, registry.errors)
+
+        # requests to loading adapters do not wait for a running generation
+        with registry.activate(LLMType.SQL):
+            thread = threading.Thread(target=registry.load_in_background, daemon=True)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+    def test_prefixed_prompt_tokens(self):
+        registry = AdapterRegistry([LLMType.SQL])
+        llm = registry.get(LLMType.SQL)
+        questions = ["How many departments are there?", question, "List the heads."]
+        prompts = SQLController.create_prompts(table, questions)
+        self.assertEqual(prompts[1], SQLController.create_prompt(table, question))
+
+        prefixed = llm.process_input(prompts)
+        plain = llm.process_input([str(prompt) for prompt in prompts])
+        self.assertTrue(torch.equal(prefixed["input_ids"], plain["input_ids"]))
+        self.assertEqual(prefixed["length"], plain["length"])
+        self.assertEqual(registry.prefix_tokens.snapshot(), {"size": 1, "hits": 2, "misses": 1})
+
+        # schemas ending in punctuation or a newline, questions starting with a digit
+        prompts = [
+            PrefixedPrompt(prefix, suffix, separator)
+            for prefix in ("CREATE TABLE head (age INTEGER);", f"{table}\n", "head.")
+            for suffix in ("2019 revenue?", "5 oldest heads", "\nList the heads.")
+            for separator in ("\n", " ")
+        ]
+        prefixed = llm.process_input(prompts)
+        plain = llm.process_input([str(prompt) for prompt in prompts])
+        self.assertTrue(torch.equal(prefixed["input_ids"], plain["input_ids"]))
+
+    def test_merged_artifact(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, "merged_sql")
+        export(mapping[LLMType.SQL], output)
+        adapter_path = mapping[LLMType.SQL]
+        mapping[LLMType.SQL] = output
+        try:
+            registry = AdapterRegistry([LLMType.SQL])
+        finally:
+            mapping[LLMType.SQL] = adapter_path
+        self.assertEqual(registry.engines[LLMType.SQL], Engine.MERGED)
+        self.assertIsNone(registry.get(LLMType.SQL).lora_config)
+
+        reference = load_merged_model(
+            registry.artifacts[LLMType.SQL]["base_model_name_or_path"], adapter_path, False
+        )
+        input_ids = registry.tokenizer(table, return_tensors="pt").input_ids
+        with registry.activate(LLMType.SQL) as model:
+            generated = model.generate(input_ids=input_ids, max_new_tokens=5)
+        self.assertTrue(torch.equal(generated, reference.generate(input_ids, max_new_tokens=5)))
+
+    def test_model_path_prefers_merged(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        project_dir = directory.name
+        lora_path = os.path.join(project_dir, "flan_t5/models/lora_flan-t5-large_cnn_dailymail")
+        os.makedirs(lora_path)
+        self.assertEqual(get_model_path(LLMType.SUMMARY, project_dir), f"{lora_path}/")
+        merged_path = lora_path.replace("lora_", "merged_")
+        os.makedirs(merged_path)
+        # an interrupted export
+        self.assertEqual(get_model_path(LLMType.SUMMARY, project_dir), f"{lora_path}/")
+        open(os.path.join(merged_path, MERGED_CONFIG_NAME), "w").close()
+        self.assertEqual(get_model_path(LLMType.SUMMARY, project_dir), merged_path)
+
+
+class TestBatchScheduler(unittest.TestCase):
+    class EchoModel:
+        def generate_batch(self, texts, generation_config):
+            return [{"generated_sequence": [text]} for text in texts]
+
+    def test_worker_survives_errors(self):
+        scheduler = BatchScheduler(self.EchoModel(), max_wait_ms=1)
+        key = scheduler.config_key
+        scheduler.config_key = mock.Mock(side_effect=TypeError("not serializable"))
+        with self.assertRaises(TypeError):
+            scheduler.generate_response("broken", GenerationConfig(), timeout=5)
+        scheduler.config_key = key
+        result = scheduler.generate_response("text", GenerationConfig(), timeout=5)
+        self.assertEqual(result["generated_sequence"], ["text"])
+
+
+class TestGenerationJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+        wait_for_models(cls.app)
+
+    def test_priority_and_limits(self):
+        release, order = threading.Event(), []
+        queue = GenerationJobQueue(workers=1, max_size=2, max_per_client=2)
+        blocking = queue.submit(lambda: release.wait(5), "a")
+        # the worker is busy, the next jobs wait in the queue
+        time.sleep(0.05)
+        low = queue.submit(lambda: order.append("low"), "a", priority=9)
+        high = queue.submit(lambda: order.append("high"), "b", priority=1)
+        with self.assertRaises(QueueFull):
+            queue.submit(lambda: None, "c")
+        with self.assertRaises(ClientLimitExceeded):
+            queue.submit(lambda: None, "a")
+        release.set()
+        self.assertTrue(low.wait(5) and high.wait(5) and blocking.wait(5))
+        self.assertEqual(order, ["high", "low"])
+        self.assertEqual(queue.snapshot()["clients"], 0)
+
+        failed = queue.submit(lambda: 1 / 0, "a")
+        self.assertTrue(failed.wait(5))
+        self.assertEqual(failed.status, JobStatus.FAILED)
+        self.assertIn("division", failed.to_dict()["error"])
+        queue.close()
+
+    def test_llm_job(self):
+        response = self.app.post(
+            ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT,
+            json={"task": "sql", "sql_table": table, "question": question, "max_new_tokens": 5},
+        )
+        self.assertEqual(response.status_code, 202)
+        # an idle worker may pick the job up before the response is created
+        self.assertIn(
+            response.json["status"],
+            (JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.DONE),
+        )
+        response = self.app.get(f"{response.headers['Location']}?wait=10")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], JobStatus.DONE)
+        self.assertIsInstance(response.json["result"]["generated_sequence"], list)
+        job_result = response.json["result"]
+
+        # synchronous requests that take too long are answered with the job
+        data = {"sql_table": table, "question": "Which heads are older than 42?"}
+        with mock.patch.dict(app.config, {"LLM_SYNC_TIMEOUT": 0}):
+            response = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json=data)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json["task"], "sql")
+        response = self.app.get(f"{response.headers['Location']}?wait=10")
+        self.assertEqual(response.json["status"], JobStatus.DONE)
+        # results of both kinds of jobs have the shape of the generation
+        self.assertEqual(response.json["result"].keys(), job_result.keys())
+        self.assertNotIn("code", job_result)
+        # and cached by the job
+        response = self.app.post(ENDPOINTS_CONFIG.TEX2SQL_ENDPOINT, json=data)
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        self.assertEqual(response.json["code"], 200)
+
+        response = self.app.post(ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT, json={"task": "poem"})
+        self.assertEqual(response.status_code, 400)
+        response = self.app.post(
+            ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT, json={"task": "summary", "priority": 0}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.app.get(f"{ENDPOINTS_CONFIG.LLM_JOBS_ENDPOINT}/missing")
+        self.assertEqual(response.status_code, 404)
+
 
 class TestUserController(unittest.TestCase):
     @classmethod
@@ -94,6 +529,38 @@ class TestUserController(unittest.TestCase):
         self.assertIsInstance(response.json, list)
         self.assertEqual(len(response.json), 8)
 
+    def test_get_users_paginated(self):
+        response = self.app.get(ENDPOINTS_CONFIG.USERS_ENDPOINT, query_string={"limit": 5})
+        self.assertEqual(len(response.json), 5)
+        self.assertIn("X-Next-Cursor", response.headers)
+
+        next_page = self.app.get(
+            ENDPOINTS_CONFIG.USERS_ENDPOINT,
+            query_string={"limit": 5, "cursor": response.headers["X-Next-Cursor"]},
+        )
+        self.assertEqual(len(next_page.json), 3)
+        self.assertNotIn("X-Next-Cursor", next_page.headers)
+        usernames = [user["username"] for user in response.json + next_page.json]
+        self.assertEqual(len(set(usernames)), 8)
+
+        for value in ("abc", {"user_id": 5}, [5, 6], True):
+            response = self.app.get(
+                ENDPOINTS_CONFIG.USERS_ENDPOINT, query_string={"cursor": encode_cursor(value)}
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_get_users_fields(self):
+        response = self.app.get(
+            ENDPOINTS_CONFIG.USERS_ENDPOINT, query_string={"fields": "username,email"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json[0]), {"username", "email"})
+
+        response = self.app.get(
+            ENDPOINTS_CONFIG.USERS_ENDPOINT, query_string={"fields": "password_hash"}
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_get_user1(self):
         response = self.app.get(f"{ENDPOINTS_CONFIG.USER_ENDPOINT}/{self.user1['username']}")
         self.assertEqual(response.status_code, 200)
@@ -142,6 +609,748 @@ class TestUserController(unittest.TestCase):
         self.assertEqual(response.json["username"], "test4")
 
 
+class TestAssetsController(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+
+    def test_get_etfs(self):
+        response = self.app.get(f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json), 3)
+
+    def test_get_etfs_paginated(self):
+        response = self.app.get(
+            f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf",
+            query_string={"limit": 2, "fields": "etf_ticker,ter"},
+        )
+        self.assertEqual([etf["etf_ticker"] for etf in response.json], ["IWDA", "VTI"])
+        self.assertEqual(set(response.json[0]), {"etf_ticker", "ter"})
+
+        response = self.app.get(
+            f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf",
+            query_string={"limit": 2, "cursor": response.headers["X-Next-Cursor"]},
+        )
+        self.assertEqual([etf["etf_ticker"] for etf in response.json], ["VUKE"])
+
+    def test_filter_etfs(self):
+        response = self.app.get(
+            f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf", query_string={"ter__lt": 0.1}
+        )
+        self.assertEqual([etf["etf_ticker"] for etf in response.json], ["VTI", "VUKE"])
+
+        response = self.app.get(
+            f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf",
+            query_string={"fund_size__gt": "1e9", "ter__le": 0.2, "fields": "etf_ticker"},
+        )
+        self.assertEqual(response.json, [{"etf_ticker": "IWDA"}, {"etf_ticker": "VTI"}])
+
+    def test_filter_stocks(self):
+        response = self.app.get(
+            f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/stock", query_string={"dividend_yield__gt": 0.5}
+        )
+        self.assertEqual([stock["stock_ticker"] for stock in response.json], ["AAPL"])
+
+    def test_filter_invalid(self):
+        url = f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/etf"
+        self.assertEqual(self.app.get(url, query_string={"tir__lt": 1}).status_code, 400)
+        self.assertEqual(self.app.get(url, query_string={"ter__lz": 1}).status_code, 400)
+        self.assertEqual(self.app.get(url, query_string={"ter__lt": "low"}).status_code, 400)
+
+    def test_get_unsupported_type(self):
+        response = self.app.get(f"{ENDPOINTS_CONFIG.ASSETS_ENDPOINT}/bond")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestInvestmentsController(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+        cls.url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/bobsmith"
+
+    def tearDown(self):
+        with app.app_context():
+            user_id = db.session.scalar(db.select(Users.user_id).filter_by(username="bobsmith"))
+            apply_lots(lots.user_id == user_id, sign=-1)
+            for lot in db.session.scalars(db.select(Investments).filter_by(user_id=user_id)):
+                db.session.delete(lot)
+            db.session.commit()
+            self.assertEqual(check_positions(), [])
+
+    def add_lots(self, count: int):
+        with app.app_context():
+            user_id = db.session.scalar(db.select(Users.user_id).filter_by(username="bobsmith"))
+            added = [
+                InvestedStocks(user_id=user_id, stock_ticker="AAPL", volume=1, open_price=100.0)
+                for _ in range(count)
+            ]
+            db.session.add_all(added)
+            db.session.flush()
+            apply_lots(lots.investment_id.in_([lot.investment_id for lot in added]))
+            db.session.commit()
+
+    def test_get_investments(self):
+        url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/johndoe"
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json), 3)
+        self.assertNotIn("asset", response.json[0])
+
+        response = self.app.get(url, query_string={"type": "etfs", "include": "asset"})
+        self.assertEqual({lot["etf_ticker"] for lot in response.json}, {"VTI", "IWDA"})
+        self.assertEqual({lot["asset"]["etf_ticker"] for lot in response.json}, {"VTI", "IWDA"})
+
+    def test_get_investments_query_count(self):
+        for count in (1, 20):
+            self.add_lots(count)
+            with count_queries() as statements:
+                response = self.app.get(self.url, query_string={"include": "asset"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json[-1]["asset"]["stock_ticker"], "AAPL")
+            self.assertEqual(len(statements), 1)
+
+    def test_profit_of_zero_prices(self):
+        lot = Investments(volume=2, open_price=10, close_price=0, last_known_price=5)
+        self.assertEqual(lot.profit, -20)
+        lot = Investments(volume=2, open_price=10, last_known_price=0)
+        self.assertEqual(lot.profit, -20)
+
+    def test_get_portfolio_summary(self):
+        url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/mikebrown/summary"
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["lots"], 2)
+        self.assertEqual(response.json["open_lots"], 1)
+        self.assertAlmostEqual(response.json["market_value"], 270.0)
+        self.assertAlmostEqual(response.json["unrealized_profit"], 3 * (90.0 - 85.34))
+        self.assertAlmostEqual(response.json["realized_profit"], 100 * (90.23 - 50.0))
+        self.assertEqual([row["type"] for row in response.json["by_type"]], ["etfs", "stocks"])
+
+        self.add_lots(3)
+        with count_queries() as statements:
+            response = self.app.get(f"{self.url}/summary")
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(response.json["open_lots"], 3)
+        self.assertAlmostEqual(response.json["cost_basis"], 300.0)
+        self.assertEqual(response.json["market_value"], 0.0)
+
+    def test_get_positions(self):
+        self.add_lots(2)
+        self.app.post(
+            f"{ENDPOINTS_CONFIG.INVEST_ENDPOINT}/bobsmith/stocks",
+            json={"username": "bobsmith", "stock_ticker": "AAPL", "volume": 2, "open_price": 130},
+        )
+        self.app.post(
+            f"{ENDPOINTS_CONFIG.IMPORT_ENDPOINT}/bobsmith",
+            data="type,ticker,volume,open_price,close_price\netf,VTI,4,50,60\n",
+            content_type="text/csv",
+        )
+        response = self.app.get(f"{self.url}/positions")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["ticker"] for p in response.json], ["VTI", "AAPL"])
+        vti, aapl = response.json
+        self.assertEqual((aapl["lots"], aapl["volume"], aapl["cost_basis"]), (3, 4.0, 460.0))
+        self.assertAlmostEqual(aapl["average_open_price"], 115.0)
+        self.assertEqual((vti["open_lots"], vti["realized_profit"]), (0, 40.0))
+        self.assertIsNone(vti["average_open_price"])
+        with app.app_context():
+            self.assertEqual(check_positions(), [])
+
+    def test_check_positions(self):
+        self.add_lots(1)
+        with app.app_context():
+            db.session.execute(
+                db.update(Investments)
+                .where(Investments.user_id == Users.user_id, Users.username == "bobsmith")
+                .values(volume=5)
+            )
+            mismatches = check_positions()
+            self.assertEqual(len(mismatches), 1)
+            self.assertEqual(mismatches[0]["ticker"], "AAPL")
+            self.assertEqual(
+                (mismatches[0]["stored_volume"], mismatches[0]["expected_volume"]), (1, 5)
+            )
+            db.session.rollback()
+
+    def test_invest(self):
+        response = self.app.post(
+            f"{ENDPOINTS_CONFIG.INVEST_ENDPOINT}/bobsmith/stocks",
+            json={"username": "bobsmith", "stock_ticker": "AAPL", "volume": 2, "open_price": 150},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["stock_ticker"], "AAPL")
+        self.assertIsNotNone(response.json["open_datetime"])
+        self.assertEqual(len(self.app.get(self.url).json), 1)
+
+        response = self.app.post(
+            f"{ENDPOINTS_CONFIG.INVEST_ENDPOINT}/bobsmith/stocks",
+            json={"username": "bobsmith", "stock_ticker": "NOPE", "volume": 2, "open_price": 1},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_import_csv(self):
+        data = (
+            "type,ticker,volume,open_price,open_datetime,close_price\n"
+            "etf,VTI,10,200.5,2023-01-02T10:00:00,\n"
+            "stock,AAPL,1.5,150,,160\n"
+            "stock,NOPE,1,1,,\n"
+            "bond,VTI,1,1,,\n"
+            "etf,VTI,-1,1,,\n"
+            "etf,VTI,1,1,yesterday,\n"
+        )
+        response = self.app.post(
+            f"{ENDPOINTS_CONFIG.IMPORT_ENDPOINT}/bobsmith", data=data, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["imported"], 2)
+        self.assertEqual([error["line"] for error in response.json["errors"]], [4, 5, 6, 7])
+
+        investments = self.app.get(self.url).json
+        self.assertEqual([lot["volume"] for lot in investments], [10.0, 1.5])
+        self.assertEqual(investments[0]["open_datetime"], "2023-01-02T10:00:00")
+        self.assertEqual(investments[1]["close_price"], 160.0)
+
+    def test_import_jsonl(self):
+        lines = [
+            json.dumps({"type": "stocks", "ticker": "AAPL", "volume": 1, "open_price": 100})
+            for _ in range(25)
+        ]
+        lines.insert(3, "{not json")
+        url = f"{ENDPOINTS_CONFIG.IMPORT_ENDPOINT}/bobsmith"
+        with count_queries() as statements:
+            response = self.app.post(
+                url, data="\n".join(lines), content_type="application/x-ndjson"
+            )
+        self.assertEqual(response.json["imported"], 25)
+        self.assertEqual(response.json["errors"][0]["line"], 4)
+        self.assertLess(len(statements), 10)
+        self.assertEqual(len(self.app.get(self.url).json), 25)
+
+        self.assertEqual(self.app.post(url, data="{}", content_type="text/plain").status_code, 415)
+        response = self.app.post(f"{url}?format=jsonl", data="{}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_investments_errors(self):
+        self.assertEqual(self.app.get(self.url).status_code, 404)
+        self.assertEqual(self.app.get(self.url, query_string={"type": "bonds"}).status_code, 400)
+        url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/nobody"
+        self.assertEqual(self.app.get(url).status_code, 400)
+        self.assertEqual(self.app.get(f"{url}/summary").status_code, 400)
+
+
+class TestPriceRefresh(unittest.TestCase):
+    def tearDown(self):
+        with app.app_context():
+            db.session.rollback()
+
+    def test_refresh_prices(self):
+        source = FilePriceSource(os.path.join(FIXTURES, "prices.csv"))
+        with app.app_context():
+            with count_queries() as statements:
+                report = refresh_prices(source)
+            # one query per asset type to collect the securities and one update per table
+            self.assertEqual(len(statements), 4)
+            self.assertEqual(len(source.requests), 1)
+            self.assertEqual((report["securities"], report["quoted"]), (6, 3))
+            self.assertEqual(report["missing"], ["VUKE", "GOOGL", "TSLA"])
+            self.assertEqual(report["updated_lots"], 4)
+
+            prices = dict(
+                db.session.execute(
+                    db.select(Users.username, Investments.last_known_price)
+                    .join(Users, Users.user_id == Investments.user_id)
+                    .where(Investments.type == "etfs", Investments.volume == 3)
+                ).all()
+            )
+            self.assertEqual(float(prices["johndoe"]), 88.12)
+            self.assertEqual(check_positions(), [])
+
+    def test_refresh_prices_per_type(self):
+        etfs, stocks = StaticPriceSource({"VTI": 1}), StaticPriceSource({"NASDAQ:TSLA": 2})
+        with app.app_context():
+            report = refresh_prices({AssetTypes.ETF: etfs, AssetTypes.STOCK: stocks})
+            self.assertEqual([len(etfs.requests[0]), len(stocks.requests[0])], [3, 3])
+            self.assertEqual(report["updated_lots"], 2)
+            self.assertEqual(check_positions(), [])
+
+
+class TestPriceHistory(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.store = PriceHistoryStore(PriceCache(cls.cache_dir.name))
+        with app.app_context():
+            cls.store.load(
+                [
+                    ("HIST1", "2023-12-29", 10.0),
+                    ("HIST1", "2024-01-03", 11.0),
+                    ("HIST1", "2024-01-02", 12.0),
+                    ("HIST1", "2024-01-02", 10.5),
+                    ("HIST2", "2024-01-03", 20.0),
+                ]
+            )
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cache_dir.cleanup()
+
+    def test_get_series(self):
+        with app.app_context():
+            for _ in range(2):
+                days, closes = self.store.get_series("HIST1")
+                self.assertEqual(days.dtype, np.dtype("datetime64[D]"))
+                self.assertEqual(
+                    days.astype(str).tolist(), ["2023-12-29", "2024-01-02", "2024-01-03"]
+                )
+                self.assertEqual(closes.tolist(), [10.0, 10.5, 11.0])
+
+            days, closes = self.store.get_series("HIST1", "2024-01-01", "2024-01-02")
+            self.assertEqual((days.astype(str).tolist(), closes.tolist()), (["2024-01-02"], [10.5]))
+            self.assertEqual(len(self.store.get_series("NOPE")[0]), 0)
+
+    def test_get_matrix(self):
+        with app.app_context():
+            matrix = self.store.get_matrix(["HIST2", "HIST1", "NOPE"], start="2024-01-01")
+            self.assertEqual(matrix.tickers, ["HIST2", "HIST1", "NOPE"])
+            self.assertEqual(matrix.dates.astype(str).tolist(), ["2024-01-02", "2024-01-03"])
+            np.testing.assert_array_equal(
+                matrix.closes, [[np.nan, 10.5, np.nan], [20.0, 11.0, np.nan]]
+            )
+
+    def test_load_invalidates_cache(self):
+        with app.app_context():
+            self.store.load([("HIST3", "2024-01-03", 30.0)])
+            db.session.commit()
+            self.assertEqual(self.store.get_series("HIST3")[1].tolist(), [30.0])
+            self.store.load([("HIST3", "2024-01-03", 31.0)])
+            db.session.commit()
+            self.assertEqual(self.store.get_series("HIST3")[1].tolist(), [31.0])
+            self.assertEqual(PriceHistoryStore().get_series("HIST3")[1].tolist(), [31.0])
+
+
+class TestPortfolioAnalytics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+        cls.url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/analyst/analytics"
+        with app.app_context():
+            user = Users(username="analyst", email="analyst@example.com", password="analyst")
+            db.session.add(user)
+            db.session.commit()
+            cls.user_id = user.user_id
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.delete(db.session.get(Users, cls.user_id))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            for lot in db.session.scalars(db.select(Investments).filter_by(user_id=self.user_id)):
+                db.session.delete(lot)
+            db.session.execute(db.delete(PriceHistory).where(PriceHistory.ticker == "AAPL"))
+            db.session.commit()
+
+    def test_analyze(self):
+        dates = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-05"))
+        closes = np.array([[10.0, 20.0], [11.0, np.nan], [12.1, 22.0], [11.0, 22.0]])
+        lots = Lots(
+            tickers=["A", "B"],
+            asset=np.array([0, 0, 1]),
+            volume=np.array([1.0, 1.0, 1.0]),
+            opened=dates[[0, 1, 2]],
+            closed=np.array(["NaT", "2024-01-03", "NaT"], dtype="datetime64[D]"),
+        )
+        result = analyze(lots, dates, closes)
+        np.testing.assert_allclose(result["values"], [10.0, 22.0, 34.1, 33.0])
+        # buying on the second and third day is not a gain
+        np.testing.assert_allclose(result["returns"], [0.1, 0.1, 33.0 / 34.1 - 1])
+        self.assertAlmostEqual(result["total_return"], 1.21 * 33.0 / 34.1 - 1)
+        self.assertAlmostEqual(result["max_drawdown"], 33.0 / 34.1 - 1)
+        returns = np.array([0.1, 0.1, 33.0 / 34.1 - 1])
+        self.assertAlmostEqual(
+            result["annualized_volatility"], np.std(returns, ddof=1) * np.sqrt(252)
+        )
+        self.assertAlmostEqual(
+            result["sharpe_ratio"], returns.mean() / np.std(returns, ddof=1) * np.sqrt(252)
+        )
+        self.assertEqual(result["correlation"].shape, (2, 2))
+        self.assertAlmostEqual(result["correlation"][0, 0], 1.0)
+
+    def test_get_analytics(self):
+        with app.app_context():
+            db.session.add(
+                InvestedStocks(
+                    user_id=self.user_id,
+                    stock_ticker="AAPL",
+                    volume=2,
+                    open_price=100.0,
+                    open_datetime="2024-01-02",
+                )
+            )
+            PriceHistoryStore().load(
+                [
+                    ("AAPL", "2024-01-02", 100.0),
+                    ("AAPL", "2024-01-03", 110.0),
+                    ("AAPL", "2024-01-04", 99.0),
+                ]
+            )
+            db.session.commit()
+
+        response = self.app.get(f"{self.url}?series=true&risk_free=0.03")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.json["start"], response.json["end"]), ("2024-01-02", "2024-01-04")
+        )
+        self.assertAlmostEqual(response.json["total_return"], -0.01)
+        self.assertAlmostEqual(response.json["max_drawdown"], -0.1)
+        self.assertEqual(response.json["correlation"], {"tickers": ["AAPL"], "matrix": [[1.0]]})
+        self.assertEqual(response.json["series"]["values"], [200.0, 220.0, 198.0])
+        self.assertIsNone(response.json["series"]["returns"][0])
+
+        response = self.app.get(f"{self.url}?start=2024-01-04")
+        self.assertEqual(response.json["days"], 1)
+        self.assertIsNone(response.json["annualized_volatility"])
+        self.assertNotIn("series", response.json)
+        self.assertEqual(self.app.get(f"{self.url}?start=2025-01-01").status_code, 404)
+        self.assertEqual(self.app.get(f"{self.url}?start=yesterday").status_code, 400)
+        url = f"{ENDPOINTS_CONFIG.INVESTMENTS_ENDPOINT}/nobody/analytics"
+        self.assertEqual(self.app.get(url).status_code, 400)
+
+
+class TestBrowserPool(unittest.TestCase):
+    def setUp(self):
+        self.drivers = []
+
+    def factory(self):
+        self.drivers.append(FakeDriver({}))
+        return self.drivers[-1]
+
+    def test_reuse(self):
+        pool = BrowserPool(size=2, factory=self.factory)
+        for _ in range(3):
+            with pool.browser() as driver:
+                driver.get("about:blank")
+        self.assertEqual(len(self.drivers), 1)
+        self.assertEqual(len(self.drivers[0].loads), 3)
+        self.assertEqual(pool.snapshot()["idle"], 1)
+        pool.close()
+        self.assertTrue(self.drivers[0].closed)
+
+    def test_size(self):
+        pool = BrowserPool(size=1, factory=self.factory, acquire_timeout=0.05)
+        with pool.browser():
+            with self.assertRaises(TimeoutError):
+                with pool.browser():
+                    pass
+
+        pool = BrowserPool(size=2, factory=self.factory, acquire_timeout=5)
+        started = threading.Barrier(3)
+
+        def scrape():
+            with pool.browser():
+                started.wait()
+
+        threads = [threading.Thread(target=scrape) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        self.assertEqual(pool.snapshot()["running"], 2)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.drivers), 3)
+
+    def test_health_check(self):
+        pool = BrowserPool(size=1, factory=self.factory)
+        with pool.browser() as driver:
+            driver.broken = True
+        with pool.browser() as driver:
+            self.assertIs(driver, self.drivers[1])
+        self.assertTrue(self.drivers[0].closed)
+        self.assertEqual(pool.snapshot()["unhealthy"], 1)
+
+    def test_recycling(self):
+        pool = BrowserPool(size=1, factory=self.factory, idle_timeout=0.01, max_pages=2)
+        with pool.browser():
+            pass
+        # quit by the reaper thread or by the explicit call
+        time.sleep(0.05)
+        pool.recycle_idle()
+        self.assertTrue(self.drivers[0].closed)
+        for _ in range(2):
+            with pool.browser():
+                pass
+        self.assertTrue(self.drivers[1].closed)
+        self.assertEqual(pool.snapshot(), {**pool.stats, "running": 0, "idle": 0})
+        self.assertEqual(pool.stats["recycled"], 2)
+
+
+class TestETFScraper(unittest.TestCase):
+    url = "https://www.justetf.com/en/etf-profile.html?query=vwce&isin=IE00BK5BQT80"
+
+    def setUp(self):
+        self.driver = FakeDriver({self.url: "etf_profile.html"})
+        with app.app_context():
+            self.config = ScraperConfig(
+                AssetTypes.ETF, POOL=BrowserPool(size=1, factory=lambda: self.driver)
+            )
+
+    def test_scrape(self):
+        scraper = ETFScraper.check_if_exists(self.config, isin="IE00BK5BQT80", query="vwce")
+        # the existence check and the scrape share one page load
+        self.assertEqual(self.driver.loads, [self.url])
+        self.assertEqual(
+            scraper.scrape(),
+            {
+                "fund_size": int(12.842 * 1e9),
+                "fund_currency": "USD",
+                "fund_provider": "Vanguard",
+                "distribution_policy": "Accumulating",
+                "distribution_frequency": None,
+                "ter": 0.22 * 1e-2,
+                "volatility_1yr": 11.87,
+                "etf_ticker": "VWCE",
+                "isin": "IE00BK5BQT80",
+                "name": "Vanguard FTSE All-World UCITS ETF (USD) Accumulating",
+                "holdings": 3714,
+                "replication": "Sampling",
+                "top_holdings": {
+                    "Apple": "4.10%",
+                    "Microsoft": "3.72%",
+                    "Amazon.com": "1.92%",
+                    "NVIDIA Corp.": "1.76%",
+                    "Alphabet, Inc. A": "1.12%",
+                    "Meta Platforms": "1.01%",
+                    "Alphabet, Inc. C": "0.99%",
+                    "Tesla": "0.84%",
+                    "Berkshire Hathaway, Inc.": "0.71%",
+                    "JPMorgan Chase & Co.": "0.63%",
+                },
+            },
+        )
+
+    def test_pruned_parsing(self):
+        with open(os.path.join(FIXTURES, "etf_profile.html")) as file:
+            html = file.read()
+        scrapers = [
+            ETFScraper("IE00BK5BQT80", "VWCE", self.config, {}, soup=soup)
+            for soup in (BeautifulSoup(html, "html.parser"), parse_details_page(html))
+        ]
+        self.assertEqual(scrapers[1].scrape(), scrapers[0].scrape())
+        self.assertIsNone(scrapers[1].soup.find("script"))
+
+    def test_not_found(self):
+        with self.assertRaises(ValueError):
+            ETFScraper.check_if_exists(self.config, isin="IE0000000000", query="nope")
+        self.assertEqual(len(self.driver.loads), 1)
+
+    def test_slow_page(self):
+        # the page neither shows the details nor redirects to the search
+        self.driver.pages[self.url] = "find_etf.html"
+        with mock.patch("api.main.asset_scraper.scrapers.DETAILS_TIMEOUT", 0.1):
+            with self.assertRaises(TimeoutException):
+                ETFScraper.check_if_exists(self.config, isin="IE00BK5BQT80", query="vwce")
+
+
+class TestScrapeJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app.test_client()
+
+    def wait(self, job, timeout: float = 5):
+        deadline = time.monotonic() + timeout
+        while job.status not in (JobStatus.DONE, JobStatus.FAILED):
+            self.assertLess(time.monotonic(), deadline, job.to_dict())
+            time.sleep(0.01)
+        return job
+
+    def test_deduplication(self):
+        release = threading.Event()
+        queue = JobQueue(app, workers=2, handler=lambda job: release.wait(5))
+        first = queue.submit(AssetTypes.ETF, "ie00bk5bqt80", "vwce")
+        self.assertIs(queue.submit(AssetTypes.ETF, "IE00BK5BQT80", "VWCE"), first)
+        other = queue.submit(AssetTypes.ETF, "IE00B4L5Y983", "IWDA")
+        self.assertIsNot(other, first)
+        release.set()
+        self.assertEqual(self.wait(first).status, JobStatus.DONE)
+        self.assertEqual(self.wait(other).status, JobStatus.DONE)
+        # a finished job does not block a new scrape of the asset
+        self.assertIsNot(queue.submit(AssetTypes.ETF, "IE00BK5BQT80", "VWCE"), first)
+        queue.close()
+
+    def test_retry(self):
+        attempts = []
+
+        def flaky(job):
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise RuntimeError("connection reset")
+
+        queue = JobQueue(app, workers=1, max_attempts=3, backoff=0.05, handler=flaky)
+        job = self.wait(queue.submit(AssetTypes.ETF, "IE00BK5BQT80", "VWCE"))
+        self.assertEqual((job.status, job.attempts, job.error), (JobStatus.DONE, 3, None))
+        # the second retry waits twice as long as the first one
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.05)
+        self.assertGreaterEqual(attempts[2] - attempts[1], 0.1)
+
+        def missing(job):
+            raise PermanentError("not found")
+
+        queue.handler = missing
+        job = self.wait(queue.submit(AssetTypes.ETF, "IE00BK5BQT80", "VWCE"))
+        self.assertEqual((job.status, job.attempts, job.error), (JobStatus.FAILED, 1, "not found"))
+        queue.close()
+
+    def test_ticker_conflict(self):
+        url = "https://www.justetf.com/en/etf-profile.html?query=VWCE&isin=IE00BK5BQT80"
+        browser_pool = app.extensions["browser_pool"]
+        app.extensions["browser_pool"] = BrowserPool(
+            size=1, factory=lambda: FakeDriver({url: "etf_profile.html"})
+        )
+        with app.app_context():
+            # the ticker is taken by an ETF with another ISIN
+            db.session.add(
+                ETF(
+                    etf_ticker="VWCE",
+                    fund_currency="USD",
+                    name="Other",
+                    isin="IE0000000000",
+                    ter=0.1,
+                    distribution_policy="Accumulating",
+                )
+            )
+            db.session.commit()
+        queue = JobQueue(app, workers=1, backoff=0.01)
+        try:
+            job = self.wait(queue.submit(AssetTypes.ETF, "IE00BK5BQT80", "VWCE"))
+        finally:
+            queue.close()
+            app.extensions["browser_pool"] = browser_pool
+            with app.app_context():
+                db.session.delete(db.session.get(ETF, "VWCE"))
+                db.session.commit()
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 1))
+        self.assertIn("cannot be stored", job.error)
+
+    def test_scrape_job_endpoint(self):
+        url = "https://www.justetf.com/en/etf-profile.html?query=VWCE&isin=IE00BK5BQT80"
+        driver = FakeDriver({url: "etf_profile.html"})
+        browser_pool = app.extensions["browser_pool"]
+        app.extensions["browser_pool"] = BrowserPool(size=1, factory=lambda: driver)
+        try:
+            response = self.app.post(
+                ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT,
+                json={"asset_type": "etf", "isin": "IE00BK5BQT80", "ticker": "VWCE"},
+            )
+            self.assertEqual(response.status_code, 202)
+            status_url = response.headers["Location"]
+            job = app.extensions["scrape_jobs"].get(response.json["job_id"])
+            self.wait(job)
+            response = self.app.get(status_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json["status"], JobStatus.DONE, response.json)
+            with app.app_context():
+                etf = db.session.get(ETF, "VWCE")
+                self.assertEqual((etf.isin, etf.holdings), ("IE00BK5BQT80", 3714))
+                db.session.delete(etf)
+                db.session.commit()
+        finally:
+            app.extensions["browser_pool"] = browser_pool
+        self.assertEqual(
+            self.app.get(f"{ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT}/x").status_code, 404
+        )
+        response = self.app.post(
+            ENDPOINTS_CONFIG.SCRAPE_JOBS_ENDPOINT,
+            json={"asset_type": "bonds", "isin": "X", "ticker": "X"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCatalogIngestion(unittest.TestCase):
+    profile_url = "https://www.justetf.com/en/etf-profile.html?query={}&isin={}"
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.execute(db.delete(ETF).where(ETF.etf_ticker.in_(["VWCE", "VWRA"])))
+            db.session.commit()
+
+    def test_ingest(self):
+        pages = {
+            self.profile_url.format("VWCE", "IE00BK5BQT80"): "etf_profile.html",
+            self.profile_url.format("VWRA", "IE00B3RBWM25"): "etf_profile.html",
+        }
+        reports = []
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write(
+                "isin,ticker\n"
+                "IE00BK5BQT80,vwce\n"
+                "IE00B3RBWM25,VWRA\n"
+                "IE00B4L5Y983,IWDA\n"
+                "IE0000000000,NOPE\n"
+                "IE0000000001,VWRA\n"
+                "ie00bk5bqt80,VWCE\n"
+            )
+        try:
+            pairs = read_pairs(file.name)
+        finally:
+            os.remove(file.name)
+        self.assertEqual(len(pairs), 5)
+
+        with app.app_context():
+            pool = BrowserPool(size=2, factory=lambda: FakeDriver(pages))
+            config = ScraperConfig(AssetTypes.ETF, POOL=pool)
+            report = CatalogIngester(config, concurrency=2, batch_size=1, progress=reports.append)
+            report = report.run(pairs)
+            pool.close()
+            self.assertEqual(
+                (report.total, report.skipped, report.scraped, report.stored), (5, 1, 1, 1)
+            )
+            self.assertEqual(
+                sorted(failure["ticker"] for failure in report.failed), ["NOPE", "VWRA", "VWRA"]
+            )
+            # the VWRA query was answered with the VWCE page
+            self.assertIn(
+                "IE00BK5BQT80",
+                [f["error"] for f in report.failed if f["isin"] == "IE00B3RBWM25"][0],
+            )
+            # one progress report per stored batch and one for the rest
+            self.assertEqual(len(reports), 2)
+            etfs = db.session.scalars(
+                db.select(ETF).where(ETF.etf_ticker.in_(["VWCE", "VWRA"])).order_by(ETF.isin)
+            ).all()
+            self.assertEqual([etf.isin for etf in etfs], ["IE00BK5BQT80"])
+            self.assertEqual(etfs[0].replication_method_fk.replication_method, "Sampling")
+
+            # the ticker belongs to another ETF now, nothing is loaded
+            driver = FakeDriver(pages)
+            pool = BrowserPool(size=1, factory=lambda: driver)
+            config = ScraperConfig(AssetTypes.ETF, POOL=pool)
+            report = CatalogIngester(config).run([("IE00B3RBWM25", "VWCE")])
+            pool.close()
+            self.assertEqual(report.failed[0]["error"], "Duplicated ticker VWCE!")
+            self.assertEqual(driver.loads, [])
+
+    def test_upsert(self):
+        with app.app_context():
+            pages = {self.profile_url.format("VWCE", "IE00BK5BQT80"): "etf_profile.html"}
+            pool = BrowserPool(size=1, factory=lambda: FakeDriver(pages))
+            ingester = CatalogIngester(ScraperConfig(AssetTypes.ETF, POOL=pool))
+            row = ingester.scrape("IE00BK5BQT80", "VWCE")
+            pool.close()
+            self.assertEqual(upsert_etfs([row]), 1)
+            row = {**row, "name": "Renamed", "fund_provider": "New Provider", "replication": "New"}
+            self.assertEqual(upsert_etfs([row]), 1)
+            etf = db.session.get(ETF, "VWCE")
+            self.assertEqual((etf.name, etf.fund_provider), ("Renamed", "New Provider"))
+            self.assertEqual(etf.replication_method_fk.replication_method, "New")
+            # a new ISIN does not take over the ticker of another ETF
+            with self.assertRaises(IntegrityError):
+                upsert_etfs([{**row, "isin": "IE00B3RBWM25"}])
+            db.session.rollback()
+
+
 class TestPasswordHashing(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,100 @@
+"""
+Accuracy versus latency of the CPU inference engines of a LoRA model on a small local
+fixture set: the adapter on a bfloat16 base model, merged into a float32 model and merged
+with int8 dynamic quantization of the linear layers.
+
+Usage (from the flan_t5 directory):
+    python evaluate_cpu.py --lora ./models/lora_flan-t5-large_Llama-2-SQL-Dataset \
+        --fixture fixtures/text2sql_eval.jsonl
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+import torch
+from datasets import Dataset, load_dataset
+from evaluate import load
+from evaluate_model import evaluate_test
+from export_model import merge_lora
+from peft import PeftConfig, PeftModel
+from train_flan_t5 import HEADS, generate_prompt
+from transformers import AutoTokenizer, GenerationConfig, T5ForConditionalGeneration
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.main.model.llm import quantize_int8
+
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+
+def prepare_fixture(path: str, tokenizer: AutoTokenizer) -> Dataset:
+    """
+    Tokenize `context`, `question` and `answer` records the way `prepare_text2sql_dataset`
+    does, with a fixed prompt head so every engine sees the same prompts.
+    """
+    prompt = "{}\n{}\nGenerate SQL query to answer the folowing question.\n{}\nAnswer: "
+    dataset = load_dataset("json", data_files=path)["train"]
+    dataset = dataset.map(
+        lambda x: {"prompt": prompt.format(HEADS[0], x["context"], x["question"])}
+    )
+    dataset = dataset.map(
+        generate_prompt,
+        fn_kwargs={
+            "tokenizer": tokenizer,
+            "max_prompt_len": max(len(tokenizer(p).input_ids) for p in dataset["prompt"]),
+            "max_ans_len": max(len(tokenizer(a).input_ids) for a in dataset["answer"]),
+            "ans_column": "answer",
+        },
+    )
+    dataset.set_format(type="torch", columns=["input_ids", "labels"])
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lora", required=True, help="Path of the LoRA adapter")
+    parser.add_argument("--fixture", default="fixtures/text2sql_eval.jsonl")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    base_model_name = PeftConfig.from_pretrained(args.lora).base_model_name_or_path
+    tokenizer = AutoTokenizer.from_pretrained(base_model_name)
+    dataset = prepare_fixture(args.fixture, tokenizer)
+    config = GenerationConfig(max_new_tokens=args.max_new_tokens, do_sample=False)
+    rouge = load("rouge")
+
+    engines: Dict[str, Callable[[], torch.nn.Module]] = {
+        "lora-bf16": lambda: PeftModel.from_pretrained(
+            T5ForConditionalGeneration.from_pretrained(base_model_name, torch_dtype=torch.bfloat16),
+            args.lora,
+        ),
+        "merged-fp32": lambda: merge_lora(base_model_name, args.lora),
+        "merged-int8": lambda: quantize_int8(merge_lora(base_model_name, args.lora)),
+    }
+    # only full batches are evaluated by evaluate_test
+    examples = len(dataset) // args.batch_size * args.batch_size
+    print(f"{examples} examples of {args.fixture}, {args.threads} threads")
+    print("| Engine | Size [MB] | Rouge-1 | Rouge-2 | Rouge-L | s/example |")
+    print("|---|---|---|---|---|---|")
+    for name, load_model in engines.items():
+        model = load_model()
+        start = time.perf_counter()
+        generated, human = evaluate_test(
+            model, tokenizer, config, dataset, batch_size=args.batch_size, device="cpu"
+        )
+        elapsed = time.perf_counter() - start
+        result = rouge.compute(predictions=generated, references=human, use_stemmer=True)
+        print(
+            f"| {name} | {model_size_mb(model):.2f} | {result['rouge1']:.4f} "
+            f"| {result['rouge2']:.4f} | {result['rougeL']:.4f} | {elapsed / examples:.3f} |"
+        )
+        del model
@@ -24,6 +24,7 @@ def evaluate_test(
     config: GenerationConfig,
     dataset: DatasetDict,
     batch_size: int = 64,
+    device: Union[str, torch.device] = "cuda",
 ) -> Tuple[List[str], List[str]]:
     """
     Evaluate the model on the test dataset.
@@ -34,6 +35,7 @@ def evaluate_test(
         config (GenerationConfig): Configuration for the generation.
         dataset (DatasetDict): Dataset to evaluate the model on.
         batch_size (int, optional): Batch size. Defaults to 64.
+        device (Union[str, torch.device], optional): Device of the model. Defaults to "cuda".
 
     Returns:
         Tuple[List[str], List[str]]: Tuple with the generated and human answers.
@@ -49,7 +51,7 @@ def evaluate_test(
             human_generated.extend(tokenizer.batch_decode(data["labels"], skip_special_tokens=True))
 
             generated_ids = model.generate(
-                input_ids=data["input_ids"].to("cuda"), generation_config=config
+                input_ids=data["input_ids"].to(device), generation_config=config
             )
             model_results.extend(tokenizer.batch_decode(generated_ids, skip_special_tokens=True))
             del data, generated_ids
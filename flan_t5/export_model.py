@@ -0,0 +1,89 @@
+"""
+Export a LoRA model merged into its base model as safetensors, so the API loads one memory
+mapped file instead of resolving the base model and applying the adapter on every start.
+
+The export is written next to the adapter with the `lora_` prefix replaced by `merged_`,
+which is where `get_model_path` in api/main/config.py looks for it first. Dynamically
+quantized int8 weights cannot be stored as safetensors, `--quantize` is recorded in
+merged_config.json and the API quantizes the model after loading it.
+
+Usage (from the flan_t5 directory):
+    python export_model.py ./models/lora_flan-t5-large_Llama-2-SQL-Dataset --quantize
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import torch
+from peft import PeftConfig, PeftModel
+from transformers import AutoTokenizer, T5ForConditionalGeneration
+
+# the export format is defined by the API, which is imported from the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.main.config import MERGED_CONFIG_NAME
+
+DTYPES = {"float32": torch.float32, "bfloat16": torch.bfloat16}
+
+
+def merge_lora(
+    base_model_name: str, lora_path: str, dtype: torch.dtype = torch.float32
+) -> T5ForConditionalGeneration:
+    """
+    Load the base model with the LoRA weights merged into its linear layers.
+    """
+    model = T5ForConditionalGeneration.from_pretrained(base_model_name, torch_dtype=dtype)
+    return PeftModel.from_pretrained(model, lora_path).merge_and_unload().eval()
+
+
+def default_output(lora_path: str) -> str:
+    lora_path = os.path.normpath(lora_path)
+    name = os.path.basename(lora_path)
+    name = f"merged_{name[len('lora_'):]}" if name.startswith("lora_") else f"merged_{name}"
+    return os.path.join(os.path.dirname(lora_path), name)
+
+
+def export(lora_path: str, output: str, dtype: str = "float32", quantize: bool = False) -> None:
+    """
+    Merge the adapter and save the model, its tokenizer and the export settings.
+
+    Args:
+        lora_path (str): Path or hub name of the adapter.
+        output (str): Directory of the exported model.
+        dtype (str, optional): Data type of the weights. Defaults to "float32".
+        quantize (bool, optional): Quantize the model to int8 when it is loaded.
+            Defaults to False.
+    """
+    base_model_name = PeftConfig.from_pretrained(lora_path).base_model_name_or_path
+    model = merge_lora(base_model_name, lora_path, DTYPES[dtype])
+    model.save_pretrained(output)
+    AutoTokenizer.from_pretrained(base_model_name).save_pretrained(output)
+    # written last, the API only loads exports that have it
+    with open(os.path.join(output, MERGED_CONFIG_NAME), "w") as file:
+        json.dump(
+            {
+                "base_model_name_or_path": base_model_name,
+                "adapter": lora_path,
+                "dtype": dtype,
+                "quantize": quantize,
+            },
+            file,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("lora", help="Path or hub name of the LoRA adapter")
+    parser.add_argument("--output", help="Defaults to the adapter path with a merged_ prefix")
+    parser.add_argument("--dtype", default="float32", choices=list(DTYPES))
+    parser.add_argument("--quantize", action="store_true", help="Quantize to int8 on load")
+    args = parser.parse_args()
+
+    output = args.output or default_output(args.lora)
+    start = time.perf_counter()
+    export(args.lora, output, args.dtype, args.quantize)
+    size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+    print(f"Exported {args.lora} to {output} ({size / 2**20:.0f} MB)")
+    print(f"Export took {time.perf_counter() - start:.1f} s")